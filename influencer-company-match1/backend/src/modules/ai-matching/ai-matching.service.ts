@@ -1,6 +1,6 @@
 import { Injectable, Logger } from '@nestjs/common';
 import { InjectRepository } from '@nestjs/typeorm';
-import { Repository } from 'typeorm';
+import { In, Repository } from 'typeorm';
 import { MLModelService } from './ml-model.service';
 import { FeatureEngineeringService } from './feature-engineering.service';
 import { MatchTrainingData } from './entities/match-training-data.entity';
@@ -27,9 +27,44 @@ export interface EnhancedMatch {
   user: any;
 }
 
+// Profile vectors for candidate retrieval: niche/industry category,
+// platforms, location region, then audience and budget scale
+const NICHE_CATEGORIES: Record<string, string[]> = {
+  food: ['restaurant', 'cooking', 'recipe', 'culinary'],
+  fashion: ['clothing', 'style', 'apparel', 'beauty'],
+  tech: ['technology', 'software', 'gadget', 'digital'],
+  fitness: ['health', 'wellness', 'gym', 'workout'],
+  travel: ['tourism', 'adventure', 'vacation', 'hotel'],
+};
+const PLATFORMS = ['instagram', 'youtube', 'tiktok', 'twitter', 'facebook', 'linkedin'];
+const LOCATION_BUCKETS = 8;
+
+// Users shortlisted from the candidate index per requested match
+const SHORTLIST_FACTOR = 10;
+const INDEX_BATCH_SIZE = 1000;
+
+function midpoint(low?: number, high?: number): number {
+  return low && high ? (low + high) / 2 : low || high || 0;
+}
+
+// log10 of a size or amount, scaled to about 0..1 (0.5 when unknown)
+function logScale(value: number | undefined, maxLog: number): number {
+  return value && value > 0 ? Math.min(1, Math.max(0.05, Math.log10(value) / maxLog)) : 0.5;
+}
+
+function hashString(value: string): number {
+  let hash = 0;
+  for (let i = 0; i < value.length; i++) {
+    hash = (hash * 31 + value.charCodeAt(i)) >>> 0;
+  }
+  return hash;
+}
+
 @Injectable()
 export class AIMatchingService {
   private readonly logger = new Logger(AIMatchingService.name);
+  // Started on the first match request; reset if it fails so it is retried
+  private candidateIndexSync: Promise<void> | null = null;
 
   constructor(
     @InjectRepository(User)
@@ -53,22 +88,24 @@ export class AIMatchingService {
 
     // Get opposite role users
     const oppositeRole = currentUser.role === UserRole.INFLUENCER ? UserRole.COMPANY : UserRole.INFLUENCER;
-    const potentialMatches = await this.userRepository.find({
-      where: { 
-        role: oppositeRole,
-        isActive: true,
-      },
-      take: limit * 2, // Get more to filter
-    });
+    const potentialMatches = await this.getCandidatePool(currentUser, oppositeRole, limit);
 
-    // Calculate AI scores for each match using advanced features
-    const enhancedMatches = await Promise.all(
-      potentialMatches.map(async (targetUser) => {
-        const features = await this.featureEngineeringService.extractAdvancedFeatures(
-          currentUser.id,
-          targetUser.id,
-        );
-        const aiPrediction = await this.mlModelService.predictMatchScore(features);
+    // Extract features for every candidate, then rank them in one call
+    const featuresList = await Promise.all(
+      potentialMatches.map((targetUser) =>
+        this.featureEngineeringService.extractAdvancedFeatures(currentUser.id, targetUser.id),
+      ),
+    );
+    const ranked = await this.mlModelService.rankMatches(
+      potentialMatches.map((targetUser, i) => ({ id: targetUser.id, features: featuresList[i] })),
+      limit,
+    );
+
+    // Only the top matches need their profiles loaded
+    const usersById = new Map(potentialMatches.map((u, i) => [u.id, { user: u, features: featuresList[i] }]));
+    return Promise.all(
+      ranked.map(async ({ id, prediction: aiPrediction }) => {
+        const { user: targetUser, features } = usersById.get(id)!;
         
         // Load profile data
         const profileData = await this.loadUserProfile(targetUser);
@@ -91,11 +128,131 @@ export class AIMatchingService {
         };
       })
     );
+  }
+
+  /**
+   * Users worth scoring for a match request
+   *
+   * The ML service's candidate index shortlists the users of the opposite
+   * role whose profiles are most similar; without a shortlist (index not
+   * loaded yet, or the Python service unavailable) the first active users
+   * are used as before.
+   */
+  private async getCandidatePool(currentUser: User, oppositeRole: UserRole, limit: number): Promise<User[]> {
+    if (!this.candidateIndexSync) {
+      this.candidateIndexSync = this.syncCandidateIndex().catch((error: Error) => {
+        this.logger.warn(`Candidate index sync failed: ${error.message}`);
+        this.candidateIndexSync = null;
+      });
+    }
+
+    const [profile] = await this.findProfiles(currentUser.role, [currentUser.id]);
+    const vector = this.profileVector(currentUser.role, profile || null);
+    // Keep the requesting user's own vector current for searches from the other side
+    const [, shortlist] = await Promise.all([
+      currentUser.role === UserRole.ADMIN
+        ? Promise.resolve(false)
+        : this.mlModelService.indexCandidates(this.candidateGroup(currentUser.role), [{ id: currentUser.id, vector }]),
+      this.mlModelService.shortlistCandidates(
+        this.candidateGroup(oppositeRole),
+        vector,
+        limit * SHORTLIST_FACTOR,
+        [currentUser.id],
+      ),
+    ]);
+
+    if (shortlist) {
+      return this.userRepository.find({
+        where: { id: In(shortlist), role: oppositeRole, isActive: true },
+      });
+    }
+    return this.userRepository.find({
+      where: { 
+        role: oppositeRole,
+        isActive: true,
+      },
+      take: limit * 2, // Get more to filter
+    });
+  }
+
+  /**
+   * Upsert every active influencer and company into the candidate index
+   */
+  private async syncCandidateIndex(): Promise<void> {
+    for (const role of [UserRole.INFLUENCER, UserRole.COMPANY]) {
+      for (let skip = 0; ; skip += INDEX_BATCH_SIZE) {
+        const users = await this.userRepository.find({
+          where: { role, isActive: true },
+          order: { id: 'ASC' },
+          skip,
+          take: INDEX_BATCH_SIZE,
+        });
+        if (users.length === 0) {
+          break;
+        }
+
+        const profiles = await this.findProfiles(role, users.map((u) => u.id));
+        const profilesByUser = new Map(profiles.map((p) => [p.userId, p]));
+        const indexed = await this.mlModelService.indexCandidates(
+          this.candidateGroup(role),
+          users.map((u) => ({ id: u.id, vector: this.profileVector(role, profilesByUser.get(u.id) || null) })),
+        );
+        if (!indexed) {
+          throw new Error('ML service did not accept the candidates');
+        }
+        if (users.length < INDEX_BATCH_SIZE) {
+          break;
+        }
+      }
+    }
+    this.logger.log('Candidate index synced');
+  }
+
+  private candidateGroup(role: UserRole): string {
+    return role.toLowerCase();
+  }
+
+  private async findProfiles(
+    role: UserRole,
+    userIds: string[],
+  ): Promise<Array<InfluencerProfile | CompanyProfile>> {
+    if (role === UserRole.INFLUENCER) {
+      return this.influencerProfileRepository.find({ where: { userId: In(userIds) } });
+    }
+    if (role === UserRole.COMPANY) {
+      return this.companyProfileRepository.find({ where: { userId: In(userIds) } });
+    }
+    return [];
+  }
+
+  // Same layout for both roles, so an influencer's vector can search companies and back
+  private profileVector(role: UserRole, profile: InfluencerProfile | CompanyProfile | null): number[] {
+    const influencer = role === UserRole.INFLUENCER ? (profile as InfluencerProfile | null) : null;
+    const company = role === UserRole.COMPANY ? (profile as CompanyProfile | null) : null;
+
+    const niche = (influencer?.niche || company?.industry || '').toLowerCase();
+    const categories = Object.entries(NICHE_CATEGORIES).map(([key, related]) =>
+      niche && (niche.includes(key) || related.some((r) => niche.includes(r))) ? 1 : 0,
+    );
+    categories.push(niche && !categories.some((c) => c) ? 1 : 0);
+
+    const platforms = new Set(
+      (Array.isArray(profile?.platforms) ? profile!.platforms : []).map((p) => String(p).toLowerCase()),
+    );
+    const platformPart = PLATFORMS.map((p) => (platforms.has(p) ? 0.5 : 0));
+
+    const locationPart: number[] = new Array(LOCATION_BUCKETS).fill(0);
+    const region = (profile?.location || '').toLowerCase().split(',').pop()!.trim();
+    if (region) {
+      locationPart[hashString(region) % LOCATION_BUCKETS] = 0.5;
+    }
+
+    const audience = influencer
+      ? influencer.audienceSize
+      : midpoint(company?.minAudienceSize, company?.maxAudienceSize);
+    const budget = influencer ? midpoint(influencer.minBudget, influencer.maxBudget) : company?.budget;
 
-    // Sort by AI score and take top matches
-    return enhancedMatches
-      .sort((a, b) => b.aiScore - a.aiScore)
-      .slice(0, limit);
+    return [...categories, ...platformPart, ...locationPart, logScale(audience, 7), logScale(budget, 6)];
   }
 
   async getEnhancedMatch(userId: string, targetUserId: string): Promise<EnhancedMatch | null> {
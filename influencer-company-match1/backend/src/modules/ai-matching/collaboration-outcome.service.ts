@@ -1,6 +1,6 @@
 import { Injectable, Logger } from '@nestjs/common';
 import { InjectRepository } from '@nestjs/typeorm';
-import { Repository } from 'typeorm';
+import { MoreThan, Repository } from 'typeorm';
 import { CollaborationOutcome } from './entities/collaboration-outcome.entity';
 import { Connection } from '../matching/entities/connection.entity';
 import { FeatureEngineeringService } from './feature-engineering.service';
@@ -18,6 +18,9 @@ export interface RecordOutcomeDto {
 @Injectable()
 export class CollaborationOutcomeService {
   private readonly logger = new Logger(CollaborationOutcomeService.name);
+  // createdAt of the newest outcome the model has been trained on, so each
+  // incremental update only sends outcomes it has not seen yet
+  private lastSentAt: Date | null = null;
 
   constructor(
     @InjectRepository(CollaborationOutcome)
@@ -171,6 +174,16 @@ export class CollaborationOutcomeService {
     });
   }
 
+  // Convert outcomes to training data format expected by MLModelService
+  private toTrainingData(outcomes: CollaborationOutcome[]) {
+    return outcomes.map(outcome => ({
+      matchId: outcome.connectionId,
+      features: outcome.factorsAtMatch,
+      outcome: outcome.successRating >= 4, // Success if rating >= 4
+      successScore: outcome.successRating * 20, // Convert 1-5 to 0-100
+    }));
+  }
+
   private async checkAndTriggerRetraining(): Promise<void> {
     const totalOutcomes = await this.outcomeRepository.count();
     
@@ -179,17 +192,34 @@ export class CollaborationOutcomeService {
       this.logger.log(`Triggering ML model retraining with ${totalOutcomes} outcomes`);
       
       try {
+        // Update the live model with the outcomes recorded since the last
+        // update (the latest batch after a restart); fall back to a full
+        // retrain on recent history if that is not possible
+        const newOutcomes = this.lastSentAt
+          ? await this.outcomeRepository.find({
+              where: { createdAt: MoreThan(this.lastSentAt) },
+              order: { createdAt: 'ASC' },
+            })
+          : (await this.outcomeRepository.find({
+              order: { createdAt: 'DESC' },
+              take: 50,
+            })).reverse();
+        if (newOutcomes.length === 0) {
+          return;
+        }
+        if (await this.mlModelService.updateModel(this.toTrainingData(newOutcomes) as any)) {
+          this.lastSentAt = newOutcomes[newOutcomes.length - 1].createdAt;
+          this.logger.log(`ML model updated incrementally with ${newOutcomes.length} outcomes`);
+          return;
+        }
+
         const outcomes = await this.getAllOutcomesForTraining();
-        
-        // Convert outcomes to training data format expected by MLModelService
-        const trainingData = outcomes.map(outcome => ({
-          features: outcome.factorsAtMatch,
-          outcome: outcome.successRating >= 4, // Success if rating >= 4
-          successScore: outcome.successRating * 20, // Convert 1-5 to 0-100
-        }));
 
         // Train the model with properly formatted data
-        await this.mlModelService.trainModel(trainingData as any);
+        await this.mlModelService.trainModel(this.toTrainingData(outcomes) as any);
+        if (outcomes.length > 0) {
+          this.lastSentAt = outcomes[0].createdAt;
+        }
         
         this.logger.log('ML model retraining completed successfully');
       } catch (error) {
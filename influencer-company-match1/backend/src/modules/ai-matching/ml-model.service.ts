@@ -149,6 +149,115 @@ export class MLModelService implements OnModuleInit {
     return this.predictWithTypeScriptModel(features);
   }
 
+  /**
+   * Score many candidates at once. Uses a single batch call to the Python
+   * service when available, falling back to the TypeScript model per row.
+   */
+  async predictMatchScores(featuresList: MatchFeatures[]): Promise<MLPrediction[]> {
+    if (featuresList.length === 0) {
+      return [];
+    }
+
+    if (this.usePythonService) {
+      try {
+        const result = await this.mlServiceClient.predictBatch(featuresList);
+        return result.predictions.map((prediction, i) =>
+          this.formatPythonPrediction(
+            { ...prediction, featureImportance: result.featureImportance },
+            featuresList[i],
+          ),
+        );
+      } catch (error) {
+        this.logger.warn(`Python ML service batch failed: ${error.message}. Falling back to TypeScript model.`);
+        this.usePythonService = false;
+      }
+    }
+
+    return Promise.all(featuresList.map((features) => this.predictWithTypeScriptModel(features)));
+  }
+
+  /**
+   * Rank candidates by predicted match score and keep the best `limit`.
+   * The Python service does the selection server-side; the TypeScript
+   * fallback scores everything and sorts locally.
+   */
+  async rankMatches(
+    candidates: Array<{ id: string; features: MatchFeatures }>,
+    limit: number,
+  ): Promise<Array<{ id: string; prediction: MLPrediction }>> {
+    if (candidates.length === 0) {
+      return [];
+    }
+
+    if (this.usePythonService) {
+      try {
+        const featuresById = new Map(candidates.map((c) => [c.id, c.features]));
+        const result = await this.mlServiceClient.rank(candidates, limit);
+        return result.results.map((ranked) => ({
+          id: ranked.id,
+          prediction: this.formatPythonPrediction(
+            { ...ranked, featureImportance: result.featureImportance },
+            featuresById.get(ranked.id)!,
+          ),
+        }));
+      } catch (error) {
+        this.logger.warn(`Python ML service ranking failed: ${error.message}. Falling back to TypeScript model.`);
+        this.usePythonService = false;
+      }
+    }
+
+    const predictions = await this.predictMatchScores(candidates.map((c) => c.features));
+    return candidates
+      .map((c, i) => ({ id: c.id, prediction: predictions[i] }))
+      .sort((a, b) => b.prediction.score - a.prediction.score)
+      .slice(0, limit);
+  }
+
+  /**
+   * Index users' profile vectors for candidate retrieval
+   *
+   * Returns false when the Python service is not in use or the upsert failed.
+   */
+  async indexCandidates(group: string, items: Array<{ id: string; vector: number[] }>): Promise<boolean> {
+    if (!this.usePythonService || items.length === 0) {
+      return false;
+    }
+
+    try {
+      await this.mlServiceClient.upsertCandidates(group, items);
+      return true;
+    } catch (error) {
+      this.logger.warn(`Indexing ${items.length} ${group} candidates failed: ${error.message}`);
+      return false;
+    }
+  }
+
+  /**
+   * Ids of the k users of a group most similar to a profile vector
+   *
+   * Returns null when there is no shortlist (Python service not in use,
+   * group not indexed yet, or the search failed), so callers fall back
+   * to their own candidate pool.
+   */
+  async shortlistCandidates(
+    group: string,
+    vector: number[],
+    k: number,
+    exclude: string[] = [],
+  ): Promise<string[] | null> {
+    if (!this.usePythonService) {
+      return null;
+    }
+
+    try {
+      const result = await this.mlServiceClient.searchCandidates(group, vector, k, exclude);
+      return result.results.length > 0 ? result.results.map((r) => r.id) : null;
+    } catch (error) {
+      this.logger.warn(`Candidate search in ${group} failed: ${error.message}`);
+      return null;
+    }
+  }
+
   private formatPythonPrediction(pythonResult: any, features: MatchFeatures): MLPrediction {
     // Convert Python ML service response to our format
     const reasoning = this.generateReasoning(features, pythonResult.featureImportance || {});
@@ -253,31 +362,16 @@ export class MLModelService implements OnModuleInit {
       try {
         const features = trainingData.map(d => d.features);
         const outcomes = trainingData.map(d => d.outcome);
+        const pairIds = this.getPairIds(trainingData);
         
-        const result = await this.mlServiceClient.train({ features, outcomes });
+        const result = await this.mlServiceClient.train({ features, outcomes, pairIds });
+        if (result.skipped) {
+          // Same data as an existing version, which is already recorded
+          return;
+        }
         this.logger.log(`Python ML model trained successfully. Accuracy: ${result.metrics.accuracy}`);
         
-        // Update database with new model info
-        const newModel = this.mlModelRepository.create({
-          version: result.modelVersion,
-          modelConfig: {
-            weights: {}, // Weights are in Python service
-            biases: {},
-            hyperparameters: {
-              type: 'python_ml',
-            },
-          },
-          performanceMetrics: {
-            accuracy: result.metrics.accuracy,
-            precision: result.metrics.precision,
-            recall: result.metrics.recall,
-            f1Score: result.metrics.f1_score,
-            trainingSize: result.samples,
-          },
-          isActive: false,
-        });
-        
-        await this.mlModelRepository.save(newModel);
+        await this.recordPythonModel(result.modelVersion, result.metrics, result.samples);
         return;
       } catch (error) {
         this.logger.warn(`Python ML training failed: ${error.message}. Using TypeScript fallback.`);
@@ -288,6 +382,75 @@ export class MLModelService implements OnModuleInit {
     this.trainTypeScriptModel(trainingData);
   }
 
+  /**
+   * Update the Python model with only new outcomes
+   *
+   * The ML service grows a few trees (or boosting stages) on these rows
+   * instead of retraining on the full history, so frequent feedback
+   * updates take seconds. Returns false when the update could not be
+   * applied (service unavailable, or the live model has no stored
+   * estimator yet); callers should then run a full trainModel.
+   */
+  async updateModel(trainingData: MatchTrainingData[]): Promise<boolean> {
+    if (!this.usePythonService || trainingData.length === 0) {
+      return false;
+    }
+
+    try {
+      const features = trainingData.map(d => d.features);
+      const outcomes = trainingData.map(d => d.outcome);
+
+      const pairIds = this.getPairIds(trainingData);
+
+      const result = await this.mlServiceClient.train({ features, outcomes, pairIds, mode: 'incremental' });
+      if (result.skipped) {
+        return true;
+      }
+      this.logger.log(
+        `Python ML model updated with ${result.samples} outcomes. Accuracy: ${result.metrics.accuracy}`,
+      );
+
+      await this.recordPythonModel(result.modelVersion, result.metrics, result.samples);
+      return true;
+    } catch (error) {
+      this.logger.warn(`Incremental ML update failed: ${error.message}`);
+      return false;
+    }
+  }
+
+  // Match ids double as the ML service's sample store keys
+  private getPairIds(trainingData: MatchTrainingData[]): string[] | undefined {
+    return trainingData.every(d => d.matchId) ? trainingData.map(d => d.matchId) : undefined;
+  }
+
+  private async recordPythonModel(
+    version: string,
+    metrics: { accuracy: number; precision: number; recall: number; f1_score: number },
+    samples: number,
+  ): Promise<void> {
+    // Update database with new model info
+    const newModel = this.mlModelRepository.create({
+      version,
+      modelConfig: {
+        weights: {}, // Weights are in Python service
+        biases: {},
+        hyperparameters: {
+          type: 'python_ml',
+        },
+      },
+      performanceMetrics: {
+        accuracy: metrics.accuracy,
+        precision: metrics.precision,
+        recall: metrics.recall,
+        f1Score: metrics.f1_score,
+        trainingSize: samples,
+      },
+      isActive: false,
+    });
+
+    await this.mlModelRepository.save(newModel);
+  }
+
   private async trainTypeScriptModel(trainingData: MatchTrainingData[]): Promise<void> {
     
     // Simple weight adjustment based on successful matches
@@ -5,6 +5,7 @@ interface MLServiceConfig {
   baseUrl: string;
   timeout: number;
   enabled: boolean;
+  trainingTimeout: number;
 }
 
 interface MLPrediction {
@@ -14,9 +15,63 @@ interface MLPrediction {
   featureImportance: Record<string, number>;
 }
 
+interface MLBatchPrediction {
+  predictions: Array<{
+    score: number;
+    confidence: number;
+    successProbability: number;
+  }>;
+  featureImportance: Record<string, number>;
+}
+
+interface MLRankResponse {
+  results: Array<{
+    id: string;
+    score: number;
+    confidence: number;
+    successProbability: number;
+  }>;
+  totalCandidates: number;
+  featureImportance: Record<string, number>;
+}
+
+interface MLCandidateSearchResponse {
+  results: Array<{
+    id: string;
+    similarity: number;
+  }>;
+  compared: number;
+  totalCandidates: number;
+  mode: 'exact' | 'ivf';
+}
+
 interface MLTrainingData {
   features: any[];
   outcomes: boolean[];
+  // Pair ids let the service keep these rows in its sample store
+  pairIds?: string[];
+  // Train on every stored sample (after adding these rows)
+  fromStore?: boolean;
+  // 'incremental' updates the live model with just these outcomes
+  mode?: 'full' | 'incremental';
+  newEstimators?: number;
+  maxEstimators?: number;
+}
+
+interface MLTrainingJob {
+  jobId: string;
+  status: 'queued' | 'running' | 'completed' | 'failed';
+  stage: string;
+  progress: number;
+  mode: 'full' | 'incremental';
+  baseVersion: string | null;
+  // The inputs matched an already trained version; nothing was retrained
+  skipped: boolean;
+  samples: number;
+  metrics: MLTrainingResponse['metrics'] | null;
+  modelVersion: string | null;
+  error: string | null;
+  finishedAt: string | null;
 }
 
 interface MLTrainingResponse {
@@ -31,6 +86,7 @@ interface MLTrainingResponse {
   };
   samples: number;
   modelVersion: string;
+  skipped: boolean;
   timestamp: string;
 }
 
@@ -46,6 +102,7 @@ export class MLServiceClient {
       baseUrl: process.env.ML_MATCHING_SERVICE_URL || 'http://localhost:8001',
       timeout: parseInt(process.env.ML_SERVICE_TIMEOUT || '5000'),
       enabled: process.env.ML_SERVICE_ENABLED !== 'false',
+      trainingTimeout: parseInt(process.env.ML_TRAINING_TIMEOUT || '600000'),
     };
 
     this.client = axios.create({
@@ -116,6 +173,110 @@ export class MLServiceClient {
     }
   }
 
+  /**
+   * Predict match success for many candidates in a single request
+   */
+  async predictBatch(features: any[]): Promise<MLBatchPrediction> {
+    if (!this.config.enabled) {
+      throw new Error('ML Service is disabled');
+    }
+
+    try {
+      const response = await this.client.post('/predict/batch', { features });
+      return response.data;
+    } catch (error) {
+      this.logger.error(`ML Service batch prediction error: ${error.message}`);
+      
+      // Mark as unavailable if connection fails
+      if (error.code === 'ECONNREFUSED' || error.code === 'ETIMEDOUT') {
+        this.isAvailable = false;
+      }
+      
+      throw error;
+    }
+  }
+
+  /**
+   * Score a candidate pool and return only the top-K, best first
+   */
+  async rank(
+    candidates: Array<{ id: string; features: any }>,
+    k: number,
+    minScore?: number,
+  ): Promise<MLRankResponse> {
+    if (!this.config.enabled) {
+      throw new Error('ML Service is disabled');
+    }
+
+    try {
+      const response = await this.client.post('/rank', { candidates, k, minScore });
+      return response.data;
+    } catch (error) {
+      this.logger.error(`ML Service ranking error: ${error.message}`);
+      
+      // Mark as unavailable if connection fails
+      if (error.code === 'ECONNREFUSED' || error.code === 'ETIMEDOUT') {
+        this.isAvailable = false;
+      }
+      
+      throw error;
+    }
+  }
+
+  /**
+   * Add or replace users' profile vectors in a group's candidate index
+   */
+  async upsertCandidates(
+    group: string,
+    items: Array<{ id: string; vector: number[] }>,
+  ): Promise<{ added: number; updated: number; size: number }> {
+    if (!this.config.enabled) {
+      throw new Error('ML Service is disabled');
+    }
+
+    try {
+      const response = await this.client.post(`/candidates/${group}`, { items });
+      return response.data;
+    } catch (error) {
+      this.logger.error(`ML Service candidate upsert error: ${error.message}`);
+      
+      // Mark as unavailable if connection fails
+      if (error.code === 'ECONNREFUSED' || error.code === 'ETIMEDOUT') {
+        this.isAvailable = false;
+      }
+      
+      throw error;
+    }
+  }
+
+  /**
+   * Users of a group whose profile vectors are most similar to a profile
+   */
+  async searchCandidates(
+    group: string,
+    vector: number[],
+    k: number,
+    exclude: string[] = [],
+  ): Promise<MLCandidateSearchResponse> {
+    if (!this.config.enabled) {
+      throw new Error('ML Service is disabled');
+    }
+
+    try {
+      const response = await this.client.post(`/candidates/${group}/search`, { vector, k, exclude });
+      return response.data;
+    } catch (error) {
+      this.logger.error(`ML Service candidate search error: ${error.message}`);
+      
+      // Mark as unavailable if connection fails
+      if (error.code === 'ECONNREFUSED' || error.code === 'ETIMEDOUT') {
+        this.isAvailable = false;
+      }
+      
+      throw error;
+    }
+  }
+
   /**
    * Train ML model with new data
    */
@@ -125,16 +286,53 @@ export class MLServiceClient {
     }
 
     try {
-      this.logger.log(`Training ML model with ${trainingData.outcomes.length} samples`);
+      this.logger.log(`Training ML model (${trainingData.mode || 'full'}) with ${trainingData.outcomes.length} samples`);
       const response = await this.client.post('/train', trainingData);
-      this.logger.log(`Model trained successfully. Version: ${response.data.modelVersion}`);
-      return response.data;
+      const job = await this.waitForTrainingJob(response.data.jobId);
+      if (job.skipped) {
+        this.logger.log(`Training data unchanged, reusing model version ${job.modelVersion}`);
+      } else {
+        this.logger.log(`Model trained successfully. Version: ${job.modelVersion}`);
+      }
+      return {
+        status: 'success',
+        metrics: job.metrics!,
+        samples: job.samples,
+        modelVersion: job.modelVersion!,
+        skipped: job.skipped,
+        timestamp: job.finishedAt!,
+      };
     } catch (error) {
       this.logger.error(`ML Service training error: ${error.message}`);
       throw error;
     }
   }
 
+  /**
+   * Poll a background training job until it finishes
+   */
+  async getTrainingJob(jobId: string): Promise<MLTrainingJob> {
+    const response = await this.client.get(`/train/${jobId}`);
+    return response.data;
+  }
+
+  private async waitForTrainingJob(jobId: string): Promise<MLTrainingJob> {
+    const deadline = Date.now() + this.config.trainingTimeout;
+
+    while (Date.now() < deadline) {
+      const job = await this.getTrainingJob(jobId);
+      if (job.status === 'completed') {
+        return job;
+      }
+      if (job.status === 'failed') {
+        throw new Error(`Training job ${jobId} failed: ${job.error}`);
+      }
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+    }
+
+    throw new Error(`Training job ${jobId} did not finish within ${this.config.trainingTimeout}ms`);
+  }
+
   /**
    * List available models
    */
@@ -0,0 +1,139 @@
+"""
+Binary Matrix I/O
+Zero-copy decoding of NumPy .npy and Arrow IPC request bodies
+"""
+import io
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pa = None
+
+NPY_CONTENT_TYPE = 'application/x-npy'
+ARROW_CONTENT_TYPE = 'application/vnd.apache.arrow.stream'
+
+SUPPORTED_DTYPES = (np.dtype(np.float32), np.dtype(np.float64))
+
+
+class BinaryFormatError(ValueError):
+    """Raised when a binary body cannot be decoded into a feature matrix"""
+
+
+def media_type(content_type):
+    """Normalize a Content-Type header to one of the supported formats"""
+    media = (content_type or '').split(';')[0].strip().lower()
+    if media in (NPY_CONTENT_TYPE, 'application/octet-stream'):
+        return NPY_CONTENT_TYPE
+    if media == ARROW_CONTENT_TYPE:
+        return ARROW_CONTENT_TYPE
+    raise BinaryFormatError(
+        f"Unsupported content type '{content_type}'. "
+        f"Use {NPY_CONTENT_TYPE} or {ARROW_CONTENT_TYPE}"
+    )
+
+
+def read_npy(buffer):
+    """
+    Wrap an .npy payload as an array without copying the data
+
+    Only the header is parsed; the returned array is a read-only view onto
+    the request buffer.
+    """
+    stream = io.BytesIO(buffer)
+    try:
+        major, _ = np.lib.format.read_magic(stream)
+        if major == 1:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+    except ValueError as e:
+        raise BinaryFormatError(f"Invalid .npy payload: {e}")
+
+    if dtype not in SUPPORTED_DTYPES:
+        raise BinaryFormatError(f"Expected float32 or float64 data, got {dtype}")
+
+    count = int(np.prod(shape)) if shape else 1
+    offset = stream.tell()
+    if len(buffer) - offset < count * dtype.itemsize:
+        raise BinaryFormatError("Truncated .npy payload")
+
+    array = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+    return array.reshape(shape, order='F' if fortran_order else 'C')
+
+
+def write_npy(array):
+    """Encode an array as .npy bytes"""
+    stream = io.BytesIO()
+    np.save(stream, array, allow_pickle=False)
+    return stream.getvalue()
+
+
+def _require_arrow():
+    if pa is None:
+        raise BinaryFormatError("Arrow payloads require the optional pyarrow package")
+
+
+def read_arrow(buffer, columns):
+    """
+    Read the named columns of an Arrow IPC stream as a float matrix
+
+    Columns are taken zero-copy from the Arrow buffers and stacked once
+    into the (n_rows, n_columns) matrix the model needs.
+    """
+    _require_arrow()
+    try:
+        table = pa.ipc.open_stream(pa.py_buffer(buffer)).read_all()
+    except pa.ArrowInvalid as e:
+        raise BinaryFormatError(f"Invalid Arrow payload: {e}")
+
+    missing = [name for name in columns if name not in table.column_names]
+    if missing:
+        raise BinaryFormatError(f"Arrow payload is missing columns: {', '.join(missing)}")
+
+    arrays = []
+    for name in columns:
+        column = table.column(name).combine_chunks()
+        if column.null_count:
+            raise BinaryFormatError(f"Column '{name}' contains nulls")
+        arrays.append(column.to_numpy(zero_copy_only=False).astype(np.float32, copy=False))
+
+    return np.column_stack(arrays) if arrays else np.empty((table.num_rows, 0), dtype=np.float32)
+
+
+def write_arrow(columns):
+    """Encode a dict of equal-length 1-D arrays as an Arrow IPC stream"""
+    _require_arrow()
+    table = pa.table({name: pa.array(values) for name, values in columns.items()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def read_matrix(buffer, content_type, columns):
+    """
+    Decode a request body into a 2-D float matrix
+
+    Args:
+        buffer: Raw request body
+        content_type: Request Content-Type header
+        columns: Expected column names (the .npy width must match)
+
+    Returns:
+        Array of shape (n_rows, len(columns))
+    """
+    fmt = media_type(content_type)
+    if fmt == ARROW_CONTENT_TYPE:
+        matrix = read_arrow(buffer, columns)
+    else:
+        matrix = read_npy(buffer)
+
+    if matrix.ndim != 2 or matrix.shape[1] != len(columns):
+        raise BinaryFormatError(
+            f"Expected a matrix with {len(columns)} columns, got shape {matrix.shape}"
+        )
+    if not np.isfinite(matrix).all():
+        raise BinaryFormatError("Matrix contains NaN or infinite values")
+    return matrix
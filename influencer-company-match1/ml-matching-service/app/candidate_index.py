@@ -0,0 +1,716 @@
+"""
+Candidate Index
+Nearest-neighbour retrieval over per-user profile vectors
+
+Ranking scores pairs with the forest, which needs pair features the
+caller has to build, so it can only look at a bounded pool. This index
+picks that pool: every user's profile vector (niche, audience,
+engagement, budget, location, encoded by the caller) is kept normalized
+in one float32 matrix, and a query returns the users with the highest
+cosine similarity.
+
+Search is exact (one matrix-vector product and an argpartition) until an
+IVF layout is built; then only the rows in the few clusters closest to
+the query are compared.
+
+CandidateStore keeps every group's changes in a log on disk, so the
+indexes survive restarts and all uvicorn workers serve the same rows.
+"""
+import json
+import logging
+import os
+import re
+import struct
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, so a single writing process is assumed
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Group names (e.g. 'influencer', 'company') are used in URLs
+GROUP_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def validate_group(group):
+    """Return the group name, raising ValueError if it is not a safe name"""
+    if not GROUP_PATTERN.match(group):
+        raise ValueError(f"Invalid group {group!r}: use 1-64 letters, digits, '_' or '-'")
+    return group
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    if not np.all(np.isfinite(norms)) or np.any(norms == 0):
+        raise ValueError("Vectors must be finite and non-zero")
+    return vectors / norms
+
+
+def _top_k(similarity, k):
+    """Indices of the k largest values, largest first"""
+    if k < len(similarity):
+        top = np.argpartition(similarity, -k)[-k:]
+    else:
+        top = np.arange(len(similarity))
+    return top[np.argsort(-similarity[top], kind='stable')]
+
+
+class CandidateIndex:
+    """
+    Profile vectors of one group of users, searchable by cosine similarity
+
+    Rows live in preallocated arrays that double when full. Upserting a
+    known id overwrites its row; deleting moves the last row into the gap,
+    so the searched range is always dense and no rebuild is needed.
+
+    build_ivf() clusters the rows with spherical k-means and keeps an
+    inverted list of rows per centroid. Upserts and deletes update the
+    lists in place (new rows join their nearest centroid's list), and a
+    search compares the query with the rows of its nprobe nearest
+    centroids only. Centroids are not retrained as rows change; call
+    build_ivf() again after large changes.
+    """
+
+    def __init__(self, dim, capacity=1024):
+        """
+        Args:
+            dim: Length of every profile vector
+            capacity: Rows allocated up front
+        """
+        self.dim = dim
+        self._vectors = np.empty((capacity, dim), dtype=np.float32)
+        self._ids = []
+        self._rows = {}
+        self._lock = threading.Lock()
+        # IVF layout: centroid of every row, its position in that
+        # centroid's member array, and the member arrays with their sizes
+        self.centroids = None
+        self.nprobe = None
+        self._lists = np.zeros(capacity, dtype=np.int32)
+        self._positions = np.zeros(capacity, dtype=np.int64)
+        self._members = None
+        self._sizes = None
+        self.searches = 0
+        self.search_seconds = 0.0
+        self.max_search_seconds = 0.0
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, id_):
+        return id_ in self._rows
+
+    def _check(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of length {self.dim}, got shape {vectors.shape}")
+        return _normalize(vectors)
+
+    def _grow(self, size, used):
+        """Make room for size rows, keeping the first `used`"""
+        capacity = len(self._vectors)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[:used] = self._vectors[:used]
+        lists = np.zeros(capacity, dtype=np.int32)
+        lists[:used] = self._lists[:used]
+        positions = np.zeros(capacity, dtype=np.int64)
+        positions[:used] = self._positions[:used]
+        self._vectors, self._lists, self._positions = vectors, lists, positions
+
+    def _add_member(self, row, list_id):
+        members = self._members[list_id]
+        size = self._sizes[list_id]
+        if size == len(members):
+            members = self._members[list_id] = np.concatenate([members, np.empty(max(16, size), np.int64)])
+        members[size] = row
+        self._lists[row] = list_id
+        self._positions[row] = size
+        self._sizes[list_id] = size + 1
+
+    def _remove_member(self, row):
+        list_id = self._lists[row]
+        members = self._members[list_id]
+        last = self._sizes[list_id] - 1
+        moved = members[last]
+        members[self._positions[row]] = moved
+        self._positions[moved] = self._positions[row]
+        self._sizes[list_id] = last
+
+    def upsert(self, ids, vectors):
+        """
+        Add or replace profile vectors
+
+        Returns:
+            Tuple of (added, updated) counts
+        """
+        vectors = self._check(vectors)
+        if len(ids) != len(vectors):
+            raise ValueError("ids and vectors must have the same length")
+
+        with self._lock:
+            lists = self._assign(vectors) if self.centroids is not None else None
+            # Later duplicates in one call win, like repeated upserts
+            rows = np.empty(len(ids), dtype=np.int64)
+            used = len(self._ids)
+            added = 0
+            for i, id_ in enumerate(ids):
+                row = self._rows.get(id_)
+                if row is None:
+                    row = self._rows[id_] = len(self._ids)
+                    self._ids.append(id_)
+                    added += 1
+                rows[i] = row
+            self._grow(len(self._ids), used)
+            self._vectors[rows] = vectors
+            if lists is not None:
+                for i, row in enumerate(rows.tolist()):
+                    if row < used:
+                        if self._lists[row] == lists[i]:
+                            continue
+                        self._remove_member(row)
+                    self._add_member(row, lists[i])
+                    used = max(used, row + 1)
+        return added, len(ids) - added
+
+    def delete(self, ids):
+        """Remove ids; returns how many were present"""
+        removed = 0
+        with self._lock:
+            for id_ in ids:
+                row = self._rows.pop(id_, None)
+                if row is None:
+                    continue
+                if self._members is not None:
+                    self._remove_member(row)
+                last = len(self._ids) - 1
+                if row != last:
+                    moved = self._ids[last]
+                    self._ids[row] = moved
+                    self._rows[moved] = row
+                    self._vectors[row] = self._vectors[last]
+                    if self._members is not None:
+                        list_id = self._lists[last]
+                        self._members[list_id][self._positions[last]] = row
+                        self._lists[row] = list_id
+                        self._positions[row] = self._positions[last]
+                self._ids.pop()
+                removed += 1
+        return removed
+
+    def vector(self, id_):
+        """Stored (normalized) vector of an id, or None"""
+        with self._lock:
+            row = self._rows.get(id_)
+            return None if row is None else self._vectors[row].copy()
+
+    def search(self, vector, k=100, exclude=(), nprobe=None, exact=False):
+        """
+        Ids most similar to a profile vector
+
+        Args:
+            vector: Query profile vector (length dim)
+            k: Number of results
+            exclude: Ids never returned (e.g. the querying user)
+            nprobe: Clusters searched with an IVF layout (default: as built)
+            exact: Compare with every row even when an IVF layout exists
+
+        Returns:
+            Tuple of (ids, cosine similarities, rows compared)
+        """
+        query = self._check(np.asarray(vector, dtype=np.float32).reshape(1, -1))[0]
+        exclude = set(exclude)
+        started = time.perf_counter()
+
+        with self._lock:
+            vectors = self._vectors[:len(self._ids)]
+            if self.centroids is not None and not exact:
+                probed = _top_k(self.centroids @ query, min(nprobe or self.nprobe, len(self.centroids)))
+                rows = np.concatenate(
+                    [self._members[l][:self._sizes[l]] for l in probed.tolist()]
+                )
+                similarity = vectors[rows] @ query
+            else:
+                rows = None
+                similarity = vectors @ query
+
+            # Extra candidates so excluded ids can be dropped afterwards
+            top = _top_k(similarity, k + len(exclude))
+            positions = top if rows is None else rows[top]
+            results = [
+                (self._ids[row], float(similarity[i]))
+                for i, row in zip(top.tolist(), positions.tolist())
+                if self._ids[row] not in exclude
+            ][:k]
+            compared = len(similarity)
+
+        elapsed = time.perf_counter() - started
+        self.searches += 1
+        self.search_seconds += elapsed
+        self.max_search_seconds = max(self.max_search_seconds, elapsed)
+        return [id_ for id_, _ in results], [s for _, s in results], compared
+
+    def _assign(self, vectors, centroids=None, chunk_size=8192):
+        """Nearest centroid of every vector"""
+        centroids = self.centroids if centroids is None else centroids
+        lists = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), chunk_size):
+            lists[start:start + chunk_size] = np.argmax(
+                vectors[start:start + chunk_size] @ centroids.T, axis=1
+            )
+        return lists
+
+    def build_ivf(self, nlist=None, nprobe=None, iterations=10, sample_size=50000, seed=0):
+        """
+        Cluster the rows for approximate search
+
+        Args:
+            nlist: Number of clusters (default sqrt(rows))
+            nprobe: Clusters searched per query (default nlist / 16, at least 1)
+            iterations: Spherical k-means iterations
+            sample_size: Rows the centroids are fitted on
+
+        Returns:
+            Dict describing the layout
+        """
+        started = time.perf_counter()
+        layout = self.set_ivf(self.fit_centroids(nlist, iterations, sample_size, seed), nprobe)
+        layout['buildMs'] = (time.perf_counter() - started) * 1000
+        return layout
+
+    def fit_centroids(self, nlist=None, iterations=10, sample_size=50000, seed=0):
+        """Spherical k-means centroids of a sample of the rows (see build_ivf)"""
+        rng = np.random.default_rng(seed)
+        with self._lock:
+            n = len(self._ids)
+            if n == 0:
+                raise ValueError("Cannot cluster an empty index")
+            sample = self._vectors[rng.choice(n, size=min(n, sample_size), replace=False)]
+
+        nlist = min(nlist or max(1, int(np.sqrt(n))), len(sample))
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.linalg.norm(sums, axis=1) == 0
+            # Empty clusters restart at a random sample
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = _normalize(sums).astype(np.float32)
+        return centroids
+
+    def set_ivf(self, centroids, nprobe=None):
+        """
+        Place every row under its nearest centroid and search by clusters
+
+        Rows changed since the centroids were fitted are placed too.
+
+        Returns:
+            Dict describing the layout
+        """
+        nlist = len(centroids)
+        with self._lock:
+            n = len(self._ids)
+            lists = self._assign(self._vectors[:n], centroids)
+            order = np.argsort(lists, kind='stable')
+            sizes = np.bincount(lists, minlength=nlist)
+            starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+            self._members = np.split(order, starts[1:])
+            self._sizes = sizes
+            self._lists[:n] = lists
+            self._positions[order] = np.arange(n) - np.repeat(starts, sizes)
+            self.centroids = centroids
+            self.nprobe = max(1, min(nprobe or nlist // 16, nlist))
+
+        return {
+            'nlist': nlist,
+            'nprobe': self.nprobe,
+            'rows': n,
+            'largestList': int(sizes.max()),
+        }
+
+    def snapshot(self):
+        """Copies of the ids and vectors in row order, with the centroids and nprobe"""
+        with self._lock:
+            ids = list(self._ids)
+            return ids, self._vectors[:len(ids)].copy(), self.centroids, self.nprobe
+
+    def drop_ivf(self):
+        """Go back to exact search"""
+        with self._lock:
+            self.centroids = self.nprobe = None
+            self._members = self._sizes = None
+
+    def stats(self):
+        return {
+            'size': len(self._ids),
+            'dim': self.dim,
+            'capacity': len(self._vectors),
+            'memoryBytes': int(self._vectors.nbytes + self._lists.nbytes + self._positions.nbytes + sum(
+                members.nbytes for members in self._members or ()
+            )),
+            'mode': 'ivf' if self.centroids is not None else 'exact',
+            'nlist': len(self.centroids) if self.centroids is not None else None,
+            'nprobe': self.nprobe,
+            'searches': self.searches,
+            'searchMs': {
+                'mean': self.search_seconds * 1000 / self.searches if self.searches else 0.0,
+                'max': self.max_search_seconds * 1000,
+            },
+        }
+
+
+GROUP_FILE = 'group.json'
+LOG_FILE = 'ops.log'
+WRITE_LOCK_FILE = 'write.lock'
+
+# Every log record: header length, payload length, JSON header, payload
+_RECORD_PREFIX = struct.Struct('<IQ')
+
+
+def _lock(f):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_EX)
+
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _record(header, payload=b''):
+    encoded = json.dumps(header).encode()
+    return _RECORD_PREFIX.pack(len(encoded), len(payload)) + encoded + payload
+
+
+def _start_record():
+    """First record of every log file, naming it so a rewritten log is told apart"""
+    log_id = uuid.uuid4().hex
+    return log_id, _record({'op': 'start', 'log': log_id})
+
+
+def _read_log_id(f):
+    """Id from a log's start record, or None if it is not completely written"""
+    prefix = f.read(_RECORD_PREFIX.size)
+    if len(prefix) < _RECORD_PREFIX.size:
+        return None
+    header_length, _ = _RECORD_PREFIX.unpack(prefix)
+    header = f.read(header_length)
+    if len(header) < header_length:
+        return None
+    return json.loads(header)['log']
+
+
+class _Group:
+    __slots__ = ('dim', 'lock', 'index', 'offset', 'log_id')
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.lock = threading.Lock()
+        self.index = CandidateIndex(dim)
+        # Bytes of the log applied to index, and which log file they came from
+        self.offset = 0
+        self.log_id = None
+
+
+class CandidateStore:
+    """
+    Candidate indexes of every group, persisted as logs of their changes
+
+    Layout:
+        <root>/<group>/group.json   vector length
+        <root>/<group>/ops.log      upserts, deletes and IVF layouts, in order
+
+    Each process keeps its own CandidateIndex per group and replays the
+    records other processes appended before serving it, so every uvicorn
+    worker (and a restarted one) ends up with the same rows. Writes hold
+    an exclusive lock on the group's write.lock, catch up with the log,
+    append their record and apply it. An IVF build logs its centroids, so
+    other workers only place their rows instead of clustering again.
+
+    A record cut short by a crash is ignored by readers and trimmed by the
+    next writer. Once the log is compact_ratio times the size of the rows
+    it holds, the writer rewrites it as one upsert of the current rows.
+    Every log file starts with a random id, so the other processes notice
+    the new file and reload from it.
+    """
+
+    def __init__(self, root, compact_ratio=3.0, compact_min_bytes=1 << 20):
+        """
+        Args:
+            root: Directory holding one log per group
+            compact_ratio: Log size, relative to the live rows, that triggers a rewrite
+            compact_min_bytes: Logs smaller than this are never rewritten
+        """
+        self.root = root
+        self.compact_ratio = compact_ratio
+        self.compact_min_bytes = compact_min_bytes
+        self._groups = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, group, name):
+        return os.path.join(self.root, group, name)
+
+    def _group(self, group):
+        """The group's state, or None if nothing was ever indexed for it"""
+        with self._lock:
+            state = self._groups.get(group)
+            if state is None:
+                try:
+                    with open(self._path(group, GROUP_FILE)) as f:
+                        dim = json.load(f)['dim']
+                except FileNotFoundError:
+                    return None
+                state = self._groups[group] = _Group(dim)
+            return state
+
+    def groups(self):
+        """Names of the groups with an index, sorted"""
+        return sorted(
+            group for group in os.listdir(self.root)
+            if os.path.isfile(self._path(group, GROUP_FILE))
+        )
+
+    def get(self, group):
+        """
+        The group's index, caught up with the log
+
+        Returns:
+            CandidateIndex, or None if nothing was ever indexed for the group
+        """
+        state = self._group(group)
+        if state is None:
+            return None
+        with state.lock:
+            self._refresh(group, state)
+            return state.index
+
+    def loaded(self):
+        """Indexes this process has loaded, as last refreshed (no disk access)"""
+        with self._lock:
+            return {group: state.index for group, state in sorted(self._groups.items())}
+
+    def indexes(self):
+        """Every group's index, caught up with its log"""
+        indexes = {}
+        for group in self.groups():
+            index = self.get(group)
+            if index is not None:
+                indexes[group] = index
+        return indexes
+
+    def _refresh(self, group, state, trim=False):
+        """
+        Apply records appended since the last refresh (caller holds state.lock)
+
+        With trim (writers only, holding the write lock), a partial record
+        left by a crashed writer is cut off.
+        """
+        try:
+            f = open(self._path(group, LOG_FILE), 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            log_id = _read_log_id(f)
+            if log_id is None or log_id != state.log_id:
+                # First read, or the log was rewritten: start over from it
+                state.index = CandidateIndex(state.dim)
+                state.offset = 0
+                state.log_id = log_id
+            size = os.fstat(f.fileno()).st_size
+            if size == state.offset:
+                return
+            f.seek(state.offset)
+            data = f.read(size - state.offset)
+
+        position = 0
+        while len(data) - position >= _RECORD_PREFIX.size:
+            header_length, payload_length = _RECORD_PREFIX.unpack_from(data, position)
+            start = position + _RECORD_PREFIX.size
+            end = start + header_length + payload_length
+            if end > len(data):
+                break
+            header = json.loads(data[start:start + header_length])
+            self._apply(state, header, data[start + header_length:end])
+            position = end
+        state.offset += position
+
+        if trim and position < len(data):
+            logger.warning("Trimming incomplete record from the %s candidate log", group)
+            os.truncate(self._path(group, LOG_FILE), state.offset)
+
+    def _apply(self, state, header, payload):
+        """Apply one log record to the group's index"""
+        index = state.index
+        op = header['op']
+        if op == 'upsert':
+            vectors = np.frombuffer(payload, dtype=np.float32).reshape(len(header['ids']), state.dim)
+            return index.upsert(header['ids'], vectors)
+        if op == 'delete':
+            return index.delete(header['ids'])
+        if op == 'ivf':
+            centroids = np.frombuffer(payload, dtype=np.float32).reshape(-1, state.dim).copy()
+            return index.set_ivf(centroids, header['nprobe'])
+        if op == 'drop_ivf':
+            return index.drop_ivf()
+        if op == 'start':
+            return None
+        raise ValueError(f"Unknown candidate log record {op!r}")
+
+    @contextmanager
+    def _writing(self, group, state):
+        """Exclusive access to a group's log, caught up, across threads and processes"""
+        with state.lock, open(self._path(group, WRITE_LOCK_FILE), 'a+b') as f:
+            _lock(f)
+            try:
+                self._refresh(group, state, trim=True)
+                yield
+            finally:
+                _unlock(f)
+
+    def _append(self, group, state, header, payload=b''):
+        """Log a record and apply it (caller is inside _writing)"""
+        record = _record(header, payload)
+        if state.log_id is None:
+            # New (or emptied) log
+            state.log_id, start = _start_record()
+            record = start + record
+        with open(self._path(group, LOG_FILE), 'ab') as f:
+            f.write(record)
+            f.flush()
+            os.fsync(f.fileno())
+        state.offset += len(record)
+        return self._apply(state, header, payload)
+
+    def upsert(self, group, ids, vectors):
+        """
+        Add or replace profile vectors, creating the group on first use
+
+        The first upsert into a group fixes its vector length.
+
+        Returns:
+            Tuple of (added, updated, group size)
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2:
+            raise ValueError(f"Expected a matrix of vectors, got shape {vectors.shape}")
+        if len(ids) != len(vectors):
+            raise ValueError("ids and vectors must have the same length")
+
+        state = self._group(group) or self._create(group, vectors.shape[1])
+        # Checked before logging, so a rejected upsert leaves no record
+        state.index._check(vectors)
+        with self._writing(group, state):
+            added, updated = self._append(
+                group, state, {'op': 'upsert', 'ids': list(ids)}, np.ascontiguousarray(vectors).tobytes()
+            )
+            self._maybe_compact(group, state)
+            return added, updated, len(state.index)
+
+    def _create(self, group, dim):
+        """Register a new group with its vector length"""
+        os.makedirs(os.path.join(self.root, group), exist_ok=True)
+        with open(self._path(group, WRITE_LOCK_FILE), 'a+b') as f:
+            _lock(f)
+            try:
+                # Another process may have created it meanwhile; its length wins
+                if not os.path.isfile(self._path(group, GROUP_FILE)):
+                    tmp = self._path(group, GROUP_FILE + '.tmp')
+                    with open(tmp, 'w') as out:
+                        json.dump({'dim': dim}, out)
+                    os.replace(tmp, self._path(group, GROUP_FILE))
+            finally:
+                _unlock(f)
+        return self._group(group)
+
+    def delete(self, group, ids):
+        """
+        Remove ids from a group
+
+        Returns:
+            Tuple of (ids removed, group size), or None if the group does not exist
+        """
+        state = self._group(group)
+        if state is None:
+            return None
+        with self._writing(group, state):
+            present = [id_ for id_ in dict.fromkeys(ids) if id_ in state.index]
+            removed = self._append(group, state, {'op': 'delete', 'ids': present}) if present else 0
+            self._maybe_compact(group, state)
+            return removed, len(state.index)
+
+    def build_ivf(self, group, nlist=None, nprobe=None):
+        """
+        Cluster a group's rows for approximate search, in every process
+
+        Returns:
+            Dict describing the layout, or None if the group does not exist
+        """
+        state = self._group(group)
+        if state is None:
+            return None
+        started = time.perf_counter()
+        # Fitted outside the lock, on the rows as of now; rows changed
+        # meanwhile are placed when the layout is applied
+        centroids = self.get(group).fit_centroids(nlist)
+        with self._writing(group, state):
+            layout = self._append(
+                group, state, {'op': 'ivf', 'nprobe': nprobe}, centroids.astype(np.float32).tobytes()
+            )
+        layout['buildMs'] = (time.perf_counter() - started) * 1000
+        return layout
+
+    def drop_ivf(self, group):
+        """
+        Go back to exact search for a group, in every process
+
+        Returns:
+            The group's index, or None if the group does not exist
+        """
+        state = self._group(group)
+        if state is None:
+            return None
+        with self._writing(group, state):
+            self._append(group, state, {'op': 'drop_ivf'})
+            return state.index
+
+    def _maybe_compact(self, group, state):
+        """Rewrite the log as the current rows once it has grown past them (caller is inside _writing)"""
+        index = state.index
+        live_bytes = len(index) * (state.dim * 4 + 16)
+        if state.offset < max(self.compact_min_bytes, self.compact_ratio * live_bytes):
+            return
+
+        started = time.perf_counter()
+        ids, vectors, centroids, nprobe = index.snapshot()
+        log_id, start = _start_record()
+        records = [start, _record({'op': 'upsert', 'ids': ids}, vectors.tobytes())]
+        if centroids is not None:
+            records.append(_record({'op': 'ivf', 'nprobe': nprobe}, centroids.tobytes()))
+
+        tmp = self._path(group, LOG_FILE + '.tmp')
+        with open(tmp, 'wb') as f:
+            for record in records:
+                f.write(record)
+            f.flush()
+            os.fsync(f.fileno())
+        before = state.offset
+        os.replace(tmp, self._path(group, LOG_FILE))
+        # This process already holds these rows; only others reload
+        state.log_id = log_id
+        state.offset = sum(len(record) for record in records)
+        logger.info(
+            "Compacted the %s candidate log from %d to %d bytes in %.1fms",
+            group, before, state.offset, (time.perf_counter() - started) * 1000
+        )
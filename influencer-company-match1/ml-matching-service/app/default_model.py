@@ -0,0 +1,61 @@
+"""
+Bundled Default Model
+Sample training data and the builder for the artifact shipped in app/bundled_model
+
+The service serves the bundled artifact when the registry is empty, so a
+fresh replica never has to train before it can answer. Rebuild it after
+changing the sample data or the artifact format:
+
+    python -m app.default_model
+"""
+import os
+
+import numpy as np
+
+BUNDLED_MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bundled_model')
+BUNDLED_VERSION = 'default'
+
+# Sample training data (realistic match scenarios)
+SAMPLE_FEATURES = [
+    [0.9, 0.85, 0.8, 0.9, 0.7, 0.8, 0.85, 0.9],  # High success
+    [0.85, 0.9, 0.75, 0.85, 0.8, 0.85, 0.8, 0.85],  # High success
+    [0.8, 0.8, 0.85, 0.8, 0.75, 0.9, 0.9, 0.8],  # High success
+    [0.75, 0.85, 0.9, 0.75, 0.85, 0.75, 0.85, 0.75],  # High success
+    [0.9, 0.75, 0.8, 0.9, 0.8, 0.8, 0.75, 0.9],  # High success
+    [0.4, 0.3, 0.35, 0.4, 0.3, 0.35, 0.4, 0.3],  # Low success
+    [0.3, 0.4, 0.3, 0.35, 0.4, 0.3, 0.35, 0.4],  # Low success
+    [0.35, 0.35, 0.4, 0.3, 0.35, 0.4, 0.3, 0.35],  # Low success
+    [0.4, 0.3, 0.35, 0.4, 0.3, 0.35, 0.4, 0.3],  # Low success
+    [0.3, 0.4, 0.3, 0.35, 0.4, 0.3, 0.35, 0.4],  # Low success
+    [0.6, 0.65, 0.6, 0.65, 0.6, 0.65, 0.6, 0.65],  # Medium success
+    [0.65, 0.6, 0.65, 0.6, 0.65, 0.6, 0.65, 0.6],  # Medium success
+]
+
+SAMPLE_OUTCOMES = [
+    True, True, True, True, True,  # Successful matches
+    False, False, False, False, False,  # Failed matches
+    True, True  # Medium matches
+]
+
+
+def build_default_model(directory=BUNDLED_MODEL_DIR):
+    """
+    Train on the sample data and write the bundled artifact
+
+    The fitted sklearn estimator is not included: the bundle only has to
+    serve, and pickles are tied to the scikit-learn version.
+    """
+    from app.model_registry import write_artifact
+    from app.models.match_predictor import MatchPredictor
+
+    predictor = MatchPredictor()
+    metrics = predictor.train(np.array(SAMPLE_FEATURES), np.array(SAMPLE_OUTCOMES))
+
+    os.makedirs(directory, exist_ok=True)
+    write_artifact(directory, predictor, metrics, BUNDLED_VERSION, include_estimator=False)
+    return metrics
+
+
+if __name__ == "__main__":
+    metrics = build_default_model()
+    print(f"Wrote {BUNDLED_MODEL_DIR} (accuracy {metrics['accuracy']:.3f})")
@@ -0,0 +1,43 @@
+"""
+Dataset Fingerprints
+Content hashes that identify a training run's inputs
+"""
+import hashlib
+import json
+
+import numpy as np
+
+# Rows hashed per update, bounding the temporary float32 copy
+_CHUNK_ROWS = 65536
+
+
+def dataset_fingerprint(X, y, params):
+    """
+    SHA-256 of a training matrix, its outcomes and the training settings
+
+    Features are hashed as float32, the precision the sample store keeps
+    them at, and outcomes as booleans, so the same data gives the same
+    fingerprint whether it arrived as JSON, .npy or from the sample store.
+    Training is seeded, so two runs with equal fingerprints fit the same
+    model and the second can be skipped. Inputs that differ only below
+    float32 precision share a fingerprint; forests and exact boosting fit
+    at float32 anyway, while histogram boosting bins at float64, where
+    such differences could at most move a bin edge.
+
+    Args:
+        X: Feature matrix (n_samples, n_features)
+        y: Outcomes (n_samples,)
+        params: JSON-serializable settings (model type, hyperparameters, ...)
+
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    digest.update(np.asarray(X.shape, dtype=np.int64).tobytes())
+
+    for start in range(0, len(X), _CHUNK_ROWS):
+        chunk = np.ascontiguousarray(X[start:start + _CHUNK_ROWS], dtype=np.float32)
+        digest.update(chunk.tobytes())
+    digest.update(np.asarray(y).astype(bool).tobytes())
+    return digest.hexdigest()
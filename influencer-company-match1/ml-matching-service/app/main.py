@@ -2,15 +2,40 @@
 AI Matching ML Service
 Provides machine learning predictions for influencer-company matching
 """
+import asyncio
 import os
-from fastapi import FastAPI, HTTPException
+import threading
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Dict, List, Any, Optional
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field
+from typing import Dict, List, Any, Literal, Optional
 import logging
 import numpy as np
 
-from app.models.match_predictor import MatchPredictor
+from app.models.match_predictor import FEATURE_NAMES, HYPERPARAMETERS, MatchPredictor
+from app.model_registry import ModelRegistry, load_artifact
+from app.model_sync import ActiveModelWatcher
+from app.tenant_models import TenantModelCache, validate_tenant_id
+from app.default_model import BUNDLED_MODEL_DIR, BUNDLED_VERSION
+from app.training_jobs import TrainingJobManager
+from app.sample_store import SampleStore, read_samples
+from app.fingerprint import dataset_fingerprint
+from app.models.hyperparameter_search import SEARCH_SPACE
+from app.prediction_cache import PredictionCache
+from app.micro_batching import MicroBatcher
+from app.shadow_scoring import ShadowScorer
+from app.candidate_index import CandidateStore, validate_group
+from app.metrics import Metrics, MetricsMiddleware
+from app.profiling import ProfilerMiddleware, SamplingProfiler, require_admin
+from app.response_encoding import ModelResponseMeta
+from app.ranking import select_top_k
+from app.stream_scoring import DEFAULT_CHUNK_SIZE, ThroughputMeter, aiter_chunks, score_lines
+from app.binary_io import (
+    ARROW_CONTENT_TYPE, NPY_CONTENT_TYPE, BinaryFormatError,
+    media_type, read_matrix, write_arrow, write_npy
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -32,50 +57,239 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize ML model
-match_predictor = MatchPredictor()
-
-# Auto-train with initial sample data on startup
-def initialize_model():
-    """Initialize model with sample training data"""
-    logger.info("Initializing ML model with sample data...")
-    
-    # Sample training data (realistic match scenarios)
-    sample_features = [
-        [0.9, 0.85, 0.8, 0.9, 0.7, 0.8, 0.85, 0.9],  # High success
-        [0.85, 0.9, 0.75, 0.85, 0.8, 0.85, 0.8, 0.85],  # High success
-        [0.8, 0.8, 0.85, 0.8, 0.75, 0.9, 0.9, 0.8],  # High success
-        [0.75, 0.85, 0.9, 0.75, 0.85, 0.75, 0.85, 0.75],  # High success
-        [0.9, 0.75, 0.8, 0.9, 0.8, 0.8, 0.75, 0.9],  # High success
-        [0.4, 0.3, 0.35, 0.4, 0.3, 0.35, 0.4, 0.3],  # Low success
-        [0.3, 0.4, 0.3, 0.35, 0.4, 0.3, 0.35, 0.4],  # Low success
-        [0.35, 0.35, 0.4, 0.3, 0.35, 0.4, 0.3, 0.35],  # Low success
-        [0.4, 0.3, 0.35, 0.4, 0.3, 0.35, 0.4, 0.3],  # Low success
-        [0.3, 0.4, 0.3, 0.35, 0.4, 0.3, 0.35, 0.4],  # Low success
-        [0.6, 0.65, 0.6, 0.65, 0.6, 0.65, 0.6, 0.65],  # Medium success
-        [0.65, 0.6, 0.65, 0.6, 0.65, 0.6, 0.65, 0.6],  # Medium success
-    ]
+# Request counts, errors and latency per endpoint and stage, served at
+# /metrics; stage timings are also sent back in a Server-Timing header
+metrics = Metrics('ml_matching')
+app.add_middleware(
+    MetricsMiddleware,
+    metrics=metrics,
+    server_timing=os.getenv('SERVER_TIMING', 'true').lower() != 'false'
+)
+
+# Sampling profiler, armed for the next N requests via /admin/profile
+profiler = SamplingProfiler()
+app.add_middleware(ProfilerMiddleware, profiler=profiler)
+
+# Versioned model artifacts on local disk
+MODEL_REGISTRY_DIR = os.getenv(
+    'MODEL_REGISTRY_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'artifacts')
+)
+registry = ModelRegistry(MODEL_REGISTRY_DIR)
+
+# Build the per-node feature contribution table (?explain=true) when a
+# model is loaded rather than on the first explained request. Off by
+# default: the table is private to each worker, not shared like the
+# memory-mapped model, and several times the model's size
+EXPLAIN_PRECOMPUTE = os.getenv('EXPLAIN_PRECOMPUTE', 'false').lower() == 'true'
+
+# Per-tenant registries under TENANT_MODELS_DIR/<tenant>, selected with the
+# X-Tenant-Id header or a tenantId field. Only recently used tenant models
+# stay loaded, within TENANT_MODEL_MEMORY_MB; tenants without a model of
+# their own are served the default one
+TENANT_MODELS_DIR = os.getenv('TENANT_MODELS_DIR', os.path.join(MODEL_REGISTRY_DIR, 'tenants'))
+tenant_models = TenantModelCache(
+    TENANT_MODELS_DIR,
+    max_bytes=int(float(os.getenv('TENANT_MODEL_MEMORY_MB', 256)) * 1024 * 1024),
+    recheck_interval=float(os.getenv('TENANT_MODEL_RECHECK_SECONDS', 1.0)),
+    precompute_explain=EXPLAIN_PRECOMPUTE
+)
+
+# Labelled outcomes kept between training runs, so /train only has to
+# send new ones
+SAMPLE_STORE_DIR = os.getenv(
+    'SAMPLE_STORE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'samples')
+)
+sample_store = SampleStore(SAMPLE_STORE_DIR, FEATURE_NAMES)
+
+# Live predictor, loaded lazily on first use (see ensure_model_loaded)
+match_predictor: Optional[MatchPredictor] = None
+active_version: Optional[str] = None
+_model_lock = threading.Lock()
+
+# Start loading the model in the background as soon as the app starts
+MODEL_PRELOAD = os.getenv('MODEL_PRELOAD', 'true').lower() != 'false'
+
+# Model type used for training runs when no model is loaded yet
+DEFAULT_MODEL_TYPE = os.getenv('MODEL_TYPE', 'random_forest')
+
+# Cores a training process may use (forest fitting, boosting's OpenMP
+# threads); by default one core is left to serving
+TRAINING_THREADS = int(os.getenv('TRAINING_THREADS', max(1, (os.cpu_count() or 1) - 1)))
+
+# Upper bound on processes a hyperparameter search may use
+SEARCH_WORKERS = int(os.getenv('SEARCH_WORKERS', TRAINING_THREADS))
+
+# Upper bound on rows accepted by /predict/batch in a single request
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 1000))
+
+# Upper bound on rows accepted by the binary matrix endpoints
+MAX_MATRIX_ROWS = int(os.getenv('MAX_MATRIX_ROWS', 2000000))
+
+# Repeat scoring of the same pair is served from this cache; entries are
+# keyed by model version and dropped whenever the live model changes
+prediction_cache = PredictionCache(
+    max_size=int(os.getenv('PREDICTION_CACHE_SIZE', 10000)),
+    ttl=float(os.getenv('PREDICTION_CACHE_TTL', 3600)),
+    quantum=float(os.getenv('PREDICTION_CACHE_QUANTUM', 1e-4))
+)
+
+# Opt-in coalescing of concurrent /predict requests into one vectorized
+# call: rows wait up to PREDICT_BATCH_WINDOW_MS for others to join
+PREDICT_BATCHING = os.getenv('PREDICT_BATCHING', 'false').lower() == 'true'
+PREDICT_BATCH_WINDOW_MS = float(os.getenv('PREDICT_BATCH_WINDOW_MS', 2))
+PREDICT_BATCH_MAX_SIZE = int(os.getenv('PREDICT_BATCH_MAX_SIZE', 64))
+
+
+# Seconds between checks of the registry's ACTIVE pointer. Set it when
+# running several uvicorn workers: model switches are then published
+# through ACTIVE and every worker changes over at the same moment (0: off)
+MODEL_SYNC_INTERVAL = float(os.getenv('MODEL_SYNC_INTERVAL', 0))
+
+# A candidate version set with /models/{version}/shadow scores this share
+# of /predict traffic in a background thread, after the response is sent
+shadow_scorer = ShadowScorer(
+    sample_rate=float(os.getenv('SHADOW_SAMPLE_RATE', 0.1)),
+    queue_size=int(os.getenv('SHADOW_QUEUE_SIZE', 1000))
+)
+
+# Profile vectors per user group (e.g. 'influencer', 'company'), searched
+# for the shortlist that /rank then scores. Every worker holds the indexes
+# in memory and replays the changes other workers logged under
+# CANDIDATE_INDEX_DIR before serving them
+CANDIDATE_INDEX_DIR = os.getenv(
+    'CANDIDATE_INDEX_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'candidates')
+)
+candidate_store = CandidateStore(CANDIDATE_INDEX_DIR)
+
+def install_model(version: str, predictor: MatchPredictor) -> None:
+    """
+    Make a loaded predictor live in this process
     
-    sample_outcomes = [
-        True, True, True, True, True,  # Successful matches
-        False, False, False, False, False,  # Failed matches
-        True, True  # Medium matches
-    ]
+    A single global rebinding: requests already in flight keep the
+    predictor they started with, new requests see the new one.
+    """
+    global match_predictor, active_version
+    # Build the contribution table before the model takes traffic
+    if EXPLAIN_PRECOMPUTE:
+        _ = predictor.engine.path_contributions
+    match_predictor, active_version = predictor, version
+    prediction_cache.clear()
+
+model_watcher = ActiveModelWatcher(
+    registry,
+    install=install_model,
+    current_version=lambda: active_version,
+    interval=MODEL_SYNC_INTERVAL
+) if MODEL_SYNC_INTERVAL > 0 else None
+
+def activate_model(version: str) -> MatchPredictor:
+    """
+    Load a registry version and make it the live predictor
+    
+    With model sync on, the switch is published to every worker instead
+    and takes effect (here too) at the published switch time.
+    """
+    predictor = registry.load(version)
+    if model_watcher is not None:
+        model_watcher.publish(version)
+        return predictor
+    
+    install_model(version, predictor)
+    registry.set_active(version)
+    logger.info("Activated model version %s", version)
+    return predictor
+
+def load_initial_model() -> bool:
+    """Serve the registry's active version, or the bundled default artifact"""
+    version = registry.get_active()
+    if version is not None:
+        try:
+            install_model(version, registry.load(version))
+            logger.info("Serving model version %s", version)
+            return True
+        except Exception as e:
+            logger.error("Failed to load model version %s: %s", version, e)
     
     try:
-        # Convert to numpy arrays
-        X = np.array(sample_features)
-        y = np.array(sample_outcomes)
-        
-        metrics = match_predictor.train(X, y)
-        logger.info(f"Model initialized successfully. Accuracy: {metrics['accuracy']:.3f}")
+        install_model(BUNDLED_VERSION, load_artifact(BUNDLED_MODEL_DIR))
+        logger.info("Serving bundled default model")
         return True
     except Exception as e:
-        logger.error(f"Failed to initialize model: {e}")
+        logger.error("Failed to load bundled default model: %s", e)
         return False
 
-# Initialize on startup
-initialize_model()
+def ensure_model_loaded() -> bool:
+    """Load the initial model once; returns whether a model is available"""
+    if match_predictor is None:
+        with _model_lock:
+            if match_predictor is None:
+                load_initial_model()
+    return match_predictor is not None
+
+def resolve_tenant(field: Optional[str], header: Optional[str]) -> Optional[str]:
+    """The request's tenant id (a body field wins over the header), validated"""
+    tenant = field if field is not None else header
+    if tenant is None:
+        return None
+    try:
+        return validate_tenant_id(tenant)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def get_predictor(tenant: Optional[str] = None) -> MatchPredictor:
+    """The tenant's live predictor, else the default one, loading it on first use"""
+    if tenant is not None:
+        try:
+            found, predictor = tenant_models.cached(tenant)
+            if not found:
+                # Checking the tenant's registry, and loading its model, reads disk
+                predictor = await asyncio.to_thread(tenant_models.get, tenant)
+        except Exception as e:
+            logger.error("Failed to load model for tenant %s: %s", tenant, e)
+            raise HTTPException(status_code=503, detail=f"Model for tenant {tenant} could not be loaded")
+        if predictor is not None:
+            return predictor
+    predictor = match_predictor
+    if predictor is None:
+        ensure_model_loaded()
+        predictor = match_predictor
+        if predictor is None:
+            raise HTTPException(status_code=503, detail="Model not loaded")
+    return predictor
+
+@app.on_event("startup")
+async def preload_model():
+    """Load the model off the event loop so startup is not blocked"""
+    if MODEL_PRELOAD:
+        asyncio.get_running_loop().run_in_executor(None, ensure_model_loaded)
+    if model_watcher is not None:
+        model_watcher.start()
+
+def activate_trained_model(version: str, metrics: Dict[str, float], job) -> None:
+    """Make the model saved by a finished training job live"""
+    if job.tenant is not None:
+        tenant_models.activate(job.tenant, version)
+    else:
+        activate_model(version)
+    logger.info("Training job %s produced version %s. Accuracy: %.3f", job.id, version, metrics['accuracy'])
+
+training_jobs = TrainingJobManager(
+    registry_root=registry.root,
+    on_complete=activate_trained_model,
+    max_workers=int(os.getenv('TRAINING_WORKERS', 1)),
+    threads=TRAINING_THREADS
+)
+
+@app.on_event("shutdown")
+async def shutdown_training_jobs():
+    """Stop background training workers"""
+    training_jobs.shutdown()
+    shadow_scorer.stop()
+    if model_watcher is not None:
+        model_watcher.stop()
 
 # Request/Response Models
 class MatchFeatures(BaseModel):
@@ -87,23 +301,127 @@ class MatchFeatures(BaseModel):
     budgetAlignment: Optional[float] = 0.5
     contentQuality: Optional[float] = 0.5
     responseRate: Optional[float] = 0.5
+    # Score with this tenant's model (overrides the X-Tenant-Id header)
+    tenantId: Optional[str] = None
 
 class PredictionResponse(BaseModel):
     score: float
     confidence: float
     successProbability: float
+    # With ?explain=true: score before any feature, and each feature's share
+    # of the difference (score points, summing to score - baseScore)
+    baseScore: Optional[float] = None
+    contributions: Optional[Dict[str, float]] = None
+    featureImportance: Dict[str, float]
+
+class BatchPredictionRequest(BaseModel):
+    features: List[MatchFeatures]
+    tenantId: Optional[str] = None
+
+class BatchPredictionItem(BaseModel):
+    score: float
+    confidence: float
+    successProbability: float
+    contributions: Optional[Dict[str, float]] = None
+
+class BatchPredictionResponse(BaseModel):
+    predictions: List[BatchPredictionItem]
+    baseScore: Optional[float] = None
+    featureImportance: Dict[str, float]
+
+class RankCandidate(BaseModel):
+    id: str
+    features: MatchFeatures
+
+class RankRequest(BaseModel):
+    candidates: List[RankCandidate]
+    k: int = Field(default=20, ge=1)
+    minScore: Optional[float] = Field(default=None, ge=0, le=100)
+    tenantId: Optional[str] = None
+
+class RankedCandidate(BaseModel):
+    id: str
+    score: float
+    confidence: float
+    successProbability: float
+    contributions: Optional[Dict[str, float]] = None
+
+class RankResponse(BaseModel):
+    results: List[RankedCandidate]
+    totalCandidates: int
+    baseScore: Optional[float] = None
     featureImportance: Dict[str, float]
 
+class SearchOptions(BaseModel):
+    budgetSeconds: float = Field(default=60, gt=0, le=3600)
+    maxWorkers: Optional[int] = Field(default=None, ge=1)
+    folds: int = Field(default=5, ge=2, le=10)
+
+class CompactionOptions(BaseModel):
+    # Largest held-out accuracy drop accepted when dropping trees
+    maxAccuracyLoss: float = Field(default=0.005, ge=0, le=0.1)
+    minTrees: int = Field(default=10, ge=1)
+    holdoutFraction: float = Field(default=0.2, ge=0.05, le=0.5)
+
 class TrainingData(BaseModel):
-    features: List[Dict[str, float]]
-    outcomes: List[bool]
+    features: List[Dict[str, float]] = Field(default_factory=list)
+    outcomes: List[bool] = Field(default_factory=list)
+    # With pair ids the rows are also kept in the sample store
+    pairIds: Optional[List[str]] = None
+    # Train on everything in the sample store (after adding these rows)
+    fromStore: bool = False
+    # Pick hyperparameters by cross-validated search within a time budget
+    search: Optional[SearchOptions] = None
+    # Drop the least useful trees after training
+    compaction: Optional[CompactionOptions] = None
+    # 'incremental' updates the live model with just these outcomes
+    mode: Literal['full', 'incremental'] = 'full'
+    newEstimators: int = Field(default=10, ge=1, le=500)
+    maxEstimators: Optional[int] = Field(default=None, ge=1, le=5000)
+    # Train (and activate) a model for this tenant only
+    tenantId: Optional[str] = None
+
+class TrainingSample(BaseModel):
+    pairId: str
+    features: Dict[str, float]
+    outcome: bool
+    timestamp: Optional[float] = None
+
+class SampleBatch(BaseModel):
+    samples: List[TrainingSample]
+
+class SampleBatchResponse(BaseModel):
+    added: int
+    updated: int
+    total: int
 
-class TrainingResponse(BaseModel):
+class TrainingJobResponse(BaseModel):
+    jobId: str
     status: str
-    metrics: Dict[str, float]
     samples: int
-    modelVersion: str
-    timestamp: str
+    statusUrl: str
+    # Set when the inputs matched an existing version and nothing was trained
+    skipped: bool = False
+    modelVersion: Optional[str] = None
+
+class TrainingJobStatus(BaseModel):
+    jobId: str
+    status: str
+    stage: str
+    progress: float
+    modelType: str
+    mode: str
+    baseVersion: Optional[str] = None
+    tenantId: Optional[str] = None
+    skipped: bool = False
+    samples: int
+    metrics: Optional[Dict[str, float]] = None
+    search: Optional[Dict[str, Any]] = None
+    modelVersion: Optional[str] = None
+    error: Optional[str] = None
+    createdAt: str
+    startedAt: Optional[str] = None
+    finishedAt: Optional[str] = None
 
 class HealthResponse(BaseModel):
     model_config = {'protected_namespaces': ()}
@@ -112,139 +430,1114 @@ class HealthResponse(BaseModel):
     service: str
     model_loaded: bool
 
+class ReadinessResponse(BaseModel):
+    model_config = {'protected_namespaces': ()}
+    
+    ready: bool
+    model_version: Optional[str] = None
+
+def to_feature_vector(features: MatchFeatures) -> List[float]:
+    """Convert request features to a row in FEATURE_NAMES order"""
+    return [
+        features.nicheAlignment,
+        features.audienceMatch,
+        features.engagementRate,
+        features.brandFit,
+        features.locationMatch,
+        features.budgetAlignment,
+        features.contentQuality,
+        features.responseRate
+    ]
+
+def get_response_meta(predictor: MatchPredictor) -> ModelResponseMeta:
+    """Per-model response metadata, built on first use and kept on the predictor"""
+    meta = predictor.response_meta
+    if meta is None:
+        meta = predictor.response_meta = ModelResponseMeta(predictor, FEATURE_NAMES)
+    return meta
+
+def get_feature_importance_dict(predictor: MatchPredictor) -> Dict[str, float]:
+    """Map the model's feature importances onto feature names"""
+    return get_response_meta(predictor).feature_importance
+
+def score_rows(predictor: MatchPredictor, X: np.ndarray):
+    """
+    Score a feature matrix, serving repeat rows from the prediction cache
+    
+    Only rows missing from the cache reach the model, and they are scored
+    together in one vectorized pass.
+    
+    Returns:
+        Tuple of (success probabilities, confidence) arrays
+    """
+    if not prediction_cache.enabled:
+        return predictor.predict_proba_batch(X)
+    
+    # Tenant registries number their versions independently
+    keys = prediction_cache.keys_for((predictor.tenant, predictor.version), X)
+    probabilities = np.empty(len(keys))
+    confidence = np.empty(len(keys))
+    
+    missing = []
+    for i, key in enumerate(keys):
+        cached = prediction_cache.get(key)
+        if cached is None:
+            missing.append(i)
+        else:
+            probabilities[i], confidence[i] = cached
+    
+    if missing:
+        new_probabilities, new_confidence = predictor.predict_proba_batch(X[missing])
+        probabilities[missing] = new_probabilities
+        confidence[missing] = new_confidence
+        for i, probability, conf in zip(missing, new_probabilities.tolist(), new_confidence.tolist()):
+            prediction_cache.put(keys[i], (probability, conf))
+    
+    return probabilities, confidence
+
+def explain_rows(predictor: MatchPredictor, X: np.ndarray):
+    """
+    Score a feature matrix with per-feature contributions
+    
+    Bypasses the prediction cache, which only holds scores. Contributions
+    are in score points (0-100), rounded like the scores.
+    
+    Returns:
+        Tuple of (success probabilities, confidence, base score,
+        per-row {feature: contribution} dicts)
+    """
+    probabilities, confidence, base, contributions = predictor.explain_batch(X)
+    rows = [dict(zip(FEATURE_NAMES, row)) for row in np.round(contributions * 100, 2).tolist()]
+    return probabilities, confidence, round(base * 100, 2), rows
+
+micro_batcher = MicroBatcher(
+    score_rows,
+    window=PREDICT_BATCH_WINDOW_MS / 1000,
+    max_batch_size=PREDICT_BATCH_MAX_SIZE
+) if PREDICT_BATCHING else None
+
+def collect_service_metrics():
+    """Model, cache and micro-batching gauges read at scrape time"""
+    cache = prediction_cache.stats()
+    families = [
+        ('model_info', 'gauge', 'Active model version and type', [
+            ({'version': active_version or '', 'type': getattr(match_predictor, 'model_type', '') or ''},
+             1 if match_predictor is not None else 0)
+        ]),
+        ('prediction_cache_entries', 'gauge', 'Rows in the prediction cache', [({}, cache['size'])]),
+    ]
+    for name in ('hits', 'misses', 'evictions', 'expirations', 'invalidations'):
+        families.append((f'prediction_cache_{name}_total', 'counter', f'Prediction cache {name}', [({}, cache[name])]))
+    if shadow_scorer.enabled:
+        shadow = shadow_scorer.stats()
+        families += [
+            ('shadow_scored_total', 'counter', 'Requests scored by the shadow model',
+             [({'version': shadow['candidateVersion']}, shadow['scored'])]),
+            ('shadow_dropped_total', 'counter', 'Shadow samples dropped on a full queue',
+             [({'version': shadow['candidateVersion']}, shadow['dropped'])]),
+            ('shadow_agreement_ratio', 'gauge', 'Share of shadowed requests where both models make the same call',
+             [({'version': shadow['candidateVersion']}, shadow['agreement'] or 0.0)]),
+            ('shadow_score_delta_mean_abs', 'gauge', 'Mean absolute score difference, shadow minus live (0-100)',
+             [({'version': shadow['candidateVersion']}, shadow['scoreDelta']['meanAbs'] or 0.0)]),
+        ]
+    if micro_batcher is not None:
+        families += [
+            ('micro_batches_total', 'counter', 'Micro-batches scored', [({}, micro_batcher.batches)]),
+            ('micro_batch_requests_total', 'counter', 'Requests scored in micro-batches', [({}, micro_batcher.requests)]),
+            ('micro_batch_queue_wait_seconds_total', 'counter', 'Time requests waited for their micro-batch',
+             [({}, micro_batcher.queue_wait_seconds)]),
+        ]
+    candidate_indexes = candidate_store.loaded()
+    if candidate_indexes:
+        families += [
+            ('candidate_index_size', 'gauge', 'Profile vectors in the candidate index',
+             [({'group': group}, len(index)) for group, index in candidate_indexes.items()]),
+            ('candidate_searches_total', 'counter', 'Candidate index searches',
+             [({'group': group}, index.searches) for group, index in candidate_indexes.items()]),
+            ('candidate_search_seconds_total', 'counter', 'Time spent searching the candidate index',
+             [({'group': group}, index.search_seconds) for group, index in candidate_indexes.items()]),
+        ]
+    tenants = tenant_models.stats()
+    families += [
+        ('tenant_models_resident', 'gauge', 'Tenant models loaded in memory', [({}, tenants['tenants'])]),
+        ('tenant_models_resident_bytes', 'gauge', 'Array bytes of the loaded tenant models',
+         [({}, tenants['residentBytes'])]),
+        ('tenant_model_loads_total', 'counter', 'Tenant models loaded from disk', [({}, tenant_models.loads)]),
+        ('tenant_model_load_seconds_total', 'counter', 'Time spent loading tenant models',
+         [({}, tenant_models.load_seconds)]),
+        ('tenant_model_evictions_total', 'counter', 'Tenant models evicted from memory',
+         [({}, tenant_models.evictions)]),
+        ('tenant_model_fallbacks_total', 'counter', 'Tenant requests served by the default model',
+         [({}, tenant_models.fallbacks)]),
+    ]
+    return families
+
+metrics.add_collector(collect_service_metrics)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Request, stage latency, model and cache metrics in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+class ProfileRequest(BaseModel):
+    requests: int = Field(default=100, ge=1, le=100000)
+    intervalMs: float = Field(default=1.0, ge=0.1, le=1000)
+
+@app.post("/admin/profile", dependencies=[Depends(require_admin)])
+async def start_profile(request: ProfileRequest):
+    """Sample the stack during the next N requests (requires X-Admin-Token)"""
+    profiler.arm(request.requests, request.intervalMs / 1000)
+    logger.info("Profiling the next %d requests", request.requests)
+    return profiler.status()
+
+@app.get("/admin/profile", dependencies=[Depends(require_admin)])
+async def profile_status():
+    """State and sample count of the current or last profile"""
+    return profiler.status()
+
+@app.get("/admin/profile/collapsed", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def profile_collapsed():
+    """Samples so far as collapsed stacks (flamegraph.pl, speedscope)"""
+    return PlainTextResponse(profiler.collapsed())
+
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint"""
     return HealthResponse(
         status="healthy",
         service="ml-matching-service",
-        model_loaded=match_predictor.is_trained()
+        model_loaded=match_predictor is not None
     )
 
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and serving HTTP"""
+    return {"status": "alive"}
+
+@app.get("/health/ready", response_model=ReadinessResponse)
+async def readiness(response: Response):
+    """Readiness probe: a model is loaded and predictions can be served"""
+    ready = ensure_model_loaded()
+    if not ready:
+        response.status_code = 503
+    return ReadinessResponse(ready=ready, model_version=active_version)
+
 @app.post("/predict", response_model=PredictionResponse)
-async def predict_match(features: MatchFeatures):
+async def predict_match(
+    features: MatchFeatures,
+    explain: bool = Query(default=False),
+    x_tenant_id: Optional[str] = Header(default=None)
+):
     """
     Predict match success probability
     
     Args:
         features: Match features (niche alignment, audience match, etc.)
+        explain: Also return each feature's contribution to this score
+        x_tenant_id: Tenant whose model scores the request (X-Tenant-Id)
         
     Returns:
         Prediction with score, confidence, and feature importance
     """
+    stages = metrics.stage_timer("/predict")
+    # Pin the live predictor so a concurrent model swap can't mix versions
+    predictor = await get_predictor(resolve_tenant(features.tenantId, x_tenant_id))
+    
     try:
-        # Convert features to list format
-        feature_vector = [
-            features.nicheAlignment,
-            features.audienceMatch,
-            features.engagementRate,
-            features.brandFit,
-            features.locationMatch,
-            features.budgetAlignment,
-            features.contentQuality,
-            features.responseRate
-        ]
-        
-        # Get prediction
-        prediction = match_predictor.predict([feature_vector])
-        
-        # Get feature importance
-        importance = match_predictor.get_feature_importance()
-        feature_names = [
-            'nicheAlignment', 'audienceMatch', 'engagementRate', 'brandFit',
-            'locationMatch', 'budgetAlignment', 'contentQuality', 'responseRate'
-        ]
-        
-        feature_importance_dict = {}
-        if importance:
-            for i, name in enumerate(feature_names):
-                if i < len(importance):
-                    feature_importance_dict[name] = float(importance[i])
+        # Get prediction, coalesced with concurrent requests when enabled
+        row = to_feature_vector(features)
+        stages.mark("validation")
+        contributions = base_score = None
+        if explain:
+            probabilities, confidences, base_score, contributions = explain_rows(
+                predictor, np.array([row], dtype=np.float64)
+            )
+            probability, confidence = float(probabilities[0]), float(confidences[0])
+            contributions = contributions[0]
+        elif micro_batcher is not None:
+            probability, confidence, _ = await micro_batcher.predict(predictor, row)
+        else:
+            probabilities, confidences = score_rows(predictor, np.array([row], dtype=np.float64))
+            probability, confidence = float(probabilities[0]), float(confidences[0])
+        stages.mark("predict")
         
         # Calculate score (0-100)
-        probability = prediction['probabilities'][0]
         score = probability * 100
-        confidence = prediction['confidence'][0] * 100
+        confidence = confidence * 100
         
-        return PredictionResponse(
-            score=round(score, 1),
-            confidence=round(confidence, 1),
-            successProbability=round(probability * 100, 1),
-            featureImportance=feature_importance_dict
+        meta = get_response_meta(predictor)
+        stages.mark("importance")
+        body = meta.prediction_body(
+            round(score, 1),
+            round(confidence, 1),
+            round(probability * 100, 1),
+            contributions,
+            base_score
         )
+        stages.mark("serialization")
+        
+        # Shadow scoring only starts once the response has been sent
+        background = None
+        if predictor.tenant is None and shadow_scorer.should_sample(predictor):
+            background = BackgroundTask(shadow_scorer.submit, row, probability, predictor.version)
+        return Response(content=body, media_type="application/json", background=background)
         
     except Exception as e:
-        logger.error(f"Prediction error: {str(e)}")
+        logger.error("Prediction error: %s", e)
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
-@app.post("/train", response_model=TrainingResponse)
-async def train_model(data: TrainingData):
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_batch(
+    request: BatchPredictionRequest,
+    explain: bool = Query(default=False),
+    x_tenant_id: Optional[str] = Header(default=None)
+):
     """
-    Train the ML model with new data
+    Predict match success probability for many candidates at once
+    
+    All rows are stacked into a single (N, 8) matrix and scored with one
+    predict_proba call, so N candidates cost one round trip and one pass
+    over the forest. With explain, the same pass also yields every row's
+    feature contributions.
     
     Args:
-        data: Training features and outcomes
+        request: List of match features, one entry per candidate
+        explain: Also return per-row feature contributions
+        
+    Returns:
+        Per-row predictions (in request order) and shared feature importance
+    """
+    if not request.features:
+        raise HTTPException(status_code=400, detail="At least one feature row required")
+    if len(request.features) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch size {len(request.features)} exceeds limit of {MAX_BATCH_SIZE}"
+        )
+    
+    stages = metrics.stage_timer("/predict/batch")
+    predictor = await get_predictor(resolve_tenant(request.tenantId, x_tenant_id))
+    
+    try:
+        X = np.array([to_feature_vector(f) for f in request.features], dtype=np.float64)
+        stages.mark("validation")
+        
+        contributions = base_score = None
+        if explain:
+            probabilities, confidence, base_score, contributions = explain_rows(predictor, X)
+        else:
+            probabilities, confidence = score_rows(predictor, X)
+        stages.mark("predict")
+        
+        meta = get_response_meta(predictor)
+        stages.mark("importance")
+        
+        # Round the whole batch at once rather than per row
+        scores = np.round(probabilities * 100, 1).tolist()
+        confidences = np.round(confidence * 100, 1).tolist()
+        
+        body = meta.batch_body(scores, confidences, contributions, base_score)
+        stages.mark("serialization")
+        return Response(content=body, media_type="application/json")
+        
+    except Exception as e:
+        logger.error("Batch prediction error: %s", e)
+        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+
+@app.post("/rank", response_model=RankResponse)
+async def rank_candidates(
+    request: RankRequest,
+    explain: bool = Query(default=False),
+    x_tenant_id: Optional[str] = Header(default=None)
+):
+    """
+    Score a candidate pool and return only the top-K
+    
+    All candidates are scored in one batch, then np.argpartition picks the
+    k best without sorting the whole pool. Candidates scoring below
+    minScore (0-100) are dropped here and never sent back. With explain,
+    feature contributions are computed for the returned candidates only.
+    
+    Args:
+        request: Candidate ids with their features, k, and optional minScore
+        explain: Also return each returned candidate's feature contributions
+        
+    Returns:
+        Up to k candidates ordered by descending score
+    """
+    if not request.candidates:
+        raise HTTPException(status_code=400, detail="At least one candidate required")
+    if len(request.candidates) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Candidate count {len(request.candidates)} exceeds limit of {MAX_BATCH_SIZE}"
+        )
+    
+    stages = metrics.stage_timer("/rank")
+    predictor = await get_predictor(resolve_tenant(request.tenantId, x_tenant_id))
+    
+    try:
+        X = np.array([to_feature_vector(c.features) for c in request.candidates], dtype=np.float64)
+        stages.mark("validation")
+        probabilities, confidence = score_rows(predictor, X)
         
+        scores = np.round(probabilities * 100, 1)
+        top = select_top_k(scores, request.k, request.minScore)
+        contributions = base_score = None
+        if explain and len(top):
+            _, _, base_score, contributions = explain_rows(predictor, X[top])
+        stages.mark("predict")
+        
+        meta = get_response_meta(predictor)
+        stages.mark("importance")
+        body = meta.rank_body(
+            [request.candidates[i].id for i in top.tolist()],
+            scores[top].tolist(),
+            np.round(confidence[top] * 100, 1).tolist(),
+            len(request.candidates),
+            contributions,
+            base_score
+        )
+        stages.mark("serialization")
+        return Response(content=body, media_type="application/json")
+        
+    except Exception as e:
+        logger.error("Ranking error: %s", e)
+        raise HTTPException(status_code=500, detail=f"Ranking failed: {str(e)}")
+
+async def read_request_matrix(request: Request, columns: List[str]) -> np.ndarray:
+    """Decode a binary matrix body, mapping format problems to HTTP errors"""
+    body = await request.body()
+    try:
+        matrix = read_matrix(body, request.headers.get('content-type'), columns)
+    except BinaryFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if len(matrix) > MAX_MATRIX_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Matrix has {len(matrix)} rows, limit is {MAX_MATRIX_ROWS}"
+        )
+    return matrix
+
+@app.post("/predict/matrix")
+async def predict_matrix(request: Request, x_tenant_id: Optional[str] = Header(default=None)):
+    """
+    Score a raw float matrix for offline bulk jobs
+    
+    The body is either an .npy array (Content-Type: application/x-npy) of
+    shape (N, 8) in FEATURE_NAMES column order, or an Arrow IPC stream
+    (Content-Type: application/vnd.apache.arrow.stream) with one column per
+    feature. The .npy payload is wrapped without copying; there is no
+    per-row Pydantic validation or JSON.
+    
     Returns:
-        Training metrics and model version
+        float32 success probabilities in the request's format: an (N,)
+        .npy vector, or an Arrow stream with a successProbability column
     """
+    stages = metrics.stage_timer("/predict/matrix")
+    predictor = await get_predictor(resolve_tenant(None, x_tenant_id))
+    X = await read_request_matrix(request, FEATURE_NAMES)
+    stages.mark("validation")
+    
     try:
-        if len(data.features) < 10:
+        probabilities, _ = await asyncio.to_thread(predictor.predict_proba_batch, X)
+        stages.mark("predict")
+    except Exception as e:
+        logger.error("Matrix prediction error: %s", e)
+        raise HTTPException(status_code=500, detail=f"Matrix prediction failed: {str(e)}")
+    
+    probabilities = probabilities.astype(np.float32)
+    if media_type(request.headers.get('content-type')) == ARROW_CONTENT_TYPE:
+        content, content_type = write_arrow({'successProbability': probabilities}), ARROW_CONTENT_TYPE
+    else:
+        content, content_type = write_npy(probabilities), NPY_CONTENT_TYPE
+    stages.mark("serialization")
+    return Response(content=content, media_type=content_type)
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that keeps reading the request body while it sends
+    
+    For ASGI servers older than spec 2.4, Starlette's StreamingResponse
+    listens for client disconnects on receive(), which swallows the request
+    body messages a streaming generator is still consuming. This variant
+    only streams.
+    """
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+@app.post("/predict/stream")
+async def predict_stream(
+    request: Request,
+    chunkSize: int = Query(default=DEFAULT_CHUNK_SIZE, ge=1, le=100000),
+    x_tenant_id: Optional[str] = Header(default=None)
+):
+    """
+    Score an NDJSON stream of {pairId, features} rows
+    
+    Rows are read chunkSize at a time, each chunk is scored with one
+    vectorized call, and results are streamed back as they are produced,
+    so memory stays constant however large the input is. The last line is
+    a summary with row counts and throughput in rows/sec.
+    """
+    predictor = await get_predictor(resolve_tenant(None, x_tenant_id))
+    
+    async def generate():
+        meter = ThroughputMeter()
+        async for chunk in aiter_chunks(request.stream(), chunkSize):
+            encoded, rows, errors = await asyncio.to_thread(score_lines, predictor, chunk)
+            meter.add(rows, errors)
+            yield encoded
+        
+        summary = meter.summary()
+        logger.info("Streamed %d rows at %.1f rows/sec", summary['rows'], summary['rowsPerSec'])
+        yield meter.summary_line()
+    
+    return DuplexStreamingResponse(generate(), media_type="application/x-ndjson")
+
+def features_matrix(features: List[Dict[str, float]]) -> np.ndarray:
+    """Stack feature dicts into a matrix in FEATURE_NAMES order"""
+    return np.array([
+        [feature_dict.get(name, 0.5) for name in FEATURE_NAMES]
+        for feature_dict in features
+    ], dtype=np.float64).reshape(len(features), len(FEATURE_NAMES))
+
+async def submit_training(
+    X: Optional[np.ndarray],
+    y: Optional[np.ndarray],
+    mode: str = 'full',
+    new_estimators: int = 10,
+    max_estimators: Optional[int] = None,
+    search: Optional[SearchOptions] = None,
+    compaction: Optional[CompactionOptions] = None,
+    tenant: Optional[str] = None
+):
+    """
+    Queue a full or incremental training run, unless it was already done
+    
+    A full run trains from scratch on X, y, or on the whole sample store
+    when X is None (the worker memory-maps it). An incremental run updates
+    the live model with only these rows, which requires its version to
+    have a stored estimator (the bundled default model does not). A full
+    run with search options picks its hyperparameters by cross-validated
+    search, on at most SEARCH_WORKERS processes, and compaction options
+    prune its trees within an accuracy budget.
+    
+    The inputs and settings are fingerprinted first; if a stored version
+    was trained on exactly the same ones, it is activated and returned as
+    a completed, skipped job instead of training again.
+    
+    With a tenant, the run is saved to and activated in that tenant's
+    registry; an incremental run then updates the tenant's own model.
+    
+    Returns:
+        The queued (or skipped) TrainingJob
+    """
+    if tenant is None:
+        target_registry = registry
+    elif tenant_models.has_models(tenant):
+        target_registry = tenant_models.registry(tenant)
+    else:
+        # A new tenant's registry is created once a job is queued, so a
+        # rejected request does not leave an empty tenant behind
+        target_registry = None
+    tenant_predictor = await asyncio.to_thread(tenant_models.get, tenant) if tenant is not None else None
+    
+    samples = pin = None
+    if X is None:
+        # Rows stay as snapshotted until the job releases the pin
+        pin = await asyncio.to_thread(sample_store.pin)
+        samples = pin.samples
+        if samples[2] < 10:
+            pin.release()
             raise HTTPException(
                 status_code=400,
-                detail="At least 10 training samples required"
+                detail=f"At least 10 stored samples required, the store has {samples[2]}"
             )
+        hash_X, hash_y, _ = read_samples(*samples)
+    else:
+        hash_X, hash_y = X, y
+    
+    # The queued job takes over the pin
+    try:
+        base_version = None
+        options = None
+        search_options = None
+        compaction_options = None
+        if mode == 'incremental':
+            if search is not None or compaction is not None:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Hyperparameter search and tree pruning are only available for full training runs"
+                )
+            predictor = tenant_predictor if tenant is not None else await get_predictor()
+            if predictor is None:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Tenant {tenant} has no model to update incrementally; run a full training first"
+                )
+            base_version = predictor.version
+            if base_version is None or not target_registry.has_estimator(base_version):
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Model version {base_version} cannot be updated incrementally; run a full training first"
+                )
+            if len(np.unique(y)) < 2:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Incremental updates need both successful and failed outcomes"
+                )
+            model_type = predictor.model_type
+            options = {'n_new_estimators': new_estimators, 'max_estimators': max_estimators}
+            params = {'modelType': model_type, 'baseVersion': base_version, 'options': options}
+        else:
+            if len(hash_y) < 10:
+                raise HTTPException(
+                    status_code=400,
+                    detail="At least 10 training samples required"
+                )
+            current = tenant_predictor or match_predictor
+            model_type = current.model_type if current is not None else DEFAULT_MODEL_TYPE
+            params = {'modelType': model_type, 'hyperparameters': HYPERPARAMETERS[model_type]}
+            if search is not None:
+                search_options = {
+                    'budget_seconds': search.budgetSeconds,
+                    'max_workers': min(search.maxWorkers or SEARCH_WORKERS, SEARCH_WORKERS),
+                    'folds': search.folds,
+                }
+                params['search'] = {'folds': search.folds, 'space': SEARCH_SPACE[model_type]}
+            if compaction is not None:
+                compaction_options = {
+                    'max_accuracy_loss': compaction.maxAccuracyLoss,
+                    'min_trees': compaction.minTrees,
+                    'holdout_fraction': compaction.holdoutFraction,
+                }
+                params['compaction'] = compaction_options
+    
+        fingerprint = await asyncio.to_thread(dataset_fingerprint, hash_X, hash_y, params)
+        version = target_registry.find_by_fingerprint(fingerprint) if target_registry is not None else None
+        if version is not None:
+            if tenant is not None:
+                if tenant_predictor is None or version != tenant_predictor.version:
+                    await asyncio.to_thread(tenant_models.activate, tenant, version)
+            elif version != active_version:
+                await asyncio.to_thread(activate_model, version)
+            meta = target_registry.get_meta(version)
+            if pin is not None:
+                pin.release()
+            return training_jobs.record_skipped(
+                model_type, len(hash_y), version, meta['metrics'], base_version,
+                search=meta.get('search'), tenant=tenant
+            )
+    
+        if target_registry is None:
+            target_registry = tenant_models.registry(tenant)
+        return training_jobs.submit(
+            X, y,
+            model_type=model_type,
+            base_version=base_version,
+            options=options,
+            samples=samples,
+            pin=pin,
+            fingerprint=fingerprint,
+            search=search_options,
+            compaction=compaction_options,
+            registry_root=target_registry.root,
+            tenant=tenant
+        )
+    except BaseException:
+        if pin is not None:
+            pin.release()
+        raise
+
+@app.post("/train", response_model=TrainingJobResponse, status_code=202)
+async def train_model(data: TrainingData, x_tenant_id: Optional[str] = Header(default=None)):
+    """
+    Queue a background training run with new data
+    
+    Training runs in a separate process, so predictions and health checks
+    are served normally while it runs. The new model is swapped in
+    atomically once training completes.
+    
+    With mode 'incremental', the live model is updated with just the
+    posted outcomes instead of being retrained on the full history:
+    random forests grow newEstimators trees on them and retire the oldest
+    (keeping at most maxEstimators), boosting appends newEstimators stages.
+    
+    Rows sent with pairIds are also added to the sample store, and with
+    fromStore the run trains on the whole store, so callers only need to
+    send outcomes the service has not seen yet. If the same inputs were
+    already trained on, no job runs and the response has skipped=true.
+    
+    With a tenantId (or X-Tenant-Id header) the model is trained for that
+    tenant alone. The sample store is shared, so tenant runs take their
+    rows from the request only.
+    
+    Args:
+        data: Training features and outcomes
         
+    Returns:
+        Job id and the URL to poll for progress and metrics
+    """
+    if len(data.features) != len(data.outcomes):
+        raise HTTPException(
+            status_code=400,
+            detail="features and outcomes must have the same length"
+        )
+    if data.pairIds is not None and len(data.pairIds) != len(data.outcomes):
+        raise HTTPException(
+            status_code=400,
+            detail="pairIds and outcomes must have the same length"
+        )
+    if data.fromStore and data.mode == 'incremental':
+        raise HTTPException(
+            status_code=400,
+            detail="fromStore trains from scratch and cannot be combined with incremental mode"
+        )
+    tenant = resolve_tenant(data.tenantId, x_tenant_id)
+    if tenant is not None and (data.pairIds or data.fromStore):
+        raise HTTPException(
+            status_code=400,
+            detail="The sample store is shared by all tenants; send tenant training rows without pairIds or fromStore"
+        )
+    
+    try:
         # Convert features to matrix format
-        X = []
-        for feature_dict in data.features:
-            X.append([
-                feature_dict.get('nicheAlignment', 0.5),
-                feature_dict.get('audienceMatch', 0.5),
-                feature_dict.get('engagementRate', 0.5),
-                feature_dict.get('brandFit', 0.5),
-                feature_dict.get('locationMatch', 0.5),
-                feature_dict.get('budgetAlignment', 0.5),
-                feature_dict.get('contentQuality', 0.5),
-                feature_dict.get('responseRate', 0.5)
-            ])
-        
-        y = data.outcomes
+        X = features_matrix(data.features)
+        y = np.array(data.outcomes, dtype=bool)
         
-        # Train model
-        metrics = match_predictor.train(X, y)
+        if data.pairIds:
+            await asyncio.to_thread(sample_store.add, data.pairIds, X, y)
+        if data.fromStore:
+            X = y = None
         
-        from datetime import datetime
-        timestamp = datetime.now().isoformat()
+        job = await submit_training(
+            X, y, data.mode, data.newEstimators, data.maxEstimators, data.search, data.compaction,
+            tenant=tenant
+        )
         
-        return TrainingResponse(
-            status="success",
-            metrics=metrics,
-            samples=len(y),
-            modelVersion="1.0.0",
-            timestamp=timestamp
+        return TrainingJobResponse(
+            jobId=job.id,
+            status=job.status,
+            samples=job.samples,
+            statusUrl=f"/train/{job.id}",
+            skipped=job.skipped,
+            modelVersion=job.model_version
         )
         
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Training error: {str(e)}")
+        logger.error("Training error: %s", e)
         raise HTTPException(status_code=500, detail=f"Training failed: {str(e)}")
 
+@app.post("/train/matrix", response_model=TrainingJobResponse, status_code=202)
+async def train_model_matrix(
+    request: Request,
+    mode: Literal['full', 'incremental'] = Query(default='full'),
+    newEstimators: int = Query(default=10, ge=1, le=500),
+    maxEstimators: Optional[int] = Query(default=None, ge=1, le=5000),
+    searchBudget: Optional[float] = Query(default=None, gt=0, le=3600),
+    x_tenant_id: Optional[str] = Header(default=None)
+):
+    """
+    Queue a background training run from a raw float matrix
+    
+    Same formats as /predict/matrix, with a ninth column holding the
+    outcome (1 = successful match, 0 = not): an (N, 9) .npy array, or an
+    Arrow stream with the feature columns plus an 'outcome' column.
+    The mode query parameters behave as in /train; searchBudget (seconds)
+    enables hyperparameter search with default options, and X-Tenant-Id
+    trains for that tenant.
+    """
+    tenant = resolve_tenant(None, x_tenant_id)
+    matrix = await read_request_matrix(request, FEATURE_NAMES + ['outcome'])
+    
+    X = matrix[:, :len(FEATURE_NAMES)]
+    y = matrix[:, len(FEATURE_NAMES)] > 0.5
+    
+    search = SearchOptions(budgetSeconds=searchBudget) if searchBudget is not None else None
+    job = await submit_training(X, y, mode, newEstimators, maxEstimators, search, tenant=tenant)
+    
+    return TrainingJobResponse(
+        jobId=job.id,
+        status=job.status,
+        samples=job.samples,
+        statusUrl=f"/train/{job.id}",
+        skipped=job.skipped,
+        modelVersion=job.model_version
+    )
+
+@app.post("/samples", response_model=SampleBatchResponse)
+async def add_samples(batch: SampleBatch):
+    """
+    Add labelled outcomes to the sample store without training
+    
+    Samples are deduplicated by pairId: posting a known pair again replaces
+    its stored features and outcome. Train on the store with
+    POST /train {"fromStore": true}.
+    """
+    if not batch.samples:
+        raise HTTPException(status_code=400, detail="At least one sample required")
+    
+    X = features_matrix([s.features for s in batch.samples])
+    y = np.array([s.outcome for s in batch.samples], dtype=bool)
+    timestamps = None
+    if all(s.timestamp is not None for s in batch.samples):
+        timestamps = [s.timestamp for s in batch.samples]
+    
+    try:
+        added, updated = await asyncio.to_thread(
+            sample_store.add, [s.pairId for s in batch.samples], X, y, timestamps
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return SampleBatchResponse(added=added, updated=updated, total=sample_store.count)
+
+@app.get("/samples/stats")
+async def sample_stats():
+    """Size and time range of the sample store"""
+    # Takes the store's write lock and scans its index
+    return await asyncio.to_thread(sample_store.stats)
+
+@app.get("/train/{job_id}", response_model=TrainingJobStatus)
+async def get_training_job(job_id: str):
+    """Report progress, and metrics once finished, for a training job"""
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Training job {job_id} not found")
+    return TrainingJobStatus(**job.to_dict())
+
+def model_summary(model_registry: ModelRegistry, version: str, live_version: Optional[str]) -> Dict[str, Any]:
+    """Listing entry for one stored version"""
+    meta = model_registry.get_meta(version)
+    return {
+        "version": version,
+        "type": meta['modelType'],
+        "trained": True,
+        "active": version == live_version,
+        "baseVersion": meta.get('baseVersion'),
+        "createdAt": meta['createdAt'],
+        "metrics": meta['metrics'],
+        "info": meta['info']
+    }
+
 @app.get("/models")
-async def list_models():
-    """List available models"""
+async def list_models(x_tenant_id: Optional[str] = Header(default=None)):
+    """List every model version in the registry, or in the X-Tenant-Id tenant's"""
+    tenant = resolve_tenant(None, x_tenant_id)
+    if tenant is not None:
+        has_models = tenant_models.has_models(tenant)
+        tenant_registry = tenant_models.registry(tenant) if has_models else None
+        tenant_active = tenant_registry.get_active() if has_models else None
+        return {
+            "tenantId": tenant,
+            "activeVersion": tenant_active,
+            "models": [
+                model_summary(tenant_registry, version, tenant_active)
+                for version in (tenant_registry.list_versions() if has_models else [])
+            ]
+        }
+    
+    models = [model_summary(registry, version, active_version) for version in registry.list_versions()]
     return {
-        "models": [
-            {
-                "version": "1.0.0",
-                "type": match_predictor.model_type,
-                "trained": match_predictor.is_trained(),
-                "info": match_predictor.get_model_info()
-            }
-        ]
+        "activeVersion": active_version,
+        "publishedVersion": registry.read_active()[0],
+        "sync": model_watcher.stats() if model_watcher is not None else {"enabled": False},
+        "models": models
+    }
+
+@app.post("/models/{version}/load")
+async def load_model(version: str, x_tenant_id: Optional[str] = Header(default=None)):
+    """
+    Switch the live predictor to a stored model version
+    
+    The artifact is memory-mapped, so switching is fast even for large
+    models; in-flight requests finish on the previous predictor. With
+    X-Tenant-Id, the version is taken from and made live for that tenant.
+    """
+    tenant = resolve_tenant(None, x_tenant_id)
+    if tenant is not None:
+        if not tenant_models.has_models(tenant) or not tenant_models.registry(tenant).exists(version):
+            raise HTTPException(status_code=404, detail=f"Model version {version} not found for tenant {tenant}")
+        try:
+            predictor = await asyncio.to_thread(tenant_models.activate, tenant, version)
+        except Exception as e:
+            logger.error("Model load error for tenant %s: %s", tenant, e)
+            raise HTTPException(status_code=500, detail=f"Model load failed: {str(e)}")
+        return {
+            "status": "loaded",
+            "tenantId": tenant,
+            "version": version,
+            "type": predictor.model_type,
+            "info": predictor.get_model_info()
+        }
+    
+    if not registry.exists(version):
+        raise HTTPException(status_code=404, detail=f"Model version {version} not found")
+    
+    try:
+        predictor = await asyncio.to_thread(activate_model, version)
+    except Exception as e:
+        logger.error("Model load error: %s", e)
+        raise HTTPException(status_code=500, detail=f"Model load failed: {str(e)}")
+    
+    return {
+        "status": "published" if model_watcher is not None else "loaded",
+        "version": version,
+        "switchAt": registry.read_active()[1],
+        "type": predictor.model_type,
+        "info": predictor.get_model_info()
+    }
+
+class ShadowRequest(BaseModel):
+    # Share of /predict requests also scored by the shadow model
+    sampleRate: Optional[float] = Field(default=None, ge=0, le=1)
+
+@app.post("/models/{version}/shadow")
+async def shadow_model(version: str, request: Optional[ShadowRequest] = None):
+    """
+    Score a sample of live traffic with a stored version, without serving it
+    
+    Compare the two models with GET /models/shadow, then make the
+    candidate live with POST /models/shadow/promote.
+    """
+    if not registry.exists(version):
+        raise HTTPException(status_code=404, detail=f"Model version {version} not found")
+    if version == active_version:
+        raise HTTPException(status_code=409, detail=f"Model version {version} is already live")
+    
+    try:
+        predictor = await asyncio.to_thread(registry.load, version)
+    except Exception as e:
+        logger.error("Shadow model load error: %s", e)
+        raise HTTPException(status_code=500, detail=f"Model load failed: {str(e)}")
+    
+    shadow_scorer.set_candidate(version, predictor, request.sampleRate if request is not None else None)
+    return shadow_scorer.stats()
+
+@app.get("/models/shadow")
+async def shadow_stats():
+    """Agreement, score deltas and latency of the shadow model against the live one"""
+    return shadow_scorer.stats()
+
+@app.delete("/models/shadow")
+async def stop_shadow():
+    """Stop shadow scoring; returns the final comparison"""
+    report = shadow_scorer.stats()
+    shadow_scorer.clear()
+    return report
+
+@app.post("/models/shadow/promote")
+async def promote_shadow_model():
+    """
+    Make the shadow model live and stop shadowing
+    
+    Same switch as /models/{version}/load (published to every worker
+    with model sync on); returns the comparison it was promoted on. If
+    the switch fails, shadowing carries on.
+    """
+    report = shadow_scorer.stats()
+    version = shadow_scorer.candidate_version
+    if version is None:
+        raise HTTPException(status_code=404, detail="No shadow model to promote")
+    
+    try:
+        await asyncio.to_thread(activate_model, version)
+    except Exception as e:
+        logger.error("Shadow model promotion error: %s", e)
+        raise HTTPException(status_code=500, detail=f"Promotion failed: {str(e)}")
+    
+    # Unless another candidate was set meanwhile
+    if shadow_scorer.candidate_version == version:
+        shadow_scorer.clear()
+    logger.info("Promoted shadow model version %s (agreement %s)", version, report['agreement'])
+    return {
+        "status": "published" if model_watcher is not None else "promoted",
+        "version": version,
+        "switchAt": registry.read_active()[1],
+        "shadow": report
+    }
+
+class CandidateVector(BaseModel):
+    id: str
+    vector: List[float]
+
+class CandidateUpsert(BaseModel):
+    items: List[CandidateVector]
+
+class CandidateDelete(BaseModel):
+    ids: List[str]
+
+class CandidateQuery(BaseModel):
+    # Either a profile vector, or the id of an indexed user (in any group)
+    vector: Optional[List[float]] = None
+    userId: Optional[str] = None
+    k: int = Field(default=100, ge=1, le=10000)
+    exclude: List[str] = Field(default_factory=list)
+    nprobe: Optional[int] = Field(default=None, ge=1)
+    exact: bool = False
+
+class IvfOptions(BaseModel):
+    nlist: Optional[int] = Field(default=None, ge=1)
+    nprobe: Optional[int] = Field(default=None, ge=1)
+
+def check_group(group: str) -> str:
+    try:
+        return validate_group(group)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def group_not_found(group: str) -> HTTPException:
+    return HTTPException(status_code=404, detail=f"No candidates indexed for group {group}")
+
+def find_candidate_vector(user_id: str) -> Optional[np.ndarray]:
+    """A user's indexed vector from whichever group holds it"""
+    for index in candidate_store.indexes().values():
+        vector = index.vector(user_id)
+        if vector is not None:
+            return vector
+    return None
+
+# Store calls read the group's log and wait on its index lock, which an IVF
+# build holds while placing every row, so they all run off the event loop
+
+@app.post("/candidates/{group}")
+async def upsert_candidates(group: str, request: CandidateUpsert):
+    """
+    Add or replace users' profile vectors in a group's candidate index
+    
+    The first upsert into a group fixes its vector length.
+    """
+    check_group(group)
+    if not request.items:
+        raise HTTPException(status_code=400, detail="No candidates provided")
+    
+    dim = len(request.items[0].vector)
+    if any(len(item.vector) != dim for item in request.items):
+        raise HTTPException(status_code=400, detail="All vectors must have the same length")
+    
+    try:
+        added, updated, size = await asyncio.to_thread(
+            candidate_store.upsert,
+            group,
+            [item.id for item in request.items],
+            [item.vector for item in request.items]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"group": group, "added": added, "updated": updated, "size": size}
+
+@app.post("/candidates/{group}/delete")
+async def delete_candidates(group: str, request: CandidateDelete):
+    """Remove users from a group's candidate index"""
+    check_group(group)
+    result = await asyncio.to_thread(candidate_store.delete, group, request.ids)
+    if result is None:
+        raise group_not_found(group)
+    removed, size = result
+    return {"group": group, "removed": removed, "size": size}
+
+@app.post("/candidates/{group}/search")
+async def search_candidates(group: str, query: CandidateQuery):
+    """
+    Users of a group most similar to a profile vector
+    
+    Returns a shortlist by cosine similarity, to be scored with /rank.
+    With userId, that user's indexed vector is the query and the user
+    is left out of the results.
+    """
+    stages = metrics.stage_timer("/candidates/{group}/search")
+    check_group(group)
+    index = await asyncio.to_thread(candidate_store.get, group)
+    if index is None:
+        raise group_not_found(group)
+    exclude = list(query.exclude)
+    vector = query.vector
+    if vector is None:
+        if query.userId is None:
+            raise HTTPException(status_code=400, detail="Provide a vector or a userId")
+        vector = await asyncio.to_thread(find_candidate_vector, query.userId)
+        if vector is None:
+            raise HTTPException(status_code=404, detail=f"User {query.userId} is not indexed")
+        exclude.append(query.userId)
+    
+    stages.mark("lookup")
+    
+    try:
+        ids, similarities, compared = await asyncio.to_thread(
+            index.search, vector, k=query.k, exclude=exclude, nprobe=query.nprobe, exact=query.exact
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    stages.mark("search")
+    
+    return {
+        "results": [{"id": id_, "similarity": similarity} for id_, similarity in zip(ids, similarities)],
+        "compared": compared,
+        "totalCandidates": len(index),
+        "mode": "ivf" if index.centroids is not None and not query.exact else "exact"
     }
 
+@app.post("/candidates/{group}/ivf")
+async def build_candidate_ivf(group: str, options: Optional[IvfOptions] = None):
+    """
+    Cluster a group's candidates so searches compare only nearby clusters
+    
+    Worth it from a few hundred thousand users; rebuild after large
+    changes, since later upserts join the existing clusters.
+    """
+    check_group(group)
+    options = options or IvfOptions()
+    try:
+        layout = await asyncio.to_thread(
+            candidate_store.build_ivf, group, nlist=options.nlist, nprobe=options.nprobe
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if layout is None:
+        raise group_not_found(group)
+    return layout
+
+@app.delete("/candidates/{group}/ivf")
+async def drop_candidate_ivf(group: str):
+    """Go back to exact search for a group"""
+    check_group(group)
+    index = await asyncio.to_thread(candidate_store.drop_ivf, group)
+    if index is None:
+        raise group_not_found(group)
+    return index.stats()
+
+@app.get("/candidates/stats")
+async def candidate_stats():
+    """Size, memory, search mode and search latency of every group's index"""
+    indexes = await asyncio.to_thread(candidate_store.indexes)
+    return {group: index.stats() for group, index in indexes.items()}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Prediction cache hit/miss/eviction counters"""
+    return prediction_cache.stats()
+
+@app.get("/tenants/stats")
+async def tenant_stats():
+    """Loaded tenant models, memory use, and load/eviction counts and latency"""
+    return tenant_models.stats()
+
+@app.get("/predict/batching/stats")
+async def batching_stats():
+    """Micro-batching batch sizes, queue wait and scoring time"""
+    if micro_batcher is None:
+        return {"enabled": False}
+    return micro_batcher.stats()
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -254,9 +1547,30 @@ async def root():
         "status": "running",
         "endpoints": {
             "health": "/health",
+            "liveness": "/health/live",
+            "readiness": "/health/ready",
             "predict": "/predict",
+            "predict_batch": "/predict/batch",
+            "predict_matrix": "/predict/matrix",
+            "rank": "/rank",
+            "predict_stream": "/predict/stream",
             "train": "/train",
-            "models": "/models"
+            "train_matrix": "/train/matrix",
+            "samples": "/samples",
+            "sample_stats": "/samples/stats",
+            "models": "/models",
+            "load_model": "/models/{version}/load",
+            "shadow_model": "/models/{version}/shadow",
+            "shadow_stats": "/models/shadow",
+            "promote_shadow": "/models/shadow/promote",
+            "candidates": "/candidates/{group}",
+            "candidate_search": "/candidates/{group}/search",
+            "candidate_stats": "/candidates/stats",
+            "cache_stats": "/cache/stats",
+            "batching_stats": "/predict/batching/stats",
+            "tenant_stats": "/tenants/stats",
+            "metrics": "/metrics",
+            "profile": "/admin/profile"
         }
     }
 
@@ -0,0 +1,128 @@
+"""
+Micro-Batching
+Coalesces concurrent single-row predictions into one vectorized call
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Collects /predict rows for a short window and scores them together
+
+    The first row to arrive opens a window of `window` seconds; rows that
+    arrive meanwhile join it, and the batch is scored as soon as the window
+    closes or `max_batch_size` rows are waiting, whichever comes first.
+    Each caller gets its own row back. Rows are grouped by the predictor
+    they were pinned to, so a model swap mid-window never mixes versions.
+
+    Everything runs on the event loop, so no locking is needed. Time spent
+    waiting for the window is tracked apart from time spent scoring.
+    """
+
+    def __init__(self, score_fn, window=0.002, max_batch_size=64, history=1024):
+        """
+        Args:
+            score_fn: Callable(predictor, X) -> (probabilities, confidence)
+            window: Seconds to wait for more rows after the first arrives
+            max_batch_size: Score immediately once this many rows are waiting
+            history: Number of recent queue waits kept for percentiles
+        """
+        self.score_fn = score_fn
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._pending = []
+        self._timer = None
+        self._queue_waits = deque(maxlen=history)
+        self.requests = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.queue_wait_seconds = 0.0
+        self.score_seconds = 0.0
+
+    async def predict(self, predictor, row):
+        """
+        Score one feature row as part of the next batch
+
+        Args:
+            predictor: Predictor pinned by the caller
+            row: Feature vector in FEATURE_NAMES order
+
+        Returns:
+            Tuple of (success probability, confidence, seconds spent queued)
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((predictor, row, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Score every waiting row, one vectorized call per predictor"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        started = time.perf_counter()
+        groups = {}
+        for item in pending:
+            groups.setdefault(id(item[0]), []).append(item)
+
+        for group in groups.values():
+            try:
+                X = np.array([row for _, row, _, _ in group], dtype=np.float64)
+                probabilities, confidence = self.score_fn(group[0][0], X)
+            except Exception as e:
+                for _, _, future, _ in group:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, _, future, enqueued), probability, conf in zip(
+                group, probabilities.tolist(), confidence.tolist()
+            ):
+                # The caller may have gone away (client disconnect)
+                if not future.done():
+                    future.set_result((probability, conf, started - enqueued))
+
+        self.score_seconds += time.perf_counter() - started
+        for _, _, _, enqueued in pending:
+            self._queue_waits.append(started - enqueued)
+            self.queue_wait_seconds += started - enqueued
+        self.requests += len(pending)
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(pending))
+
+    def stats(self):
+        """Batch sizes, queue wait and scoring time"""
+        waits = np.array(self._queue_waits) * 1000
+        return {
+            'enabled': True,
+            'windowMs': self.window * 1000,
+            'maxBatchSize': self.max_batch_size,
+            'requests': self.requests,
+            'batches': self.batches,
+            'meanBatchSize': self.requests / self.batches if self.batches else 0.0,
+            'largestBatch': self.largest_batch,
+            'queueWaitMs': {
+                'mean': self.queue_wait_seconds * 1000 / self.requests if self.requests else 0.0,
+                'p50': float(np.percentile(waits, 50)) if len(waits) else 0.0,
+                'p99': float(np.percentile(waits, 99)) if len(waits) else 0.0,
+                'max': float(waits.max()) if len(waits) else 0.0,
+            },
+            'scoreMsPerBatch': self.score_seconds * 1000 / self.batches if self.batches else 0.0,
+        }
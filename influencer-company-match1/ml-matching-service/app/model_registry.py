@@ -0,0 +1,262 @@
+"""
+Model Registry
+Stores every trained model as a versioned on-disk artifact
+"""
+import json
+import logging
+import os
+from datetime import datetime
+
+from app.models.match_predictor import MatchPredictor
+from app.models.tree_ensemble import TreeEnsemble
+
+logger = logging.getLogger(__name__)
+
+META_FILE = 'meta.json'
+ACTIVE_FILE = 'ACTIVE'
+ESTIMATOR_FILE = 'estimator.joblib'
+
+
+def _parse_version(version):
+    """Sort key for 'major.minor.patch' version strings"""
+    try:
+        return tuple(int(part) for part in version.split('.'))
+    except ValueError:
+        return (-1,)
+
+
+def write_artifact(directory, predictor, metrics, version, include_estimator=True, base_version=None,
+                   fingerprint=None):
+    """
+    Write a trained predictor into an existing directory
+    
+    base_version records which version an incremental update started from,
+    and fingerprint the dataset_fingerprint of the training inputs.
+
+    meta.json is renamed into place last, which is what marks the artifact
+    as complete.
+    """
+    predictor.engine.save(directory)
+
+    if include_estimator and predictor.model is not None and predictor.is_trained():
+        import joblib
+        joblib.dump(predictor.model, os.path.join(directory, ESTIMATOR_FILE))
+
+    meta = {
+        'version': version,
+        'modelType': predictor.model_type,
+        'createdAt': datetime.now().isoformat(),
+        'metrics': metrics,
+        'featureImportance': predictor.get_feature_importance(),
+        'info': predictor.get_model_info(),
+    }
+    if predictor.search_report is not None:
+        meta['search'] = predictor.search_report
+    if base_version is not None:
+        meta['baseVersion'] = base_version
+    if fingerprint is not None:
+        meta['fingerprint'] = fingerprint
+    tmp_path = os.path.join(directory, META_FILE + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(directory, META_FILE))
+
+
+def load_artifact(directory, mmap_mode='r'):
+    """Load an artifact directory as a ready-to-serve predictor"""
+    with open(os.path.join(directory, META_FILE)) as f:
+        meta = json.load(f)
+
+    engine = TreeEnsemble.load(directory, mmap_mode=mmap_mode)
+    return MatchPredictor.from_engine(
+        engine,
+        meta['modelType'],
+        feature_importance=meta.get('featureImportance'),
+        model_info=meta.get('info'),
+        version=meta.get('version'),
+    )
+
+
+class ModelRegistry:
+    """
+    Versioned model artifacts on local disk
+
+    Layout:
+        <root>/<version>/meta.json      metrics, feature importance, model info
+        <root>/<version>/*.npy          compiled TreeEnsemble arrays
+        <root>/<version>/estimator.joblib   fitted sklearn model (for retraining)
+        <root>/ACTIVE                   version currently served, and
+                                        optionally when workers switch to it
+
+    A version directory is claimed with an exclusive mkdir and only becomes
+    visible once meta.json has been renamed into place, so concurrent
+    training processes never see (or overwrite) a half-written artifact.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        # meta.json never changes once written, so reads are cached
+        self._meta_cache = {}
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def list_versions(self):
+        """
+        List complete artifacts, oldest first
+
+        Returns:
+            List of version strings
+        """
+        versions = [
+            name for name in os.listdir(self.root)
+            if os.path.isfile(self._path(name, META_FILE))
+        ]
+        return sorted(versions, key=_parse_version)
+
+    def exists(self, version):
+        return os.path.isfile(self._path(version, META_FILE))
+
+    def get_meta(self, version):
+        """Read the stored metadata for a version"""
+        meta = self._meta_cache.get(version)
+        if meta is None:
+            with open(self._path(version, META_FILE)) as f:
+                meta = self._meta_cache[version] = json.load(f)
+        return meta
+
+    def _claim_next_version(self):
+        """Reserve the next free patch version by creating its directory"""
+        existing = [
+            _parse_version(name) for name in os.listdir(self.root)
+            if os.path.isdir(self._path(name))
+        ]
+        existing = [v for v in existing if len(v) == 3]
+        major, minor, patch = max(existing) if existing else (1, 0, -1)
+
+        while True:
+            patch += 1
+            version = f"{major}.{minor}.{patch}"
+            try:
+                os.mkdir(self._path(version))
+                return version
+            except FileExistsError:
+                continue
+
+    def save(self, predictor, metrics, version=None, base_version=None, fingerprint=None):
+        """
+        Persist a trained predictor as a new version
+
+        Args:
+            predictor: Trained MatchPredictor
+            metrics: Training metrics to store alongside the model
+            version: Explicit version; the next patch version if omitted
+            base_version: Version an incremental update was applied to
+            fingerprint: Fingerprint of the training inputs
+
+        Returns:
+            The version string the artifact was saved under
+        """
+        if version is None:
+            version = self._claim_next_version()
+        else:
+            os.makedirs(self._path(version))
+
+        write_artifact(
+            self._path(version), predictor, metrics, version,
+            base_version=base_version, fingerprint=fingerprint
+        )
+        logger.info("Saved model version %s", version)
+        return version
+
+    def load(self, version, mmap_mode='r'):
+        """
+        Load a version as a ready-to-serve predictor
+
+        The tree arrays are memory-mapped, so loading is close to free and
+        the pages are shared by every process serving the same version.
+
+        Args:
+            version: Version to load
+            mmap_mode: np.load memory-map mode (None reads into RAM)
+
+        Returns:
+            MatchPredictor backed by the stored engine
+        """
+        if not self.exists(version):
+            raise KeyError(version)
+
+        return load_artifact(self._path(version), mmap_mode=mmap_mode)
+
+    def find_by_fingerprint(self, fingerprint):
+        """Newest version trained on inputs with this fingerprint, or None"""
+        for version in reversed(self.list_versions()):
+            if self.get_meta(version).get('fingerprint') == fingerprint:
+                return version
+        return None
+
+    def has_estimator(self, version):
+        """Whether a version can be updated incrementally"""
+        return os.path.isfile(self._path(version, ESTIMATOR_FILE))
+
+    def load_estimator(self, version):
+        """Load the fitted sklearn model saved with a version, if any"""
+        path = self._path(version, ESTIMATOR_FILE)
+        if not os.path.isfile(path):
+            return None
+        import joblib
+        return joblib.load(path)
+
+    def read_active(self):
+        """
+        Contents of the ACTIVE pointer
+
+        Returns:
+            Tuple of (version or None, unix switch time or None)
+        """
+        try:
+            with open(self._path(ACTIVE_FILE)) as f:
+                lines = f.read().split()
+        except FileNotFoundError:
+            return None, None
+        if not lines:
+            return None, None
+        switch_at = float(lines[1]) if len(lines) > 1 else None
+        return lines[0], switch_at
+
+    def active_stamp(self):
+        """
+        Cheap change marker for the ACTIVE pointer (one stat call)
+
+        ACTIVE is always replaced by a rename, so any write gives a new
+        inode and mtime.
+        """
+        try:
+            st = os.stat(self._path(ACTIVE_FILE))
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def get_active(self):
+        """Version marked as active, falling back to the newest one"""
+        version, _ = self.read_active()
+        if version is not None and self.exists(version):
+            return version
+
+        versions = self.list_versions()
+        return versions[-1] if versions else None
+
+    def set_active(self, version, switch_at=None):
+        """
+        Record which version is being served
+
+        Args:
+            version: Version to serve
+            switch_at: Unix time at which workers should switch to it
+        """
+        # Per-process temp name: several workers may publish at once
+        tmp_path = self._path(f"{ACTIVE_FILE}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            f.write(version if switch_at is None else f"{version}\n{switch_at:.6f}")
+        os.replace(tmp_path, self._path(ACTIVE_FILE))
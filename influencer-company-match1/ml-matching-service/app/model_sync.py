@@ -0,0 +1,108 @@
+"""
+Model Sync
+Keeps every worker process serving the same registry version
+
+Workers share one copy of the model through the page cache: artifacts are
+memory-mapped read-only, so N workers serving a version map the same
+physical pages. What they do not share is which version is live. The
+registry's ACTIVE file is that shared pointer; this module watches it.
+"""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ActiveModelWatcher:
+    """
+    Switches this worker to the registry's ACTIVE version, in step with the others
+
+    A version change is published by rewriting ACTIVE with the version and
+    a switch time a couple of poll intervals ahead. Every worker, including
+    the one that published, stats the file once per interval in a
+    background thread. When it changes, the worker maps the new version
+    right away and then swaps it in at the switch time, so all workers on
+    the host change over at the same moment rather than whenever they
+    next notice. A worker that only notices after the switch time swaps
+    immediately.
+    """
+
+    def __init__(self, registry, install, current_version, interval=0.5):
+        """
+        Args:
+            registry: ModelRegistry whose ACTIVE pointer is shared
+            install: Callable(version, predictor) making a loaded predictor live
+            current_version: Callable returning the version being served
+            interval: Seconds between stats of the ACTIVE file
+        """
+        self.registry = registry
+        self.install = install
+        self.current_version = current_version
+        self.interval = interval
+        self.switches = 0
+        self.last_switch_lag = None
+        self._stamp = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def publish(self, version):
+        """
+        Make a version live on every worker
+
+        Returns:
+            Unix time at which the workers switch
+        """
+        switch_at = time.time() + 2 * self.interval
+        self.registry.set_active(version, switch_at=switch_at)
+        logger.info("Published model version %s, switching at %.3f", version, switch_at)
+        return switch_at
+
+    def start(self):
+        if self._thread is None:
+            self._stamp = self.registry.active_stamp()
+            self._thread = threading.Thread(target=self._run, name='active-model-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error("Model sync failed: %s", e)
+
+    def poll(self):
+        """Check the ACTIVE file once and switch if it names another version"""
+        stamp = self.registry.active_stamp()
+        if stamp == self._stamp:
+            return
+        self._stamp = stamp
+
+        version, switch_at = self.registry.read_active()
+        if version is None or version == self.current_version():
+            return
+
+        predictor = self.registry.load(version)
+        delay = (switch_at or 0) - time.time()
+        if delay > 0:
+            self._stop.wait(delay)
+        self.install(version, predictor)
+        self.switches += 1
+        self.last_switch_lag = None if switch_at is None else max(0.0, time.time() - switch_at)
+        logger.info("Worker %d switched to model version %s", os.getpid(), version)
+
+    def stats(self):
+        return {
+            'enabled': True,
+            'intervalSeconds': self.interval,
+            'pid': os.getpid(),
+            'switches': self.switches,
+            'lastSwitchLagSeconds': self.last_switch_lag,
+        }
@@ -0,0 +1,203 @@
+"""
+Model Compaction
+Shrinks a compiled TreeEnsemble after training
+
+Three steps, the first two without changing any prediction beyond float32
+rounding of leaf values:
+
+1. Thresholds and values are stored as float32 and feature indices in
+   the smallest integer type that holds them. A threshold is rounded down
+   to the largest float32 not above it, so `x <= t` gives the same answer
+   for every float32 input x.
+2. Split nodes whose two children are leaves with the same value are
+   replaced by that leaf, repeatedly, and unreachable nodes are dropped.
+3. Optionally, trees are removed greedily, least useful first, for as long
+   as accuracy on held-out rows stays within a loss budget. A floor on the
+   number of trees keeps probabilities from becoming too coarse, since a
+   handful of trees can keep accuracy while scores lose resolution.
+"""
+import logging
+
+import numpy as np
+
+from app.models.tree_ensemble import TreeEnsemble, _sigmoid
+
+logger = logging.getLogger(__name__)
+
+
+def _round_down_float32(values):
+    """Largest float32 not greater than each value"""
+    rounded = values.astype(np.float32)
+    above = rounded.astype(np.float64) > values
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def _merge_leaves(left, right, value):
+    """Collapse splits whose children are leaves of equal value (in place)"""
+    index = np.arange(len(left), dtype=left.dtype)
+    is_leaf = left == index
+    while True:
+        mergeable = (
+            ~is_leaf & is_leaf[left] & is_leaf[right] & (value[left] == value[right])
+        )
+        if not mergeable.any():
+            return
+        value[mergeable] = value[left[mergeable]]
+        left[mergeable] = index[mergeable]
+        right[mergeable] = index[mergeable]
+        is_leaf[mergeable] = True
+
+
+def _reachable(roots, left, right):
+    """Mask of nodes reachable from roots, and the depth of the deepest leaf"""
+    reachable = np.zeros(len(left), dtype=bool)
+    frontier = np.asarray(roots)
+    depth = 0
+    while True:
+        reachable[frontier] = True
+        children = np.concatenate([left[frontier], right[frontier]])
+        # Leaves point to themselves, so only real children move deeper
+        children = np.unique(children[~reachable[children]])
+        if len(children) == 0:
+            return reachable, depth
+        frontier = children
+        depth += 1
+
+
+def compact_ensemble(engine, keep_trees=None):
+    """
+    Build a float32, leaf-merged copy of an engine
+
+    Args:
+        engine: TreeEnsemble to compact
+        keep_trees: Indices of the trees to keep (default: all)
+
+    Returns:
+        New TreeEnsemble
+    """
+    left = np.array(engine.left)
+    right = np.array(engine.right)
+    value = np.asarray(engine.value).astype(np.float32)
+    threshold = np.asarray(engine.threshold, dtype=np.float64)
+    if engine.input_dtype == np.float32:
+        threshold = _round_down_float32(threshold)
+    # Models compared in float64 keep float64 thresholds: no float32 value
+    # reproduces every float64 split decision
+
+    _merge_leaves(left, right, value)
+
+    roots = np.asarray(engine.roots)
+    if keep_trees is not None:
+        roots = roots[np.sort(np.asarray(keep_trees))]
+    reachable, max_depth = _reachable(roots, left, right)
+
+    new_index = np.cumsum(reachable, dtype=np.int64) - 1
+    feature_dtype = np.min_scalar_type(max(int(engine.n_features or 0) - 1, 0))
+    return TreeEnsemble(
+        feature=np.asarray(engine.feature)[reachable].astype(feature_dtype),
+        threshold=threshold[reachable],
+        left=new_index[left[reachable]].astype(np.int32),
+        right=new_index[right[reachable]].astype(np.int32),
+        value=value[reachable],
+        roots=new_index[roots].astype(np.int32),
+        max_depth=max_depth,
+        kind=engine.kind,
+        base_score=engine.base_score,
+        n_features=engine.n_features,
+        input_dtype=engine.input_dtype,
+    )
+
+
+def select_trees(engine, X, y, max_accuracy_loss, min_trees=1):
+    """
+    Greedily drop the trees that contribute least on held-out data
+
+    Each step removes the tree whose removal gives the lowest Brier score,
+    and stops before accuracy would fall more than max_accuracy_loss below
+    that of the full ensemble.
+
+    Args:
+        engine: TreeEnsemble to prune
+        X: Held-out feature matrix
+        y: Held-out outcomes
+        max_accuracy_loss: Allowed absolute accuracy drop (e.g. 0.005)
+        min_trees: Never keep fewer trees than this
+
+    Returns:
+        Tuple of (indices of the kept trees, held-out accuracy with all
+        trees, held-out accuracy with the kept trees)
+    """
+    y = np.asarray(y, dtype=bool)
+    # Per-tree leaf values on the held-out rows, shape (n_samples, n_trees)
+    contributions = np.asarray(engine.value, dtype=np.float64)[engine.apply(X)]
+    n_trees = contributions.shape[1]
+
+    def probabilities(total, count):
+        if engine.kind == 'forest':
+            return total / count
+        return _sigmoid(engine.base_score + total)
+
+    total = contributions.sum(axis=1)
+    baseline = float(np.mean((probabilities(total, n_trees) > 0.5) == y))
+    accuracy = baseline
+    kept = list(range(n_trees))
+
+    while len(kept) > min_trees:
+        # Prediction without each remaining tree, all candidates at once
+        without = probabilities(total[:, None] - contributions[:, kept], len(kept) - 1)
+        brier = np.mean((without - y[:, None]) ** 2, axis=0)
+        candidate = int(np.argmin(brier))
+        candidate_accuracy = float(np.mean((without[:, candidate] > 0.5) == y))
+        if candidate_accuracy < baseline - max_accuracy_loss:
+            break
+
+        total = total - contributions[:, kept[candidate]]
+        accuracy = candidate_accuracy
+        del kept[candidate]
+
+    return kept, baseline, accuracy
+
+
+def compact_model(engine, X_holdout=None, y_holdout=None, max_accuracy_loss=None, min_trees=10):
+    """
+    Compact an engine, pruning trees when held-out data and a budget are given
+
+    Args:
+        engine: TreeEnsemble to compact
+        X_holdout: Held-out feature matrix for pruning
+        y_holdout: Held-out outcomes for pruning
+        max_accuracy_loss: Allowed held-out accuracy drop (None: no pruning)
+        min_trees: Fewest trees pruning may leave
+
+    Returns:
+        Tuple of (compacted TreeEnsemble, report dict for get_model_info)
+    """
+    keep_trees = None
+    report = {}
+    if max_accuracy_loss is not None and X_holdout is not None and len(X_holdout):
+        keep_trees, before, after = select_trees(
+            engine, X_holdout, y_holdout, max_accuracy_loss, min_trees=min(min_trees, engine.n_trees)
+        )
+        report.update({
+            'holdout_samples': int(len(X_holdout)),
+            'holdout_accuracy_before': before,
+            'holdout_accuracy_after': after,
+            'max_accuracy_loss': max_accuracy_loss,
+            'min_trees': min_trees,
+        })
+
+    compacted = compact_ensemble(engine, keep_trees)
+    report.update({
+        'original_bytes': int(engine.nbytes),
+        'compacted_bytes': int(compacted.nbytes),
+        'original_nodes': int(engine.n_nodes),
+        'compacted_nodes': int(compacted.n_nodes),
+        'original_trees': int(engine.n_trees),
+        'compacted_trees': int(compacted.n_trees),
+    })
+    logger.info(
+        "Compacted model from %d to %d bytes (%d -> %d trees)",
+        engine.nbytes, compacted.nbytes, engine.n_trees, compacted.n_trees
+    )
+    return compacted, report
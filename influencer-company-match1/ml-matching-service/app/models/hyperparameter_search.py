@@ -0,0 +1,210 @@
+"""
+Hyperparameter Search
+Cross-validated candidate search on a bounded process pool under a time budget
+
+Every (candidate, fold) pair is an independent task. Tasks run on a pool
+of single-threaded workers, so folds and candidates are parallelised at
+one level instead of nesting the forest's n_jobs inside a serial CV loop.
+"""
+import logging
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from app.models.match_predictor import HYPERPARAMETERS
+
+logger = logging.getLogger(__name__)
+
+# Candidates are overrides of HYPERPARAMETERS; the defaults come first so a
+# tight budget still evaluates the configuration the service always used
+SEARCH_SPACE = {
+    'random_forest': [
+        {},
+        {'max_depth': 14, 'min_samples_leaf': 1},
+        {'max_depth': 6, 'min_samples_leaf': 4},
+        {'n_estimators': 200, 'max_depth': None, 'min_samples_leaf': 2},
+        {'n_estimators': 200, 'max_features': 0.5},
+        {'max_depth': 8, 'min_samples_split': 10, 'min_samples_leaf': 5},
+    ],
+    'gradient_boosting': [
+        {},
+        {'learning_rate': 0.05, 'n_estimators': 200},
+        {'max_depth': 3, 'n_estimators': 200},
+        {'max_depth': 3, 'learning_rate': 0.2},
+        {'subsample': 0.8, 'learning_rate': 0.05, 'n_estimators': 200},
+        {'max_depth': 7, 'min_samples_leaf': 5},
+    ],
+    'hist_gradient_boosting': [
+        {},
+        {'learning_rate': 0.05, 'max_iter': 400},
+        {'max_leaf_nodes': 15, 'max_depth': 6},
+        {'max_leaf_nodes': 63, 'min_samples_leaf': 50},
+        {'l2_regularization': 1.0, 'learning_rate': 0.2},
+        {'max_bins': 63},
+    ],
+}
+
+# Training data shared with each pool worker once, via the initializer
+_X = None
+_y = None
+
+
+def _init_search_worker(X, y):
+    global _X, _y
+    _X, _y = X, y
+    # HistGradientBoosting uses OpenMP; keep each task on one core
+    os.environ['OMP_NUM_THREADS'] = '1'
+
+
+def _fit_fold(model_type, params, train_index, test_index):
+    """Fit one candidate on one fold; returns (accuracy, fit seconds)"""
+    from sklearn.ensemble import (
+        RandomForestClassifier, GradientBoostingClassifier, HistGradientBoostingClassifier
+    )
+    from sklearn.metrics import accuracy_score
+
+    if model_type == 'random_forest':
+        # One core per task: the pool provides the parallelism
+        model = RandomForestClassifier(**params, n_jobs=1)
+    elif model_type == 'hist_gradient_boosting':
+        model = HistGradientBoostingClassifier(**params)
+    else:
+        model = GradientBoostingClassifier(**params)
+
+    started = time.perf_counter()
+    model.fit(_X[train_index], _y[train_index])
+    fit_seconds = time.perf_counter() - started
+    score = accuracy_score(_y[test_index], model.predict(_X[test_index]))
+    return float(score), fit_seconds
+
+
+def candidate_params(model_type, candidates=None):
+    """Full parameter sets for the search candidates of a model type"""
+    overrides = SEARCH_SPACE[model_type] if candidates is None else candidates
+    return [{**HYPERPARAMETERS[model_type], **override} for override in overrides]
+
+
+def search_hyperparameters(model_type, X, y, budget_seconds=60.0, max_workers=None, folds=5,
+                           candidates=None, progress_callback=None):
+    """
+    Pick the hyperparameters with the best cross-validated accuracy
+
+    Tasks are queued candidate by candidate, so early candidates finish
+    first. Only candidates with every fold scored are eligible. The search
+    stops once the time left in the budget is about what the final fit on
+    the full data will take (estimated from the slowest fold so far); the
+    pool is then terminated, so running tasks do not overrun the budget.
+
+    Args:
+        model_type: One of MODEL_TYPES
+        X: Feature matrix (n_samples, n_features)
+        y: Target vector (n_samples,)
+        budget_seconds: Wall-clock budget for search plus final fit
+        max_workers: Pool size (defaults to the CPU count)
+        folds: Number of stratified CV folds
+        candidates: Parameter overrides to try (defaults to SEARCH_SPACE)
+        progress_callback: Optional callable(fraction done) for reporting
+
+    Returns:
+        Tuple of (best parameter dict, report dict)
+    """
+    from sklearn.model_selection import StratifiedKFold
+
+    started = time.perf_counter()
+    deadline = started + budget_seconds
+    params = candidate_params(model_type, candidates)
+
+    # Stratified folds need every class represented in each fold
+    n_splits = max(2, min(folds, int(np.bincount(np.asarray(y, dtype=np.int64)).min())))
+    splits = list(StratifiedKFold(n_splits=n_splits).split(X, y))
+    tasks = [(c, f) for c in range(len(params)) for f in range(n_splits)]
+
+    workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+    scores = [[None] * n_splits for _ in params]
+    fit_seconds = [[None] * n_splits for _ in params]
+    slowest_fold = 0.0
+    done = 0
+
+    # spawn, like the training job pool: no forked copies of process state
+    context = multiprocessing.get_context('spawn')
+    pool = context.Pool(workers, initializer=_init_search_worker, initargs=(X, y))
+    try:
+        pending = {
+            (c, f): pool.apply_async(_fit_fold, (model_type, params[c], *splits[f]))
+            for c, f in tasks
+        }
+        while pending:
+            # Reserve time for the final fit, which sees k/(k-1) times the rows
+            final_fit = slowest_fold * n_splits / (n_splits - 1)
+            if time.perf_counter() + final_fit >= deadline:
+                break
+
+            finished = [key for key, result in pending.items() if result.ready()]
+            if not finished:
+                time.sleep(0.01)
+                continue
+
+            for c, f in finished:
+                score, seconds = pending.pop((c, f)).get()
+                scores[c][f] = score
+                fit_seconds[c][f] = seconds
+                slowest_fold = max(slowest_fold, seconds)
+                done += 1
+            if progress_callback is not None:
+                progress_callback(done / len(tasks))
+    finally:
+        pool.terminate()
+        pool.join()
+
+    report = _build_report(model_type, params, scores, fit_seconds, budget_seconds, workers,
+                           time.perf_counter() - started)
+    best = report['bestCandidate']
+    if best is None:
+        logger.warning("No candidate finished within %.1fs; using default hyperparameters", budget_seconds)
+        return dict(HYPERPARAMETERS[model_type]), report
+
+    logger.info(
+        "Hyperparameter search: candidate %d of %d best (cv %.3f), %d/%d folds in %.1fs",
+        best, len(params), report['candidates'][best]['cvScore'], done, len(tasks), report['searchSeconds']
+    )
+    return params[best], report
+
+
+def _build_report(model_type, params, scores, fit_seconds, budget_seconds, workers, elapsed):
+    """Per-candidate scores and time spent"""
+    candidates = []
+    best, best_score = None, -1.0
+    for c, candidate in enumerate(params):
+        completed = [s for s in scores[c] if s is not None]
+        seconds = [s for s in fit_seconds[c] if s is not None]
+        if len(completed) == len(scores[c]):
+            status = 'completed'
+        elif completed:
+            status = 'partial'
+        else:
+            status = 'not_started'
+
+        cv_score = float(np.mean(completed)) if completed else None
+        candidates.append({
+            'params': candidate,
+            'status': status,
+            'foldsCompleted': len(completed),
+            'cvScore': cv_score,
+            'cvStd': float(np.std(completed)) if completed else None,
+            'fitSeconds': round(float(sum(seconds)), 3),
+            'meanFoldSeconds': round(float(np.mean(seconds)), 3) if seconds else None,
+        })
+        if status == 'completed' and cv_score > best_score:
+            best, best_score = c, cv_score
+
+    return {
+        'modelType': model_type,
+        'budgetSeconds': budget_seconds,
+        'searchSeconds': round(elapsed, 3),
+        'workers': workers,
+        'folds': len(scores[0]) if scores else 0,
+        'bestCandidate': best,
+        'candidates': candidates,
+    }
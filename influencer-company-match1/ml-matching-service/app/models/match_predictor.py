@@ -1,20 +1,80 @@
 """
 Match Predictor using scikit-learn
-Implements Random Forest and Gradient Boosting classifiers
+Implements Random Forest, Gradient Boosting and histogram-based Gradient
+Boosting classifiers
+
+scikit-learn is imported lazily: it is only needed to train, while serving
+runs on the compiled TreeEnsemble.
 """
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
-from sklearn.model_selection import cross_val_score
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+import os
 import numpy as np
 import logging
+import time
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+from app.models.tree_ensemble import TreeEnsemble
 
 logger = logging.getLogger(__name__)
 
+MODEL_TYPES = ('random_forest', 'gradient_boosting', 'hist_gradient_boosting')
+
+# Estimator settings per model type (these also key dataset fingerprints)
+HYPERPARAMETERS = {
+    'random_forest': {
+        'n_estimators': 100,
+        'max_depth': 10,
+        'min_samples_split': 5,
+        'min_samples_leaf': 2,
+        'max_features': 'sqrt',
+        'random_state': 42,
+    },
+    'gradient_boosting': {
+        'n_estimators': 100,
+        'learning_rate': 0.1,
+        'max_depth': 5,
+        'min_samples_split': 5,
+        'min_samples_leaf': 2,
+        'random_state': 42,
+    },
+    # Bins features into at most 255 buckets, so fitting scales to
+    # hundreds of thousands of rows; max_depth bounds inference steps
+    'hist_gradient_boosting': {
+        'max_iter': 200,
+        'learning_rate': 0.1,
+        'max_leaf_nodes': 31,
+        'max_depth': 8,
+        'min_samples_leaf': 20,
+        'l2_regularization': 0.0,
+        'max_bins': 255,
+        'early_stopping': 'auto',
+        'random_state': 42,
+    },
+}
+
+
+def _peak_memory_mb():
+    """Peak resident memory of this process in MB (None if unknown)"""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# Feature order expected by the model (matches the training matrix columns)
+FEATURE_NAMES = [
+    'nicheAlignment', 'audienceMatch', 'engagementRate', 'brandFit',
+    'locationMatch', 'budgetAlignment', 'contentQuality', 'responseRate'
+]
+
 
 class MatchPredictor:
     """
     ML model for predicting match success
-    Supports Random Forest and Gradient Boosting algorithms
+    Supports Random Forest, Gradient Boosting and histogram-based
+    Gradient Boosting algorithms
     """
     
     def __init__(self, model_type='random_forest'):
@@ -22,68 +82,164 @@ class MatchPredictor:
         Initialize predictor with specified model type
         
         Args:
-            model_type: 'random_forest' or 'gradient_boosting'
+            model_type: 'random_forest', 'gradient_boosting' or 'hist_gradient_boosting'
         """
+        if model_type not in MODEL_TYPES:
+            raise ValueError(f"Unknown model type: {model_type}")
+        
         self.model_type = model_type
         self.model = None
-        self._initialize_model()
+        self.engine = None
+        self.feature_importance = None
+        self.model_info = None
+        self.version = None
+        # Tenant whose registry the model was loaded from (None: the default model)
+        self.tenant = None
+        # Report of the hyperparameter search the model was picked by, if any
+        self.search_report = None
+        # Response metadata cached by the API layer for this model
+        self.response_meta = None
+    
+    @classmethod
+    def from_engine(cls, engine, model_type, feature_importance=None, model_info=None, version=None):
+        """
+        Build a ready-to-serve predictor around an already compiled engine
+        
+        Args:
+            engine: TreeEnsemble (typically loaded from the model registry)
+            model_type: Model type the engine was trained as
+            feature_importance: Stored feature importance scores
+            model_info: Stored get_model_info() output
+            version: Registry version the engine was loaded from
+            
+        Returns:
+            MatchPredictor that predicts without a fitted sklearn model
+        """
+        predictor = cls(model_type)
+        predictor.engine = engine
+        predictor.feature_importance = feature_importance
+        predictor.model_info = model_info
+        predictor.version = version
+        return predictor
     
-    def _initialize_model(self):
-        """Initialize the ML model based on type"""
+    def _initialize_model(self, params=None):
+        """Initialize the ML model based on type (params default to HYPERPARAMETERS)"""
+        from sklearn.ensemble import (
+            RandomForestClassifier, GradientBoostingClassifier, HistGradientBoostingClassifier
+        )
+        
+        if params is None:
+            params = HYPERPARAMETERS.get(self.model_type)
+        
         if self.model_type == 'random_forest':
             self.model = RandomForestClassifier(
-                n_estimators=100,
-                max_depth=10,
-                min_samples_split=5,
-                min_samples_leaf=2,
-                max_features='sqrt',
-                random_state=42,
-                n_jobs=-1  # Use all CPU cores
+                **params,
+                # All cores unless the training process is capped (TRAINING_THREADS)
+                n_jobs=int(os.getenv('TRAINING_THREADS', -1))
             )
             logger.info("Initialized Random Forest classifier")
         elif self.model_type == 'gradient_boosting':
-            self.model = GradientBoostingClassifier(
-                n_estimators=100,
-                learning_rate=0.1,
-                max_depth=5,
-                min_samples_split=5,
-                min_samples_leaf=2,
-                random_state=42
-            )
+            self.model = GradientBoostingClassifier(**params)
             logger.info("Initialized Gradient Boosting classifier")
+        elif self.model_type == 'hist_gradient_boosting':
+            self.model = HistGradientBoostingClassifier(**params)
+            logger.info("Initialized Histogram Gradient Boosting classifier")
         else:
             raise ValueError(f"Unknown model type: {self.model_type}")
     
-    def train(self, X, y):
+    def train(self, X, y, progress_callback=None, search=None, compaction=None):
         """
         Train the model with cross-validation
         
+        The compiled engine is always compacted (see app.models.compaction).
+        
         Args:
             X: Feature matrix (n_samples, n_features)
             y: Target vector (n_samples,)
+            progress_callback: Optional callable(progress, stage) for reporting
+            search: Optional keyword arguments for search_hyperparameters
+                (budget_seconds, max_workers, folds); the best candidate's
+                CV score replaces the plain cross-validation
+            compaction: Optional tree pruning settings: max_accuracy_loss,
+                min_trees (default 10) and holdout_fraction (default 0.2) of
+                rows held out of the final fit to check the loss on
             
         Returns:
             Dictionary with training metrics
         """
+        from sklearn.model_selection import cross_val_score
+        from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+        
+        def report(progress, stage):
+            if progress_callback is not None:
+                progress_callback(progress, stage)
+        
+        # Keep float32 input as-is: the trees are fitted on float32 anyway
+        X = np.asarray(X)
+        if X.dtype not in (np.float32, np.float64):
+            X = X.astype(np.float64)
+        y = np.asarray(y)
+        
         if len(X) < 10:
             logger.warning(f"Training with only {len(X)} samples. Results may be unreliable.")
         
-        # Perform cross-validation
-        try:
-            cv_scores = cross_val_score(self.model, X, y, cv=min(5, len(X)), scoring='accuracy')
-            cv_mean = cv_scores.mean()
-            cv_std = cv_scores.std()
-            logger.info(f"Cross-validation scores: {cv_mean:.3f} (+/- {cv_std:.3f})")
-        except Exception as e:
-            logger.warning(f"Cross-validation failed: {e}. Skipping CV.")
-            cv_mean = 0.0
-            cv_std = 0.0
+        if search is not None:
+            from app.models.hyperparameter_search import search_hyperparameters
+            
+            report(0.05, 'search')
+            params, self.search_report = search_hyperparameters(
+                self.model_type, X, y,
+                progress_callback=lambda done: report(0.05 + 0.75 * done, 'search'),
+                **search
+            )
+            self._initialize_model(params)
+            # Without a finished candidate, the defaults' partial folds are the best estimate
+            best = self.search_report['bestCandidate']
+            chosen = self.search_report['candidates'][0 if best is None else best]
+            cv_mean = chosen['cvScore'] or 0.0
+            cv_std = chosen['cvStd'] or 0.0
+        else:
+            if self.model is None:
+                self._initialize_model()
+            
+            # Perform cross-validation
+            report(0.05, 'cross_validation')
+            try:
+                cv_scores = cross_val_score(self.model, X, y, cv=min(5, len(X)), scoring='accuracy')
+                cv_mean = cv_scores.mean()
+                cv_std = cv_scores.std()
+                logger.info(f"Cross-validation scores: {cv_mean:.3f} (+/- {cv_std:.3f})")
+            except Exception as e:
+                logger.warning(f"Cross-validation failed: {e}. Skipping CV.")
+                cv_mean = 0.0
+                cv_std = 0.0
         
-        # Train on full dataset
-        self.model.fit(X, y)
+        # Train on full dataset, less the rows tree pruning is checked on
+        X_fit, y_fit, X_holdout, y_holdout = X, y, None, None
+        pruning = {}
+        if compaction is not None:
+            from sklearn.model_selection import train_test_split
+            pruning = {
+                'max_accuracy_loss': compaction['max_accuracy_loss'],
+                'min_trees': compaction.get('min_trees', 10),
+            }
+            X_fit, X_holdout, y_fit, y_holdout = train_test_split(
+                X, y,
+                test_size=compaction.get('holdout_fraction', 0.2),
+                stratify=y,
+                random_state=42
+            )
         
-        # Calculate training metrics
-        y_pred = self.model.predict(X)
+        report(0.8 if search is not None else 0.6, 'fitting')
+        fit_started = time.perf_counter()
+        self.model.fit(X_fit, y_fit)
+        fit_seconds = time.perf_counter() - fit_started
+        
+        report(0.9, 'compiling')
+        self._compile(X_holdout, y_holdout, **pruning)
+        
+        # Calculate training metrics on the model as served
+        y_pred = self.engine.predict_proba(X) > 0.5
         
         metrics = {
             'accuracy': float(accuracy_score(y, y_pred)),
@@ -95,11 +251,126 @@ class MatchPredictor:
             'n_samples': int(len(y)),
             'n_features': int(X.shape[1])
         }
+        metrics.update(self._resource_metrics(fit_seconds))
         
         logger.info(f"Training complete. Accuracy: {metrics['accuracy']:.3f}, F1: {metrics['f1_score']:.3f}")
         
         return metrics
     
+    def train_incremental(self, X, y, base_model, n_new_estimators=10, max_estimators=None,
+                          progress_callback=None):
+        """
+        Update a previously fitted model with a new batch of outcomes
+        
+        Only the new rows are fitted, so the cost depends on the batch
+        size rather than the full training history:
+        
+        - random_forest: n_new_estimators trees are grown on the batch via
+          warm_start, then the oldest trees are retired so the forest keeps
+          at most max_estimators trees (default: its size before the update)
+        - gradient_boosting: n_new_estimators stages are appended, fitted to
+          the residuals of the existing ensemble on the batch. Stages build
+          on each other, so none are retired.
+        - hist_gradient_boosting: n_new_estimators boosting iterations (one
+          tree each) are appended the same way, with early stopping off.
+          Feature bins are recomputed from the batch, so the new trees
+          split on its quantiles while earlier trees keep their thresholds.
+        
+        cv_score is the accuracy of the model before the update on the new
+        batch, i.e. an out-of-sample estimate; no cross-validation is run.
+        
+        Args:
+            X: New feature rows (n_samples, n_features)
+            y: New outcomes (n_samples,), both classes must be present
+            base_model: Fitted sklearn model of this predictor's type
+            n_new_estimators: Trees, stages or boosting iterations to add
+            max_estimators: Forest size cap after the update (random_forest only)
+            progress_callback: Optional callable(progress, stage) for reporting
+            
+        Returns:
+            Dictionary with training metrics
+        """
+        from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+        
+        def report(progress, stage):
+            if progress_callback is not None:
+                progress_callback(progress, stage)
+        
+        X = np.asarray(X)
+        if X.dtype not in (np.float32, np.float64):
+            X = X.astype(np.float64)
+        y = np.asarray(y)
+        
+        if len(np.unique(y)) < 2:
+            raise ValueError("Incremental update needs both successful and failed outcomes")
+        if base_model.n_features_in_ != X.shape[1]:
+            raise ValueError(
+                f"Base model expects {base_model.n_features_in_} features, got {X.shape[1]}"
+            )
+        
+        # Out-of-sample accuracy of the current model on outcomes it has not seen
+        report(0.05, 'evaluating')
+        holdout_accuracy = accuracy_score(y, base_model.predict(X))
+        
+        report(0.2, 'fitting')
+        model = base_model
+        fit_started = time.perf_counter()
+        if self.model_type == 'random_forest':
+            n_trees = len(model.estimators_)
+            if max_estimators is None:
+                max_estimators = n_trees
+            # warm_start seeds the added trees from random_state after skipping one
+            # draw per existing tree. Once old trees are retired that count stops
+            # growing, so move the seed on by every tree grown so far; otherwise
+            # each update would regrow the same seeds as the last one
+            grown = getattr(model, 'n_trees_grown_', n_trees)
+            if model.random_state is not None:
+                base_seed = getattr(model, 'base_random_state_', model.random_state)
+                model.base_random_state_ = base_seed
+                model.set_params(random_state=base_seed + grown)
+            model.set_params(warm_start=True, n_estimators=n_trees + n_new_estimators)
+            model.fit(X, y)
+            model.n_trees_grown_ = grown + n_new_estimators
+            # Retire the oldest trees (warm_start appends new ones at the end)
+            model.estimators_ = model.estimators_[-max_estimators:]
+            model.n_estimators = len(model.estimators_)
+        elif self.model_type == 'hist_gradient_boosting':
+            # fit() re-bins features from this batch: earlier iterations keep their
+            # thresholds, new ones split on the batch's bins. Early stopping would
+            # cut the update short
+            model.set_params(warm_start=True, early_stopping=False, max_iter=model.n_iter_ + n_new_estimators)
+            model.fit(X, y)
+        else:
+            model.set_params(warm_start=True, n_estimators=model.estimators_.shape[0] + n_new_estimators)
+            model.fit(X, y)
+        fit_seconds = time.perf_counter() - fit_started
+        model.set_params(warm_start=False)
+        self.model = model
+        
+        report(0.9, 'compiling')
+        self._compile()
+        
+        y_pred = self.engine.predict_proba(X) > 0.5
+        
+        metrics = {
+            'accuracy': float(accuracy_score(y, y_pred)),
+            'precision': float(precision_score(y, y_pred, zero_division=0)),
+            'recall': float(recall_score(y, y_pred, zero_division=0)),
+            'f1_score': float(f1_score(y, y_pred, zero_division=0)),
+            'cv_score': float(holdout_accuracy),
+            'cv_std': 0.0,
+            'n_samples': int(len(y)),
+            'n_features': int(X.shape[1])
+        }
+        metrics.update(self._resource_metrics(fit_seconds))
+        
+        logger.info(
+            f"Incremental update complete ({self.engine.n_trees} trees). "
+            f"Accuracy before: {holdout_accuracy:.3f}, after: {metrics['accuracy']:.3f}"
+        )
+        
+        return metrics
+    
     def predict(self, X):
         """
         Predict match success probability
@@ -110,16 +381,10 @@ class MatchPredictor:
         Returns:
             Dictionary with predictions, probabilities, and confidence
         """
-        if self.model is None:
-            raise ValueError("Model not trained. Call train() first.")
-        
-        # Get predictions
-        predictions = self.model.predict(X)
-        probabilities = self.model.predict_proba(X)
+        success_probs, confidence = self.predict_proba_batch(X)
         
-        # Calculate confidence (distance from 0.5)
-        success_probs = probabilities[:, 1]
-        confidence = np.abs(success_probs - 0.5) * 2  # Scale to 0-1
+        # Same decision rule as sklearn's predict (ties go to the negative class)
+        predictions = success_probs > 0.5
         
         return {
             'predictions': predictions.tolist(),
@@ -127,6 +392,62 @@ class MatchPredictor:
             'confidence': confidence.tolist()
         }
     
+    def predict_proba_batch(self, X):
+        """
+        Predict success probabilities for a batch with a single model pass
+        
+        Runs on the compiled TreeEnsemble and returns NumPy arrays instead
+        of lists, so callers can post-process the whole batch vectorized.
+        
+        Args:
+            X: Feature matrix (n_samples, n_features)
+            
+        Returns:
+            Tuple of (success probabilities, confidence) arrays, each (n_samples,)
+        """
+        if self.engine is None:
+            raise ValueError("Model not trained. Call train() first.")
+        
+        success_probs = self.engine.predict_proba(X)
+        confidence = np.abs(success_probs - 0.5) * 2  # Scale to 0-1
+        
+        return success_probs, confidence
+    
+    def explain_batch(self, X):
+        """
+        Predict success probabilities with per-feature contributions
+        
+        Tree-path contributions from the compiled engine, computed in the
+        same pass as the probabilities. For boosting models, which add up
+        log-odds, each row's contributions are rescaled so they still sum
+        to its probability minus the base probability (their shares of the
+        log-odds change are kept).
+        
+        Args:
+            X: Feature matrix (n_samples, n_features)
+            
+        Returns:
+            Tuple of (success probabilities, confidence, base probability,
+            contributions (n_samples, n_features)), where each row's
+            contributions sum to its probability minus the base probability
+        """
+        if self.engine is None:
+            raise ValueError("Model not trained. Call train() first.")
+        
+        success_probs, bias, contributions = self.engine.contributions(X)
+        if self.engine.kind == 'forest':
+            base = bias
+        else:
+            base = float(1.0 / (1.0 + np.exp(-bias)))
+            log_odds = contributions.sum(axis=1)
+            # Near-zero log-odds changes fall back to the sigmoid's slope at the base
+            flat = np.abs(log_odds) < 1e-12
+            scale = np.where(flat, base * (1 - base), (success_probs - base) / np.where(flat, 1.0, log_odds))
+            contributions = contributions * scale[:, None]
+        
+        confidence = np.abs(success_probs - 0.5) * 2
+        return success_probs, confidence, base, contributions
+    
     def is_trained(self):
         """
         Check if the model has been trained
@@ -134,9 +455,7 @@ class MatchPredictor:
         Returns:
             Boolean indicating if model is trained
         """
-        if self.model is None:
-            return False
-        return hasattr(self.model, 'n_features_in_')
+        return self.engine is not None
     
     def get_feature_importance(self):
         """
@@ -145,13 +464,7 @@ class MatchPredictor:
         Returns:
             Array of feature importance scores or None if not available
         """
-        if self.model is None:
-            return None
-        
-        if hasattr(self.model, 'feature_importances_'):
-            return self.model.feature_importances_.tolist()
-        
-        return None
+        return self.feature_importance
     
     def get_model_info(self):
         """
@@ -160,12 +473,64 @@ class MatchPredictor:
         Returns:
             Dictionary with model information
         """
-        if self.model is None:
-            return {
-                'type': self.model_type,
-                'trained': False
-            }
+        if self.model_info is not None:
+            return self.model_info
+        
+        return {
+            'type': self.model_type,
+            'trained': False
+        }
+    
+    def _compile(self, X_holdout=None, y_holdout=None, max_accuracy_loss=None, min_trees=10):
+        """
+        Compile and compact the fitted trees for inference
+        
+        sklearn is not used on the prediction path after this point. Trees
+        are only pruned when held-out rows and an accuracy budget are given;
+        the stored sklearn estimator always keeps every tree.
+        """
+        from app.models.compaction import compact_model
         
+        engine = TreeEnsemble.from_sklearn(self.model)
+        self.engine, compaction = compact_model(
+            engine, X_holdout, y_holdout, max_accuracy_loss, min_trees
+        )
+        self.feature_importance = self._compute_feature_importance()
+        self.model_info = self._build_model_info()
+        self.model_info['compaction'] = compaction
+    
+    def _compute_feature_importance(self):
+        """
+        Normalized importance per feature of the freshly fitted model
+        
+        HistGradientBoosting has no feature_importances_, so its importance
+        is the total split gain per feature, normalized to sum to 1.
+        """
+        if self.model_type != 'hist_gradient_boosting':
+            return self.model.feature_importances_.tolist()
+        
+        gains = np.zeros(self.model.n_features_in_)
+        for predictors in self.model._predictors:
+            for predictor in predictors:
+                nodes = predictor.nodes
+                split = ~nodes['is_leaf'].astype(bool)
+                np.add.at(gains, nodes['feature_idx'][split], nodes['gain'][split])
+        total = gains.sum()
+        return (gains / total if total > 0 else gains).tolist()
+    
+    def _resource_metrics(self, fit_seconds):
+        """Fit time and memory use of the training run"""
+        metrics = {
+            'fit_seconds': float(round(fit_seconds, 3)),
+            'model_size_mb': float(round(self.engine.nbytes / 2**20, 3)),
+        }
+        peak = _peak_memory_mb()
+        if peak is not None:
+            metrics['peak_memory_mb'] = float(round(peak, 1))
+        return metrics
+    
+    def _build_model_info(self):
+        """Describe the freshly fitted sklearn model"""
         info = {
             'type': self.model_type,
             'trained': True,
@@ -184,5 +549,21 @@ class MatchPredictor:
                 'max_depth': self.model.max_depth,
                 'n_features': self.model.n_features_in_ if hasattr(self.model, 'n_features_in_') else None
             })
+        elif self.model_type == 'hist_gradient_boosting':
+            info.update({
+                'max_iter': self.model.max_iter,
+                # Fewer than max_iter when early stopping kicked in
+                'n_iter': self.model.n_iter_,
+                'learning_rate': self.model.learning_rate,
+                'max_leaf_nodes': self.model.max_leaf_nodes,
+                'max_depth': self.model.max_depth,
+                'max_bins': self.model.max_bins,
+                'n_features': self.model.n_features_in_
+            })
+        
+        info.update({
+            'n_nodes': self.engine.n_nodes,
+            'model_bytes': self.engine.nbytes,
+        })
         
         return info
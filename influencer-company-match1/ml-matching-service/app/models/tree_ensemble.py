@@ -0,0 +1,376 @@
+"""
+Compiled tree-ensemble inference engine
+Flattens trained scikit-learn forests into contiguous NumPy arrays
+"""
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+# Node and tree arrays persisted as individual .npy files so they can be
+# memory-mapped on load
+ARRAY_NAMES = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+
+
+# Per-tree node arrays in the layout of sklearn's Tree (children are -1 at leaves)
+_TreeArrays = namedtuple(
+    '_TreeArrays', 'node_count children_left children_right feature threshold max_depth'
+)
+
+
+def _sigmoid(x):
+    # exp overflows to inf for very negative log-odds, giving exactly 0
+    with np.errstate(over='ignore'):
+        return 1.0 / (1.0 + np.exp(-x))
+
+
+def _hist_tree_arrays(nodes):
+    """Adapt a HistGradientBoosting predictor's node records to _TreeArrays"""
+    is_leaf = nodes['is_leaf'].astype(bool)
+    return _TreeArrays(
+        node_count=len(nodes),
+        children_left=np.where(is_leaf, -1, nodes['left']),
+        children_right=np.where(is_leaf, -1, nodes['right']),
+        feature=nodes['feature_idx'],
+        threshold=nodes['num_threshold'],
+        max_depth=int(nodes['depth'].max()),
+    )
+
+
+class TreeEnsemble:
+    """
+    Array-based evaluator for a trained tree ensemble
+
+    All trees are concatenated into flat node arrays (feature, threshold,
+    left, right, value). Leaves point to themselves, so a whole batch walks
+    every tree at once in a fixed number of vectorized steps with no
+    per-row branching and no scikit-learn or joblib dispatch.
+
+    Supported kinds:
+        'forest':   leaf values are positive-class probabilities, averaged
+        'boosting': leaf values are raw log-odds (already scaled by the
+                    learning rate), summed with base_score and squashed
+
+    input_dtype is the precision rows are compared at: sklearn's exact
+    trees split float32 input, HistGradientBoosting compares float64.
+
+    Per-row feature contributions follow the tree path (Saabas): every
+    split a row passes moves the prediction from the parent's value to the
+    child's, and that change is credited to the split's feature. Summed
+    from the root, the changes give a table of per-feature contributions
+    for every node, built once per model; explaining a row is then a
+    lookup of its leaves' rows in that table, next to the leaf values.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots,
+                 max_depth, kind, base_score=0.0, n_features=None, input_dtype='float32'):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.kind = kind
+        self.base_score = float(base_score)
+        self.n_features = n_features
+        self.input_dtype = np.dtype(input_dtype)
+        self._path_contributions = None
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @property
+    def nbytes(self):
+        """Size of the node and tree arrays"""
+        return sum(getattr(self, name).nbytes for name in ARRAY_NAMES)
+
+    @property
+    def explain_nbytes(self):
+        """Size of the contribution table, 0 until it is built"""
+        table = self._path_contributions
+        return 0 if table is None else table.nbytes
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """
+        Compile a fitted RandomForestClassifier, GradientBoostingClassifier
+        or HistGradientBoostingClassifier
+
+        Args:
+            model: Fitted binary scikit-learn ensemble
+
+        Returns:
+            TreeEnsemble producing the same success probabilities
+        """
+        if len(model.classes_) != 2:
+            raise ValueError("Only binary classifiers can be compiled")
+
+        name = type(model).__name__
+        if name == 'RandomForestClassifier':
+            trees = [est.tree_ for est in model.estimators_]
+            # Positive-class fraction at every node
+            values = []
+            for tree in trees:
+                counts = tree.value[:, 0, :]
+                totals = counts.sum(axis=1)
+                totals[totals == 0] = 1.0
+                values.append(counts[:, 1] / totals)
+            return cls._from_trees(trees, values, 'forest', 0.0, model.n_features_in_)
+
+        if name == 'GradientBoostingClassifier':
+            trees = [est.tree_ for est in model.estimators_[:, 0]]
+            values = [tree.value[:, 0, 0] * model.learning_rate for tree in trees]
+            # Recover the prior log-odds from the public API instead of
+            # relying on the private init estimator
+            probe = np.zeros((1, model.n_features_in_))
+            raw = float(np.ravel(model.decision_function(probe))[0])
+            tree_sum = sum(
+                float(est.predict(probe)[0]) * model.learning_rate
+                for est in model.estimators_[:, 0]
+            )
+            return cls._from_trees(trees, values, 'boosting', raw - tree_sum, model.n_features_in_)
+
+        if name == 'HistGradientBoostingClassifier':
+            # One predictor per iteration for binary problems; leaf values
+            # already include the learning rate, split node values do not
+            # (they only matter for feature contributions)
+            nodes = [predictors[0].nodes for predictors in model._predictors]
+            trees = [_hist_tree_arrays(n) for n in nodes]
+            values = [
+                np.where(n['is_leaf'].astype(bool), n['value'], n['value'] * model.learning_rate)
+                for n in nodes
+            ]
+            base_score = float(np.ravel(model._baseline_prediction)[0])
+            return cls._from_trees(
+                trees, values, 'boosting', base_score, model.n_features_in_, input_dtype='float64'
+            )
+
+        raise ValueError(f"Unsupported model for compilation: {name}")
+
+    @classmethod
+    def _from_trees(cls, trees, values, kind, base_score, n_features, input_dtype='float32'):
+        """Concatenate per-tree node arrays into global flat arrays"""
+        features, thresholds, lefts, rights, roots = [], [], [], [], []
+        max_depth = 0
+        offset = 0
+
+        for tree in trees:
+            n = tree.node_count
+            left = tree.children_left.astype(np.int32)
+            right = tree.children_right.astype(np.int32)
+            is_leaf = left < 0
+            local = np.arange(n, dtype=np.int32)
+
+            # Leaves loop back to themselves so traversal can run a fixed
+            # number of steps regardless of each tree's depth
+            left = np.where(is_leaf, local, left) + offset
+            right = np.where(is_leaf, local, right) + offset
+            feature = np.where(is_leaf, 0, tree.feature).astype(np.int32)
+            threshold = np.where(is_leaf, 0.0, tree.threshold)
+
+            features.append(feature)
+            thresholds.append(threshold)
+            lefts.append(left)
+            rights.append(right)
+            roots.append(offset)
+            max_depth = max(max_depth, int(tree.max_depth))
+            offset += n
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            value=np.concatenate(values).astype(np.float64),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+            kind=kind,
+            base_score=base_score,
+            n_features=n_features,
+            input_dtype=input_dtype,
+        )
+
+    def save(self, directory):
+        """
+        Write the ensemble as one .npy file per array plus a JSON header
+
+        Args:
+            directory: Existing directory to write into
+        """
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(directory, f'{name}.npy'), np.ascontiguousarray(getattr(self, name)))
+
+        header = {
+            'kind': self.kind,
+            'max_depth': self.max_depth,
+            'base_score': self.base_score,
+            'n_features': self.n_features,
+            'input_dtype': self.input_dtype.name,
+        }
+        with open(os.path.join(directory, 'ensemble.json'), 'w') as f:
+            json.dump(header, f)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """
+        Load an ensemble written by save()
+
+        Args:
+            directory: Directory containing the arrays and header
+            mmap_mode: Passed to np.load; 'r' maps the arrays read-only so
+                pages are shared with the OS cache instead of copied
+
+        Returns:
+            TreeEnsemble backed by the loaded arrays
+        """
+        with open(os.path.join(directory, 'ensemble.json')) as f:
+            header = json.load(f)
+
+        arrays = {
+            name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+            for name in ARRAY_NAMES
+        }
+        return cls(**arrays, **header)
+
+    @property
+    def path_contributions(self):
+        """
+        Per-feature sum of value changes from the root to every node
+
+        Built on first use; leaf rows are what contributions() reads.
+        Shape (n_nodes, n_features), in the units of the node values,
+        stored as float32 like the values. The table is private to the
+        process, unlike the memory-mapped node arrays.
+        """
+        table = self._path_contributions
+        if table is None:
+            table = self._path_contributions = self._build_path_contributions()
+        return table
+
+    def _build_path_contributions(self):
+        left = np.asarray(self.left)
+        right = np.asarray(self.right)
+        feature = np.asarray(self.feature).astype(np.intp)
+        value = np.asarray(self.value, dtype=np.float64)
+        n_features = self.n_features or int(feature.max()) + 1
+        table = np.zeros((self.n_nodes, n_features))
+
+        # Level by level from the roots; leaves point to themselves
+        frontier = np.asarray(self.roots, dtype=np.intp)
+        while len(frontier):
+            frontier = frontier[left[frontier] != frontier]
+            for children in (left[frontier], right[frontier]):
+                table[children] = table[frontier]
+                table[children, feature[frontier]] += value[children] - value[frontier]
+            frontier = np.concatenate([left[frontier], right[frontier]]).astype(np.intp)
+        return table.astype(np.float32)
+
+    def apply(self, X):
+        """
+        Find the leaf reached in every tree for every row
+
+        Args:
+            X: Feature matrix (n_samples, n_features)
+
+        Returns:
+            Global leaf indices, shape (n_samples, n_trees)
+        """
+        # Compare at the precision the model was fitted at, which
+        # reproduces the exact split decisions scikit-learn makes
+        X = np.asarray(X, dtype=self.input_dtype)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.n_trees)).copy()
+
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return nodes
+
+    def predict_proba(self, X, chunk_size=4096):
+        """
+        Success probability for every row in one pass over all trees
+
+        Large inputs are processed in chunks of rows so the intermediate
+        (rows, trees) node matrix stays bounded.
+
+        Args:
+            X: Feature matrix (n_samples, n_features)
+            chunk_size: Maximum rows evaluated at once
+
+        Returns:
+            Positive-class probabilities, shape (n_samples,)
+        """
+        X = np.asarray(X, dtype=self.input_dtype)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        if X.shape[0] <= chunk_size:
+            return self._predict_chunk(X)
+
+        out = np.empty(X.shape[0])
+        for start in range(0, X.shape[0], chunk_size):
+            out[start:start + chunk_size] = self._predict_chunk(X[start:start + chunk_size])
+        return out
+
+    def contributions(self, X, chunk_size=4096):
+        """
+        Success probability with each feature's contribution to it
+
+        Contributions are in the model's output space: probabilities for
+        forests, log-odds for boosting. For every row,
+        bias + contributions.sum() is the forest's probability or the
+        boosting model's log-odds.
+
+        Args:
+            X: Feature matrix (n_samples, n_features)
+            chunk_size: Maximum rows evaluated at once
+
+        Returns:
+            Tuple of (probabilities (n_samples,), bias (float),
+            contributions (n_samples, n_features))
+        """
+        X = np.asarray(X, dtype=self.input_dtype)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        table = self.path_contributions
+        root_values = np.asarray(self.value, dtype=np.float64)[self.roots]
+        if self.kind == 'forest':
+            bias = float(root_values.mean())
+        else:
+            bias = self.base_score + float(root_values.sum())
+
+        probabilities = np.empty(X.shape[0])
+        contributions = np.empty((X.shape[0], table.shape[1]))
+        for start in range(0, max(X.shape[0], 1), chunk_size):
+            leaves = self.apply(X[start:start + chunk_size])
+            leaf_values = self.value[leaves]
+            chunk = table[leaves].sum(axis=1, dtype=np.float64)
+            if self.kind == 'forest':
+                probabilities[start:start + chunk_size] = leaf_values.mean(axis=1, dtype=np.float64)
+                chunk /= self.n_trees
+            else:
+                probabilities[start:start + chunk_size] = _sigmoid(
+                    self.base_score + leaf_values.sum(axis=1, dtype=np.float64)
+                )
+            contributions[start:start + chunk_size] = chunk
+        return probabilities, bias, contributions
+
+    def _predict_chunk(self, X):
+        leaf_values = self.value[self.apply(X)]
+
+        # Accumulate in float64 even when values are stored as float32
+        if self.kind == 'forest':
+            return leaf_values.mean(axis=1, dtype=np.float64)
+        return _sigmoid(self.base_score + leaf_values.sum(axis=1, dtype=np.float64))
@@ -0,0 +1,111 @@
+"""
+Prediction Cache
+Bounded LRU/TTL cache of scores keyed by model version and quantized features
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PredictionCache:
+    """
+    LRU cache with per-entry expiry for single-row predictions
+
+    Keys combine the model version with the feature vector snapped to a
+    grid of size `quantum`, so repeat scoring of the same pair is a dict
+    lookup and never reaches the forest. Vectors that differ by less than
+    the quantum share an entry; with features in [0, 1] and the default
+    quantum of 1e-4 that is well below the precision scores are reported at.
+    """
+
+    def __init__(self, max_size=10000, ttl=3600.0, quantum=1e-4):
+        """
+        Args:
+            max_size: Maximum number of cached rows (0 disables the cache)
+            ttl: Seconds an entry stays valid
+            quantum: Grid step used to quantize feature values
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.quantum = quantum
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def keys_for(self, version, X):
+        """
+        Cache keys for every row of a feature matrix
+
+        Args:
+            version: Model version the scores come from
+            X: Feature matrix (n_samples, n_features)
+
+        Returns:
+            List of hashable keys, one per row
+        """
+        quantized = np.rint(np.asarray(X, dtype=np.float64) / self.quantum).astype(np.int64)
+        return [(version, row.tobytes()) for row in quantized]
+
+    def get(self, key):
+        """Cached value for key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries if full"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (called when the live model changes)"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        """Hit/miss/eviction counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'maxSize': self.max_size,
+                'ttlSeconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
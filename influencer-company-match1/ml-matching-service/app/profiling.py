@@ -0,0 +1,225 @@
+"""
+On-Demand Profiling
+Sampling profiler armed for the next N requests, with collapsed-stack output
+
+Admin-only: the endpoints that arm it check the X-Admin-Token header
+against ADMIN_TOKEN and are disabled when no token is configured.
+"""
+import functools
+import hmac
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+from fastapi import Header, HTTPException
+
+# Shared secret for the admin endpoints; unset disables them
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+# Requests under these paths are never profiled (polling must not use up N)
+UNPROFILED_PREFIXES = ('/admin', '/metrics')
+
+
+def require_admin(x_admin_token: str = Header(default=None)):
+    """FastAPI dependency: 404 without ADMIN_TOKEN, 403 on a wrong token"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@functools.lru_cache(maxsize=4096)
+def _frame_name(code):
+    # Semicolons separate frames in the collapsed format
+    filename = code.co_filename
+    for path in sys.path:
+        if path and filename.startswith(path):
+            filename = filename[len(path):].lstrip(os.sep)
+            break
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'.replace(';', ':')
+
+
+def _collapse(frame):
+    stack = []
+    while frame is not None:
+        stack.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(stack))
+
+
+class SamplingProfiler:
+    """
+    Samples the event loop thread's stack while armed requests are running
+
+    arm(n) profiles the next n requests. While at least one of them is in
+    flight, the loop thread's stack is recorded every `interval` seconds:
+
+    - 'signal' mode (POSIX, loop on the main thread, as under uvicorn): a
+      SIGPROF interval timer interrupts the loop thread itself. The timer
+      counts CPU time, so idle time is not sampled, and the kernel tick
+      (typically 1-4 ms) bounds the real interval.
+    - 'thread' mode (elsewhere, e.g. Windows): a background thread reads the
+      loop thread's frame. It can only run when the loop thread gives up
+      the GIL, so samples lean towards blocking and C calls; the switch
+      interval is lowered while sampling to limit that.
+
+    Requests interleave on the loop, so samples taken during a profiled
+    request may include other requests' work. The result is in the
+    collapsed-stack format ("root;...;leaf count" per line) read by
+    flamegraph.pl, speedscope and inferno.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stacks = Counter()
+        self._thread = None
+        self._stop = threading.Event()
+        self._loop_thread = None
+        self.mode = None
+        self._previous_handler = None
+        self.requested = 0
+        self.remaining = 0
+        self.active = 0
+        self.profiled = 0
+        self.samples = 0
+        self.interval = 0.001
+        self.started_at = None
+        self.finished_at = None
+
+    def arm(self, requests, interval=0.001):
+        """
+        Profile the next `requests` requests, discarding any earlier profile
+
+        Must be called from the event loop thread (i.e. from a request
+        handler), which is the thread that gets sampled.
+        """
+        self.stop()
+        with self._lock:
+            self._stacks = Counter()
+            self._loop_thread = threading.get_ident()
+            self.requested = self.remaining = requests
+            self.active = self.profiled = self.samples = 0
+            self.interval = interval
+            self.started_at = time.time()
+            self.finished_at = None
+            self._stop = threading.Event()
+
+        if hasattr(signal, 'setitimer') and threading.current_thread() is threading.main_thread():
+            self.mode = 'signal'
+            self._previous_handler = signal.signal(signal.SIGPROF, self._on_signal)
+            signal.setitimer(signal.ITIMER_PROF, interval, interval)
+        else:
+            self.mode = 'thread'
+            self._thread = threading.Thread(target=self._sample, name='sampling-profiler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop sampling, keeping what was collected"""
+        if self.mode == 'signal' and self._previous_handler is not None:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, self._previous_handler)
+            self._previous_handler = None
+        thread = self._thread
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+            self._thread = None
+        with self._lock:
+            self.remaining = 0
+            if self.requested and self.finished_at is None:
+                self.finished_at = time.time()
+
+    def request_started(self, path):
+        """Count an incoming request; returns whether it is being profiled"""
+        if self.remaining <= 0 or path.startswith(UNPROFILED_PREFIXES):
+            return False
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            self.active += 1
+            return True
+
+    def request_finished(self):
+        with self._lock:
+            self.active -= 1
+            self.profiled += 1
+            done = self.remaining == 0 and self.active == 0
+        if done:
+            self.stop()
+
+    def _on_signal(self, signum, frame):
+        # Runs on the loop thread between bytecodes, possibly while that
+        # thread holds the lock: never block here
+        if not self.active or not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._stacks[_collapse(frame)] += 1
+            self.samples += 1
+        finally:
+            self._lock.release()
+
+    def _sample(self):
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(switch_interval, self.interval))
+        try:
+            while not self._stop.wait(self.interval):
+                if not self.active:
+                    continue
+                frame = sys._current_frames().get(self._loop_thread)
+                if frame is not None:
+                    stack = _collapse(frame)
+                    with self._lock:
+                        self._stacks[stack] += 1
+                        self.samples += 1
+        finally:
+            sys.setswitchinterval(switch_interval)
+
+    @property
+    def state(self):
+        if self.requested == 0:
+            return 'idle'
+        if self.finished_at is not None:
+            return 'finished'
+        return 'running' if self.profiled or self.active else 'armed'
+
+    def status(self):
+        """Progress of the current (or last) profile"""
+        with self._lock:
+            return {
+                'state': self.state,
+                'mode': self.mode,
+                'requested': self.requested,
+                'remaining': self.remaining,
+                'profiled': self.profiled,
+                'samples': self.samples,
+                'intervalMs': self.interval * 1000,
+                'startedAt': self.started_at,
+                'finishedAt': self.finished_at,
+            }
+
+    def collapsed(self):
+        """Collected stacks in collapsed format, most frequent first"""
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return ''.join(f'{stack} {count}\n' for stack, count in stacks)
+
+
+class ProfilerMiddleware:
+    """ASGI middleware marking the requests an armed profiler should sample"""
+
+    def __init__(self, app, profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.profiler.request_started(scope['path']):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.profiler.request_finished()
@@ -0,0 +1,38 @@
+"""
+Candidate Ranking
+Top-K selection over scored candidates
+"""
+import numpy as np
+
+
+def select_top_k(scores, k, min_score=None):
+    """
+    Indices of the k highest scores, best first
+
+    Uses np.argpartition so only the k winners are sorted: O(n + k log k)
+    rather than a full O(n log n) sort of every candidate.
+
+    Args:
+        scores: 1-D array of scores
+        k: Maximum number of indices to return
+        min_score: Scores below this are never returned
+
+    Returns:
+        Integer index array of length <= k, ordered by descending score
+    """
+    scores = np.asarray(scores)
+    candidates = np.arange(len(scores))
+
+    if min_score is not None:
+        candidates = candidates[scores >= min_score]
+
+    if k <= 0 or len(candidates) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    if len(candidates) > k:
+        # Negate so the partition puts the largest scores first
+        top = np.argpartition(-scores[candidates], k - 1)[:k]
+        candidates = candidates[top]
+
+    # Stable sort keeps request order among equal scores
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
@@ -0,0 +1,91 @@
+"""
+Response Encoding
+Fast JSON encoding and decoding for the prediction endpoints
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+def dumps(obj):
+    """Encode to compact JSON bytes (orjson when installed)"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+def loads(data):
+    """Decode JSON from bytes or str (orjson when installed)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class ModelResponseMeta:
+    """
+    Per-model parts of prediction responses, computed once per model
+
+    Feature importance and model info never change for a loaded model, so
+    they are built and JSON-encoded when the model is first used. Each
+    response then only encodes its own few floats and splices in the
+    pre-encoded featureImportance fragment.
+    """
+
+    def __init__(self, predictor, feature_names):
+        importance = predictor.get_feature_importance() or []
+        self.feature_importance = {
+            name: float(importance[i])
+            for i, name in enumerate(feature_names)
+            if i < len(importance)
+        }
+        self.model_info = predictor.get_model_info()
+        self._importance_tail = b',"featureImportance":' + dumps(self.feature_importance) + b'}'
+
+    def prediction_body(self, score, confidence, success_probability, contributions=None, base_score=None):
+        """JSON body of a PredictionResponse (with contributions when explained)"""
+        head = {
+            'score': score,
+            'confidence': confidence,
+            'successProbability': success_probability,
+        }
+        if contributions is not None:
+            head['baseScore'] = base_score
+            head['contributions'] = contributions
+        return dumps(head)[:-1] + self._importance_tail
+
+    def batch_body(self, scores, confidences, contributions=None, base_score=None):
+        """JSON body of a BatchPredictionResponse (with contributions when explained)"""
+        predictions = [
+            {'score': score, 'confidence': confidence, 'successProbability': score}
+            for score, confidence in zip(scores, confidences)
+        ]
+        if contributions is None:
+            return b'{"predictions":' + dumps(predictions) + self._importance_tail
+        for prediction, row in zip(predictions, contributions):
+            prediction['contributions'] = row
+        return (
+            b'{"predictions":' + dumps(predictions)
+            + b',"baseScore":' + dumps(base_score)
+            + self._importance_tail
+        )
+
+    def rank_body(self, ids, scores, confidences, total, contributions=None, base_score=None):
+        """JSON body of a RankResponse (with contributions when explained)"""
+        results = [
+            {'id': id_, 'score': score, 'confidence': confidence, 'successProbability': score}
+            for id_, score, confidence in zip(ids, scores, confidences)
+        ]
+        explanation = b''
+        if contributions is not None:
+            for result, row in zip(results, contributions):
+                result['contributions'] = row
+            explanation = b',"baseScore":' + dumps(base_score)
+        return (
+            b'{"results":' + dumps(results)
+            + b',"totalCandidates":' + dumps(total)
+            + explanation
+            + self._importance_tail
+        )
@@ -0,0 +1,358 @@
+"""
+Training Sample Store
+Append-only on-disk history of labelled match outcomes
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, so a single writing process is assumed
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+FEATURES_FILE = 'features.f32'
+OUTCOMES_FILE = 'outcomes.u8'
+TIMESTAMPS_FILE = 'timestamps.f64'
+PAIR_IDS_FILE = 'pair_ids.txt'
+STORE_FILE = 'store.json'
+UPDATES_FILE = 'updates.bin'
+WRITE_LOCK_FILE = 'write.lock'
+READERS_LOCK_FILE = 'readers.lock'
+
+
+def _lock(f, shared=False, blocking=True):
+    """flock a file; returns False if non-blocking and already locked"""
+    if fcntl is None:
+        return True
+    flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+    try:
+        fcntl.flock(f, flags if blocking else flags | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class SnapshotPin:
+    """
+    A store snapshot held for a training run
+
+    While any pin is held, in any process, updates to existing rows are
+    queued instead of written in place, so the pinned rows cannot change
+    under the run. Release it when the run ends.
+    """
+
+    def __init__(self, root, samples):
+        self.samples = samples
+        self._file = open(os.path.join(root, READERS_LOCK_FILE), 'a+b')
+        _lock(self._file, shared=True)
+
+    def release(self):
+        if not self._file.closed:
+            _unlock(self._file)
+            self._file.close()
+
+
+class SampleStore:
+    """
+    Labelled samples kept on local disk so /train only has to send new ones
+
+    Layout:
+        <root>/store.json        column names
+        <root>/features.f32      float32 rows, len(columns) values each
+        <root>/outcomes.u8       one byte per row (1 = successful match)
+        <root>/timestamps.f64    unix time each row was recorded
+        <root>/pair_ids.txt      one pair id per line, in row order
+
+    Rows are fixed-size records appended to each file, and reads are
+    memory-mapped, so training on the full history needs neither the
+    network nor a copy in RAM. A pair id is stored once: posting it again
+    overwrites its row in place (the latest outcome wins).
+
+    The row count is the shortest of the files, so a crash halfway through
+    an append loses at most that append, which is trimmed on open.
+
+    Several processes (e.g. uvicorn workers) may write: writes hold an
+    exclusive lock on write.lock and first catch up with rows appended by
+    other processes. Updates to known pair ids go to updates.bin and are
+    written into their rows only while no snapshot is pinned for training
+    (see pin()), so a running job never sees its rows change.
+    """
+
+    def __init__(self, root, columns):
+        """
+        Args:
+            root: Directory holding the store
+            columns: Feature column names, in matrix order
+        """
+        self.root = root
+        self.columns = list(columns)
+        self.n_features = len(self.columns)
+        self._lock = threading.Lock()
+        self._update_dtype = np.dtype([
+            ('row', '<i8'), ('features', '<f4', (self.n_features,)), ('outcome', 'u1'), ('timestamp', '<f8'),
+        ])
+        os.makedirs(self.root, exist_ok=True)
+
+        store_path = self._path(STORE_FILE)
+        if os.path.isfile(store_path):
+            with open(store_path) as f:
+                stored = json.load(f)['columns']
+            if stored != self.columns:
+                raise ValueError(f"Sample store at {root} has columns {stored}, expected {self.columns}")
+        else:
+            with open(store_path, 'w') as f:
+                json.dump({'columns': self.columns}, f)
+
+        self._index = {}
+        # Bytes of pair_ids.txt loaded into the index
+        self._ids_bytes = 0
+        with self._locked():
+            self.count = self._recover()
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive access to the store, across threads and processes"""
+        with self._lock, open(self._path(WRITE_LOCK_FILE), 'a+b') as f:
+            _lock(f)
+            try:
+                yield
+            finally:
+                _unlock(f)
+
+    def _refresh(self):
+        """Index rows appended by other processes (caller holds the lock)"""
+        size = os.path.getsize(self._path(PAIR_IDS_FILE))
+        if size == self._ids_bytes:
+            return
+        with open(self._path(PAIR_IDS_FILE), 'rb') as f:
+            f.seek(self._ids_bytes)
+            appended = f.read(size - self._ids_bytes)
+        lines = appended.split(b'\n')[:-1]
+        count = self.count + len(lines)
+        if size < self._ids_bytes or (
+            os.path.getsize(self._path(FEATURES_FILE)) != count * 4 * self.n_features
+            or os.path.getsize(self._path(OUTCOMES_FILE)) != count
+            or os.path.getsize(self._path(TIMESTAMPS_FILE)) != count * 8
+        ):
+            # A writer died mid-append: reload and trim as on open
+            self.count = self._recover()
+            return
+        for offset, line in enumerate(lines):
+            self._index[line.decode()] = self.count + offset
+        self._ids_bytes += sum(len(line) + 1 for line in lines)
+        self.count = count
+
+    def _recover(self):
+        """Load the pair id index and trim any partially written append"""
+        for name in (FEATURES_FILE, OUTCOMES_FILE, TIMESTAMPS_FILE, PAIR_IDS_FILE, UPDATES_FILE):
+            open(self._path(name), 'ab').close()
+
+        with open(self._path(PAIR_IDS_FILE), 'rb') as f:
+            lines = f.read().split(b'\n')
+        # Everything after the last newline is an unfinished write
+        pair_ids = [line.decode() for line in lines[:-1]]
+
+        count = min(
+            os.path.getsize(self._path(FEATURES_FILE)) // (4 * self.n_features),
+            os.path.getsize(self._path(OUTCOMES_FILE)),
+            os.path.getsize(self._path(TIMESTAMPS_FILE)) // 8,
+            len(pair_ids),
+        )
+
+        sizes = {
+            FEATURES_FILE: count * 4 * self.n_features,
+            OUTCOMES_FILE: count,
+            TIMESTAMPS_FILE: count * 8,
+            PAIR_IDS_FILE: sum(len(line.encode()) + 1 for line in pair_ids[:count]),
+        }
+        updates = os.path.getsize(self._path(UPDATES_FILE))
+        sizes[UPDATES_FILE] = updates - updates % self._update_dtype.itemsize
+        for name, size in sizes.items():
+            if os.path.getsize(self._path(name)) != size:
+                logger.warning("Trimming incomplete append from %s", name)
+                os.truncate(self._path(name), size)
+
+        self._index = {pair_id: row for row, pair_id in enumerate(pair_ids[:count])}
+        self._ids_bytes = sizes[PAIR_IDS_FILE]
+        return count
+
+    def add(self, pair_ids, X, y, timestamps=None):
+        """
+        Store labelled samples, updating rows whose pair id is already known
+
+        Args:
+            pair_ids: Unique id of each match pair
+            X: Feature matrix (n_samples, n_features)
+            y: Outcomes (n_samples,)
+            timestamps: Unix times (defaults to now)
+
+        Returns:
+            Tuple of (rows appended, rows updated in place)
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        y = np.asarray(y, dtype=np.uint8)
+        if timestamps is None:
+            timestamps = np.full(len(y), time.time())
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} feature columns, got shape {X.shape}")
+        if not len(pair_ids) == len(X) == len(y) == len(timestamps):
+            raise ValueError("pair_ids, features, outcomes and timestamps must have the same length")
+        if any('\n' in pair_id for pair_id in pair_ids):
+            raise ValueError("Pair ids must not contain newlines")
+
+        with self._locked():
+            self._refresh()
+            # The last occurrence of a pair id within a batch wins
+            latest = {pair_id: i for i, pair_id in enumerate(pair_ids)}
+            new = [i for pair_id, i in latest.items() if pair_id not in self._index]
+            existing = [i for pair_id, i in latest.items() if pair_id in self._index]
+
+            if existing:
+                updates = np.empty(len(existing), dtype=self._update_dtype)
+                updates['row'] = [self._index[pair_ids[i]] for i in existing]
+                updates['features'] = X[existing]
+                updates['outcome'] = y[existing]
+                updates['timestamp'] = timestamps[existing]
+                with open(self._path(UPDATES_FILE), 'ab') as f:
+                    f.write(updates.tobytes())
+
+            if new:
+                with open(self._path(FEATURES_FILE), 'ab') as f:
+                    f.write(X[new].tobytes())
+                with open(self._path(TIMESTAMPS_FILE), 'ab') as f:
+                    f.write(timestamps[new].tobytes())
+                with open(self._path(OUTCOMES_FILE), 'ab') as f:
+                    f.write(y[new].tobytes())
+                with open(self._path(PAIR_IDS_FILE), 'ab') as f:
+                    f.write(''.join(pair_ids[i] + '\n' for i in new).encode())
+
+                for offset, i in enumerate(new):
+                    self._index[pair_ids[i]] = self.count + offset
+                self.count += len(new)
+                self._ids_bytes = os.path.getsize(self._path(PAIR_IDS_FILE))
+
+            self._apply_updates()
+
+        return len(new), len(existing)
+
+    def _apply_updates(self):
+        """Write queued updates into their rows unless a snapshot is pinned (caller holds the lock)"""
+        if os.path.getsize(self._path(UPDATES_FILE)) == 0:
+            return
+        with open(self._path(READERS_LOCK_FILE), 'a+b') as readers:
+            if not _lock(readers, blocking=False):
+                return
+            try:
+                updates = np.fromfile(self._path(UPDATES_FILE), dtype=self._update_dtype)
+                # Later updates of a row win
+                _, last = np.unique(updates['row'][::-1], return_index=True)
+                updates = updates[len(updates) - 1 - last]
+                self._update(updates['row'], updates['features'], updates['outcome'], updates['timestamp'])
+                os.truncate(self._path(UPDATES_FILE), 0)
+            finally:
+                _unlock(readers)
+
+    def _update(self, rows, X, y, timestamps):
+        """Overwrite stored rows in place"""
+        features = np.memmap(self._path(FEATURES_FILE), dtype=np.float32, mode='r+',
+                             shape=(self.count, self.n_features))
+        outcomes = np.memmap(self._path(OUTCOMES_FILE), dtype=np.uint8, mode='r+', shape=(self.count,))
+        stamps = np.memmap(self._path(TIMESTAMPS_FILE), dtype=np.float64, mode='r+', shape=(self.count,))
+        features[rows] = X
+        outcomes[rows] = y
+        stamps[rows] = timestamps
+        for array in (features, outcomes, stamps):
+            array.flush()
+
+    def read(self, limit=None):
+        """
+        Memory-mapped view of the stored samples
+
+        Args:
+            limit: Only return the most recent `limit` rows
+
+        Returns:
+            Tuple of (features (n, n_features) float32, outcomes (n,) uint8,
+            timestamps (n,) float64); read-only, backed by the files
+        """
+        return read_samples(*self.snapshot(), limit)
+
+    def snapshot(self):
+        """Arguments for read_samples covering the rows stored so far"""
+        with self._locked():
+            self._refresh()
+            self._apply_updates()
+            return self.root, self.n_features, self.count
+
+    def pin(self):
+        """
+        Snapshot for a training run, with its rows frozen until released
+
+        Returns:
+            SnapshotPin whose `samples` are arguments for read_samples
+        """
+        with self._locked():
+            self._refresh()
+            self._apply_updates()
+            return SnapshotPin(self.root, (self.root, self.n_features, self.count))
+
+    @property
+    def pending_updates(self):
+        """Updates waiting for pinned snapshots to be released"""
+        return os.path.getsize(self._path(UPDATES_FILE)) // self._update_dtype.itemsize
+
+    def stats(self):
+        """Row counts and time range of the stored samples"""
+        _, outcomes, stamps = self.read()
+        return {
+            'samples': len(outcomes),
+            'successful': int(np.count_nonzero(outcomes)),
+            'pendingUpdates': self.pending_updates,
+            'columns': self.columns,
+            'bytes': sum(
+                os.path.getsize(self._path(name))
+                for name in (FEATURES_FILE, OUTCOMES_FILE, TIMESTAMPS_FILE, PAIR_IDS_FILE, UPDATES_FILE)
+            ),
+            'oldest': float(stamps.min()) if len(stamps) else None,
+            'newest': float(stamps.max()) if len(stamps) else None,
+        }
+
+
+def read_samples(root, n_features, count, limit=None):
+    """
+    Memory-map the first `count` rows of a store without opening it
+
+    Used by training workers: rows appended after the snapshot was taken
+    are ignored, and nothing is written. Rows can still be updated in
+    place unless the snapshot is pinned (SampleStore.pin()).
+    """
+    start = 0 if limit is None else max(0, count - limit)
+    if count == 0:
+        return (
+            np.empty((0, n_features), dtype=np.float32),
+            np.empty(0, dtype=np.uint8),
+            np.empty(0, dtype=np.float64),
+        )
+
+    features = np.memmap(os.path.join(root, FEATURES_FILE), dtype=np.float32, mode='r', shape=(count, n_features))
+    outcomes = np.memmap(os.path.join(root, OUTCOMES_FILE), dtype=np.uint8, mode='r', shape=(count,))
+    stamps = np.memmap(os.path.join(root, TIMESTAMPS_FILE), dtype=np.float64, mode='r', shape=(count,))
+    return features[start:], outcomes[start:], stamps[start:]
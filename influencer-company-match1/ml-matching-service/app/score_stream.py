@@ -0,0 +1,69 @@
+"""
+Bulk Scoring CLI
+Score an NDJSON file of {pairId, features} rows without going through HTTP
+
+Usage (from the ml-matching-service directory):
+    python -m app.score_stream --input pairs.ndjson --output scores.ndjson
+    cat pairs.ndjson | python -m app.score_stream > scores.ndjson
+
+Uses the registry's active model unless --version is given, falling back
+to the bundled default model. Throughput is reported on stderr.
+"""
+import argparse
+import json
+import os
+import sys
+
+from app.default_model import BUNDLED_MODEL_DIR
+from app.model_registry import ModelRegistry, load_artifact
+from app.stream_scoring import DEFAULT_CHUNK_SIZE, ThroughputMeter, iter_chunks, score_lines
+
+DEFAULT_REGISTRY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'artifacts')
+
+
+def load_predictor(registry_dir, version=None):
+    """Load a registry version, the active one, or the bundled default"""
+    registry = ModelRegistry(registry_dir)
+    version = version or registry.get_active()
+    if version is not None:
+        return registry.load(version)
+    return load_artifact(BUNDLED_MODEL_DIR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', help='NDJSON input file (default: stdin)')
+    parser.add_argument('--output', help='NDJSON output file (default: stdout)')
+    parser.add_argument('--version', help='Model version to score with (default: active)')
+    parser.add_argument('--registry', default=os.getenv('MODEL_REGISTRY_DIR', DEFAULT_REGISTRY_DIR),
+                        help='Model registry directory')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows scored per batch')
+    parser.add_argument('--progress-every', type=int, default=100, help='Report throughput every N chunks')
+    args = parser.parse_args()
+
+    predictor = load_predictor(args.registry, args.version)
+
+    source = open(args.input, 'rb') if args.input else sys.stdin.buffer
+    sink = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    meter = ThroughputMeter()
+
+    try:
+        for i, chunk in enumerate(iter_chunks(source, args.chunk_size), start=1):
+            encoded, rows, errors = score_lines(predictor, chunk)
+            meter.add(rows, errors)
+            sink.write(encoded)
+            if i % args.progress_every == 0:
+                print(json.dumps(meter.summary()), file=sys.stderr)
+    finally:
+        if args.input:
+            source.close()
+        if args.output:
+            sink.close()
+        else:
+            sink.flush()
+
+    print(json.dumps({'summary': meter.summary(), 'modelVersion': predictor.version}), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Shadow Scoring
+Compares a candidate model with the live one on sampled /predict traffic
+
+The candidate never scores on the request path: a sampled request only
+queues its feature row and live score once the response has been sent,
+and a background thread scores the queued rows with the candidate in
+batches, waiting briefly for rows to accumulate so it takes CPU in a
+few vectorized calls rather than one per request. When the queue is
+full, samples are dropped rather than slowing anything down.
+"""
+import logging
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ShadowScorer:
+    """
+    Scores a sample of live traffic with a candidate model in the background
+
+    For every scored row it records whether the candidate agrees with the
+    live model on the match decision (probability >= threshold), the score
+    delta (candidate - live, in score points 0-100) and the candidate's
+    scoring latency. Statistics are reset whenever the candidate changes.
+    """
+
+    def __init__(self, sample_rate=0.1, queue_size=1000, max_batch_size=256, linger=0.05, threshold=0.5,
+                 history=10000):
+        """
+        Args:
+            sample_rate: Default fraction of requests shadowed (0-1)
+            queue_size: Rows waiting for the candidate before samples are dropped
+            max_batch_size: Rows the worker scores with one call
+            linger: Seconds the worker waits for a batch to fill after its first row
+            threshold: Probability at which a pair counts as a predicted match
+            history: Recent deltas and latencies kept for percentiles
+        """
+        self.default_sample_rate = sample_rate
+        self.sample_rate = sample_rate
+        self.max_batch_size = max_batch_size
+        self.linger = linger
+        self.threshold = threshold
+        self.history = history
+        self.candidate = None
+        self.candidate_version = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._reset()
+
+    def _reset(self):
+        self.started_at = None
+        self.sampled = 0
+        self.scored = 0
+        self.dropped = 0
+        self.errors = 0
+        self.agreements = 0
+        self.delta_sum = 0.0
+        self.abs_delta_sum = 0.0
+        self.max_abs_delta = 0.0
+        self.score_seconds = 0.0
+        self.live_versions = set()
+        self._deltas = deque(maxlen=self.history)
+        self._batch_seconds = deque(maxlen=self.history)
+
+    @property
+    def enabled(self):
+        return self.candidate is not None
+
+    def set_candidate(self, version, predictor, sample_rate=None):
+        """Start shadowing a loaded predictor, discarding earlier statistics"""
+        with self._lock:
+            self._drain()
+            self.candidate, self.candidate_version = predictor, version
+            self.sample_rate = self.default_sample_rate if sample_rate is None else sample_rate
+            self._reset()
+            self.started_at = time.time()
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='shadow-scorer', daemon=True)
+            self._thread.start()
+        logger.info("Shadowing model version %s on %.1f%% of traffic", version, self.sample_rate * 100)
+
+    def clear(self):
+        """Stop shadowing; returns the candidate (version, predictor) it had"""
+        with self._lock:
+            candidate = (self.candidate_version, self.candidate)
+            self.candidate = self.candidate_version = None
+            self._drain()
+        return candidate
+
+    def _drain(self):
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def should_sample(self, live_predictor):
+        """Whether to shadow this request (cheap; called on the request path)"""
+        candidate = self.candidate
+        return (
+            candidate is not None
+            and live_predictor is not candidate
+            and random.random() < self.sample_rate
+        )
+
+    async def submit(self, row, live_probability, live_version):
+        """
+        Queue a row scored by the live model
+
+        Meant to run as a response background task, i.e. after the
+        response has been sent. Never blocks.
+        """
+        try:
+            self._queue.put_nowait((self.candidate_version, row, live_probability, live_version))
+            self.sampled += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                batch = [self._queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.linger
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self._score(batch)
+            except Exception as e:
+                self.errors += len(batch)
+                logger.error("Shadow scoring failed: %s", e)
+
+    def _score(self, batch):
+        candidate, version = self.candidate, self.candidate_version
+        # Rows queued for an earlier candidate are stale
+        batch = [item for item in batch if item[0] == version]
+        if candidate is None or not batch:
+            return
+
+        X = np.array([item[1] for item in batch], dtype=np.float64)
+        live = np.array([item[2] for item in batch])
+        started = time.perf_counter()
+        probabilities, _ = candidate.predict_proba_batch(X)
+        elapsed = time.perf_counter() - started
+
+        deltas = (probabilities - live) * 100
+        agreements = int(np.count_nonzero((probabilities >= self.threshold) == (live >= self.threshold)))
+        with self._lock:
+            if version != self.candidate_version:
+                return
+            self.scored += len(batch)
+            self.agreements += agreements
+            self.delta_sum += float(deltas.sum())
+            self.abs_delta_sum += float(np.abs(deltas).sum())
+            self.max_abs_delta = max(self.max_abs_delta, float(np.abs(deltas).max()))
+            self.score_seconds += elapsed
+            self.live_versions.update(item[3] for item in batch)
+            self._deltas.extend(deltas.tolist())
+            self._batch_seconds.append(elapsed)
+
+    def stop(self):
+        """Stop the worker thread"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        """Agreement, score deltas and candidate latency since shadowing started"""
+        with self._lock:
+            deltas = np.asarray(self._deltas)
+            batch_ms = np.asarray(self._batch_seconds) * 1000
+            scored = self.scored
+            return {
+                'enabled': self.enabled,
+                'candidateVersion': self.candidate_version,
+                'liveVersions': sorted(v for v in self.live_versions if v is not None),
+                'sampleRate': self.sample_rate,
+                'startedAt': self.started_at,
+                'sampled': self.sampled,
+                'scored': scored,
+                'dropped': self.dropped,
+                'errors': self.errors,
+                'queueDepth': self._queue.qsize(),
+                'agreement': round(self.agreements / scored, 4) if scored else None,
+                'scoreDelta': {
+                    'mean': self.delta_sum / scored if scored else None,
+                    'meanAbs': self.abs_delta_sum / scored if scored else None,
+                    'maxAbs': self.max_abs_delta if scored else None,
+                    'p5': float(np.percentile(deltas, 5)) if len(deltas) else None,
+                    'p50': float(np.percentile(deltas, 50)) if len(deltas) else None,
+                    'p95': float(np.percentile(deltas, 95)) if len(deltas) else None,
+                },
+                'latencyMs': {
+                    'perRow': self.score_seconds * 1000 / scored if scored else None,
+                    'batchP50': float(np.percentile(batch_ms, 50)) if len(batch_ms) else None,
+                    'batchP99': float(np.percentile(batch_ms, 99)) if len(batch_ms) else None,
+                },
+            }
@@ -0,0 +1,129 @@
+"""
+Streaming Scoring
+Chunked NDJSON scoring with constant memory, shared by /predict/stream and the CLI
+
+Input lines:  {"pairId": "...", "features": {"nicheAlignment": 0.8, ...}}
+              ("features" may also be a list of the 8 values in model order)
+Output lines: {"pairId": "...", "score": 81.2, "successProbability": 0.8123}
+              {"pairId": "...", "line": 17, "error": "..."} for rows that could not be read
+              {"summary": {"rows": ..., "errors": ..., "seconds": ..., "rowsPerSec": ...}}
+
+Output rows are in input order; "line" is the 1-based line number in the input.
+"""
+import time
+
+import numpy as np
+
+from app.models.match_predictor import FEATURE_NAMES
+from app.response_encoding import dumps, loads
+
+DEFAULT_CHUNK_SIZE = 2048
+
+
+def feature_row(features):
+    """Feature dict (missing values default to 0.5) or list to a model row"""
+    if isinstance(features, dict):
+        return [float(features.get(name, 0.5)) for name in FEATURE_NAMES]
+    if isinstance(features, list) and len(features) == len(FEATURE_NAMES):
+        return [float(value) for value in features]
+    raise ValueError(f"features must be an object or a list of {len(FEATURE_NAMES)} numbers")
+
+
+def score_lines(predictor, lines):
+    """
+    Score one chunk of NDJSON lines with a single vectorized call
+
+    Args:
+        predictor: MatchPredictor to score with
+        lines: (line number, line) pairs, as yielded by iter_chunks/aiter_chunks
+
+    Returns:
+        Tuple of (encoded NDJSON output in input order, rows scored, rows rejected)
+    """
+    pair_ids, rows, slots, output = [], [], [], []
+
+    for number, line in lines:
+        pair_id = None
+        try:
+            record = loads(line)
+            pair_id = record.get('pairId')
+            rows.append(feature_row(record['features']))
+            pair_ids.append(pair_id)
+            # Filled in once the chunk is scored
+            slots.append(len(output))
+            output.append(None)
+        except Exception as e:
+            output.append(dumps({'pairId': pair_id, 'line': number, 'error': str(e) or type(e).__name__}))
+
+    if rows:
+        probabilities, _ = predictor.predict_proba_batch(np.array(rows, dtype=np.float32))
+        scores = np.round(probabilities * 100, 1).tolist()
+        for slot, pair_id, score, probability in zip(slots, pair_ids, scores, np.round(probabilities, 4).tolist()):
+            output[slot] = dumps({'pairId': pair_id, 'score': score, 'successProbability': probability})
+
+    encoded = b'\n'.join(output) + b'\n' if output else b''
+    return encoded, len(rows), len(lines) - len(rows)
+
+
+class ThroughputMeter:
+    """Counts scored rows and reports rows/sec since creation"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rows = 0
+        self.errors = 0
+
+    def add(self, rows, errors):
+        self.rows += rows
+        self.errors += errors
+
+    def summary(self):
+        seconds = time.perf_counter() - self.started
+        return {
+            'rows': self.rows,
+            'errors': self.errors,
+            'seconds': round(seconds, 3),
+            'rowsPerSec': round(self.rows / seconds, 1) if seconds > 0 else 0.0,
+        }
+
+    def summary_line(self):
+        return dumps({'summary': self.summary()}) + b'\n'
+
+
+def iter_chunks(lines, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Group non-blank lines from a line iterator into lists of chunk_size (line number, line) pairs"""
+    chunk = []
+    for number, line in enumerate(lines, start=1):
+        if line.strip():
+            chunk.append((number, line))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+async def aiter_chunks(byte_stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Group lines from an async stream of arbitrary byte blocks into chunks
+
+    Only the current chunk and one partial line are held in memory. Lines
+    are (line number, line) pairs, numbered from 1.
+    """
+    pending = b''
+    chunk = []
+    number = 0
+    async for block in byte_stream:
+        pending += block
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            number += 1
+            if line.strip():
+                chunk.append((number, line))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+    if pending.strip():
+        chunk.append((number + 1, pending))
+    if chunk:
+        yield chunk
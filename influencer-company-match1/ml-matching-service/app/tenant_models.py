@@ -0,0 +1,270 @@
+"""
+Tenant Models
+Per-tenant model registries with a memory-bounded LRU of loaded predictors
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from app.model_registry import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+# Tenant ids become directory names, so they are kept to a safe alphabet
+TENANT_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def validate_tenant_id(tenant):
+    """Return the tenant id, raising ValueError if it is not a safe name"""
+    if not TENANT_ID_PATTERN.match(tenant):
+        raise ValueError(f"Invalid tenant id {tenant!r}: use 1-64 letters, digits, '_' or '-'")
+    return tenant
+
+
+class _Entry:
+    __slots__ = ('version', 'predictor', 'stamp', 'checked_at')
+
+    def __init__(self, version, predictor, stamp):
+        self.version = version
+        self.predictor = predictor
+        self.stamp = stamp
+        self.checked_at = time.monotonic()
+
+    @property
+    def nbytes(self):
+        # The contribution table counts once built, even after loading
+        engine = self.predictor.engine
+        return int(engine.nbytes + engine.explain_nbytes)
+
+
+class TenantModelCache:
+    """
+    Loaded tenant predictors, least recently used evicted past a byte budget
+
+    Each tenant has its own ModelRegistry under <root>/<tenant>, with the
+    usual versions and ACTIVE pointer. A tenant's active version is loaded
+    (memory-mapped) the first time the tenant is scored and kept while it
+    is among the most recently used; once the loaded models' arrays add up
+    to more than max_bytes, the coldest ones are dropped and loaded again
+    from disk when next needed. A model's contribution table (?explain=true)
+    counts towards the budget once built. The entry being used is never evicted, so
+    a single model larger than the budget still serves.
+
+    Every recheck_interval, an access also stats the tenant's ACTIVE file,
+    so a version activated by another worker is picked up. Tenants without
+    a model of their own are served the default model (get returns None).
+
+    Disk reads and loads run outside the cache lock, under a per-tenant
+    lock (striped, so there is a fixed number of them), so one tenant's
+    cold load neither blocks lookups of others nor is repeated by
+    concurrent requests for the same tenant. cached() answers from memory
+    only, for callers that must not block.
+    """
+
+    def __init__(self, root, max_bytes, recheck_interval=1.0, max_absent=1024, precompute_explain=False):
+        """
+        Args:
+            root: Directory holding one registry per tenant
+            max_bytes: Budget for the arrays of all loaded tenant models
+            recheck_interval: Seconds between checks of a tenant's ACTIVE file
+            max_absent: Tenants without a model remembered at once
+            precompute_explain: Build each model's contribution table on load
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.recheck_interval = recheck_interval
+        self.precompute_explain = precompute_explain
+        self._entries = OrderedDict()
+        self._registries = {}
+        # Tenants found without a model, and when, so they are not stat'ed per
+        # request; oldest first and capped, since clients choose the ids
+        self._absent = OrderedDict()
+        self.max_absent = max_absent
+        self._lock = threading.Lock()
+        self._load_locks = [threading.Lock() for _ in range(64)]
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+        self.loads = 0
+        self.load_seconds = 0.0
+        self.max_load_seconds = 0.0
+        self.evictions = 0
+        self.eviction_seconds = 0.0
+
+    @property
+    def resident_bytes(self):
+        """Bytes of the loaded models, their contribution tables included"""
+        return sum(entry.nbytes for entry in list(self._entries.values()))
+
+    def has_models(self, tenant):
+        return os.path.isdir(os.path.join(self.root, tenant))
+
+    def registry(self, tenant):
+        """The tenant's registry, created on first use"""
+        with self._lock:
+            registry = self._registries.get(tenant)
+            if registry is None:
+                registry = self._registries[tenant] = ModelRegistry(os.path.join(self.root, tenant))
+            return registry
+
+    def _load_lock(self, tenant):
+        return self._load_locks[hash(tenant) % len(self._load_locks)]
+
+    def cached(self, tenant):
+        """
+        The tenant's predictor if it can be answered without touching disk
+
+        Returns:
+            (found, predictor): found is False when get() has to check the
+            tenant's registry; predictor is None for a tenant without a model
+        """
+        with self._lock:
+            return self._cached(tenant)
+
+    def _cached(self, tenant):
+        """cached() with the lock held"""
+        absent_since = self._absent.get(tenant)
+        if absent_since is not None and time.monotonic() - absent_since < self.recheck_interval:
+            self.fallbacks += 1
+            return True, None
+        entry = self._entries.get(tenant)
+        if entry is not None and time.monotonic() - entry.checked_at < self.recheck_interval:
+            self._entries.move_to_end(tenant)
+            self.hits += 1
+            return True, entry.predictor
+        return False, None
+
+    def get(self, tenant):
+        """
+        The tenant's live predictor, loading it if needed
+
+        Returns:
+            MatchPredictor, or None when the tenant has no trained model
+        """
+        found, predictor = self.cached(tenant)
+        if found:
+            return predictor
+
+        with self._load_lock(tenant):
+            with self._lock:
+                # Another request may have checked or loaded it meanwhile
+                found, predictor = self._cached(tenant)
+                if found:
+                    return predictor
+                entry = self._entries.get(tenant)
+
+            if entry is not None:
+                stamp = self.registry(tenant).active_stamp()
+                if stamp == entry.stamp:
+                    with self._lock:
+                        self._touch(tenant, entry, stamp)
+                        self.hits += 1
+                    return entry.predictor
+
+            version = self.registry(tenant).get_active() if self.has_models(tenant) else None
+            if version is None:
+                with self._lock:
+                    self._absent.pop(tenant, None)
+                    self._absent[tenant] = time.monotonic()
+                    while len(self._absent) > self.max_absent:
+                        self._absent.popitem(last=False)
+                    self.fallbacks += 1
+                return None
+            if entry is not None and entry.version == version:
+                stamp = self.registry(tenant).active_stamp()
+                with self._lock:
+                    self._absent.pop(tenant, None)
+                    self._touch(tenant, entry, stamp)
+                return entry.predictor
+            with self._lock:
+                self.misses += 1
+            return self._load(tenant, version).predictor
+
+    def _touch(self, tenant, entry, stamp):
+        """Mark an entry as checked against ACTIVE just now (caller holds the lock)"""
+        entry.stamp = stamp
+        entry.checked_at = time.monotonic()
+        if self._entries.get(tenant) is entry:
+            self._entries.move_to_end(tenant)
+
+    def activate(self, tenant, version):
+        """Make a stored version the tenant's live model, here and on disk"""
+        registry = self.registry(tenant)
+        if not registry.exists(version):
+            raise KeyError(version)
+        with self._load_lock(tenant):
+            registry.set_active(version)
+            entry = self._load(tenant, version)
+        logger.info("Activated model version %s for tenant %s", version, tenant)
+        return entry.predictor
+
+    def _load(self, tenant, version):
+        """
+        Load a version and swap it into the cache
+
+        The caller holds the tenant's load lock; the cache lock is only
+        taken once the model is loaded.
+        """
+        registry = self.registry(tenant)
+        started = time.perf_counter()
+        stamp = registry.active_stamp()
+        predictor = registry.load(version)
+        predictor.tenant = tenant
+        if self.precompute_explain:
+            _ = predictor.engine.path_contributions
+        elapsed = time.perf_counter() - started
+
+        entry = _Entry(version, predictor, stamp)
+        with self._lock:
+            self.loads += 1
+            self.load_seconds += elapsed
+            self.max_load_seconds = max(self.max_load_seconds, elapsed)
+            self._absent.pop(tenant, None)
+            self._entries.pop(tenant, None)
+            self._entries[tenant] = entry
+            self._evict(keep=tenant)
+        logger.info("Loaded model version %s for tenant %s in %.1fms", version, tenant, elapsed * 1000)
+        return entry
+
+    def _evict(self, keep):
+        """Drop least recently used models until within the byte budget (caller holds the lock)"""
+        started = time.perf_counter()
+        evicted = 0
+        resident = self.resident_bytes
+        while resident > self.max_bytes and len(self._entries) > 1:
+            tenant = next(iter(self._entries))
+            if tenant == keep:
+                self._entries.move_to_end(tenant)
+                continue
+            entry = self._entries.pop(tenant)
+            resident -= entry.nbytes
+            evicted += 1
+        if evicted:
+            self.evictions += evicted
+            self.eviction_seconds += time.perf_counter() - started
+
+    def stats(self):
+        """Residency, hit/miss and load/eviction counters and latencies"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'tenants': len(self._entries),
+                'residentTenants': list(self._entries),
+                'residentBytes': self.resident_bytes,
+                'maxBytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'fallbacks': self.fallbacks,
+                'loads': self.loads,
+                'loadMs': {
+                    'mean': self.load_seconds * 1000 / self.loads if self.loads else 0.0,
+                    'max': self.max_load_seconds * 1000,
+                    'total': self.load_seconds * 1000,
+                },
+                'evictions': self.evictions,
+                'evictionMsTotal': self.eviction_seconds * 1000,
+            }
@@ -0,0 +1,299 @@
+"""
+Background Training Jobs
+Runs model training in a worker process so serving is never blocked
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Progress queue inherited by worker processes (set by _init_worker)
+_progress_queue = None
+
+
+def _init_worker(progress_queue, threads=None):
+    """Pool initializer: keep the progress queue and cap this worker's threads"""
+    global _progress_queue
+    _progress_queue = progress_queue
+    if threads:
+        # Read when the estimators are created and when OpenMP starts
+        os.environ['TRAINING_THREADS'] = str(threads)
+        os.environ['OMP_NUM_THREADS'] = str(threads)
+
+
+def _run_training(job_id, model_type, X, y, registry_root, base_version=None, options=None,
+                  samples=None, fingerprint=None, search=None, compaction=None):
+    """
+    Train a MatchPredictor inside a worker process and save it
+
+    The artifact is written straight to the registry from the worker, so
+    the fitted model never has to be pickled back to the server process.
+    With a base_version, that version's stored estimator is updated with
+    the new rows (see MatchPredictor.train_incremental) instead of
+    training from scratch. When X is None the rows are memory-mapped from
+    the sample store snapshot in `samples` instead of being sent over.
+    A full run with `search` options picks its hyperparameters with
+    search_hyperparameters first, and `compaction` options prune trees
+    within an accuracy budget.
+
+    Returns:
+        Tuple of (saved model version, metrics dict, search report or None)
+    """
+    from app.model_registry import ModelRegistry
+    from app.models.match_predictor import MatchPredictor
+
+    def report(progress, stage):
+        if _progress_queue is not None:
+            _progress_queue.put((job_id, progress, stage))
+
+    if X is None:
+        from app.sample_store import read_samples
+        X, outcomes, _ = read_samples(*samples)
+        y = outcomes.astype(bool)
+
+    registry = ModelRegistry(registry_root)
+    predictor = MatchPredictor(model_type)
+    if base_version is None:
+        metrics = predictor.train(
+            X, y, progress_callback=report, search=search, compaction=compaction
+        )
+    else:
+        base_model = registry.load_estimator(base_version)
+        if base_model is None:
+            raise ValueError(f"Model version {base_version} has no stored estimator")
+        metrics = predictor.train_incremental(
+            X, y, base_model, progress_callback=report, **(options or {})
+        )
+    report(0.95, 'saving')
+    version = registry.save(predictor, metrics, base_version=base_version, fingerprint=fingerprint)
+    return version, metrics, predictor.search_report
+
+
+class TrainingJob:
+    """State of a single training run"""
+
+    def __init__(self, model_type, samples, mode='full', base_version=None, tenant=None):
+        self.id = uuid.uuid4().hex
+        self.model_type = model_type
+        self.samples = samples
+        self.mode = mode
+        self.base_version = base_version
+        # Tenant whose registry the model is saved to (None: the default registry)
+        self.tenant = tenant
+        self.skipped = False
+        self.search = None
+        self.status = 'queued'
+        self.stage = 'queued'
+        self.progress = 0.0
+        self.metrics = None
+        self.model_version = None
+        self.error = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            'jobId': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': round(self.progress, 3),
+            'modelType': self.model_type,
+            'mode': self.mode,
+            'baseVersion': self.base_version,
+            'tenantId': self.tenant,
+            'skipped': self.skipped,
+            'samples': self.samples,
+            'metrics': self.metrics,
+            'search': self.search,
+            'modelVersion': self.model_version,
+            'error': self.error,
+            'createdAt': self.created_at,
+            'startedAt': self.started_at,
+            'finishedAt': self.finished_at,
+        }
+
+
+class TrainingJobManager:
+    """
+    Queues training runs on a process pool and tracks their progress
+
+    Each finished run is saved to the model registry by the worker, and
+    its version is handed to on_complete, which is expected to load it and
+    swap it in with a single reference assignment. Requests already in
+    flight keep using the predictor they started with.
+    """
+
+    def __init__(self, registry_root, on_complete, max_workers=1, max_jobs=50, threads=None):
+        """
+        Args:
+            registry_root: ModelRegistry directory the workers save into
+            on_complete: Callable(version, metrics, job) that activates the model;
+                run in a thread, off the event loop
+            max_workers: Number of training processes
+            max_jobs: Number of finished jobs kept for status queries
+            threads: Cores each training process may use (None: all)
+        """
+        self.registry_root = registry_root
+        self.on_complete = on_complete
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs
+        self.threads = threads
+        self.jobs = OrderedDict()
+        self._executor = None
+        self._progress_queue = None
+        self._tasks = set()
+
+    def _ensure_executor(self):
+        """Create the process pool on first use"""
+        if self._executor is None:
+            # spawn avoids forking a process that already runs event-loop threads
+            context = multiprocessing.get_context('spawn')
+            self._progress_queue = context.Queue()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self._progress_queue, self.threads),
+            )
+            threading.Thread(
+                target=self._drain_progress,
+                args=(self._progress_queue,),
+                name='training-progress',
+                daemon=True,
+            ).start()
+        return self._executor
+
+    def _drain_progress(self, progress_queue):
+        """Apply progress updates sent by worker processes"""
+        while True:
+            update = progress_queue.get()
+            if update is None:
+                return
+            job_id, progress, stage = update
+            job = self.jobs.get(job_id)
+            if job is None or job.status not in ('queued', 'running'):
+                continue
+            if job.status == 'queued':
+                job.status = 'running'
+                job.started_at = datetime.now().isoformat()
+            job.progress = progress
+            job.stage = stage
+
+    def submit(self, X, y, model_type='random_forest', base_version=None, options=None, samples=None,
+               fingerprint=None, search=None, compaction=None, registry_root=None, tenant=None, pin=None):
+        """
+        Queue a training run
+
+        Args:
+            X: Feature matrix (n_samples, n_features)
+            y: Target vector (n_samples,)
+            model_type: MatchPredictor model type
+            base_version: Registry version to update incrementally (None trains from scratch)
+            options: Keyword arguments for MatchPredictor.train_incremental
+            samples: SampleStore.snapshot() to train on when X and y are None
+            fingerprint: Fingerprint of the inputs, stored with the new version
+            search: Hyperparameter search options for a full run
+            compaction: Tree pruning options for a full run
+            registry_root: Registry to save into instead of the default one
+            tenant: Tenant owning that registry, recorded on the job
+            pin: SnapshotPin of `samples`, released when the run ends
+
+        Returns:
+            The queued TrainingJob
+        """
+        mode = 'full' if base_version is None else 'incremental'
+        n_samples = len(y) if y is not None else samples[2]
+        job = TrainingJob(model_type, int(n_samples), mode=mode, base_version=base_version, tenant=tenant)
+        self._add_job(job)
+
+        task = asyncio.get_running_loop().create_task(
+            self._run(job, X, y, options, samples, fingerprint, search, compaction,
+                      registry_root or self.registry_root, pin)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def record_skipped(self, model_type, samples, version, metrics, base_version=None, search=None,
+                       tenant=None):
+        """
+        Record a run that was skipped because its inputs were already trained on
+
+        Returns:
+            A completed TrainingJob pointing at the existing version
+        """
+        mode = 'full' if base_version is None else 'incremental'
+        job = TrainingJob(model_type, int(samples), mode=mode, base_version=base_version, tenant=tenant)
+        job.skipped = True
+        job.status = 'completed'
+        job.stage = 'skipped'
+        job.progress = 1.0
+        job.model_version = version
+        job.metrics = metrics
+        job.search = search
+        job.started_at = job.finished_at = job.created_at
+        self._add_job(job)
+        logger.info("Training job %s skipped: inputs match version %s", job.id, version)
+        return job
+
+    def _add_job(self, job):
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.max_jobs:
+            self.jobs.popitem(last=False)
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    async def _run(self, job, X, y, options=None, samples=None, fingerprint=None, search=None,
+                   compaction=None, registry_root=None, pin=None):
+        loop = asyncio.get_running_loop()
+        executor = None
+        try:
+            executor = self._ensure_executor()
+            version, metrics, job.search = await loop.run_in_executor(
+                executor, _run_training, job.id, job.model_type, X, y, registry_root or self.registry_root,
+                job.base_version, options, samples, fingerprint, search, compaction
+            )
+            job.stage = 'activating'
+            # Loading the model and building its tables must not stall requests
+            await asyncio.to_thread(self.on_complete, version, metrics, job)
+            job.model_version = version
+            job.metrics = metrics
+            job.status = 'completed'
+            job.stage = 'completed'
+            job.progress = 1.0
+            logger.info("Training job %s completed (%s, %d samples)", job.id, job.mode, job.samples)
+        except Exception as e:
+            job.status = 'failed'
+            job.stage = 'failed'
+            job.error = str(e) or type(e).__name__
+            logger.error("Training job %s failed: %s", job.id, job.error)
+            if isinstance(e, BrokenProcessPool):
+                # A worker died (e.g. OOM-killed); the next job gets a new pool
+                self._reset_executor(executor)
+        finally:
+            if pin is not None:
+                pin.release()
+            job.finished_at = datetime.now().isoformat()
+
+    def _reset_executor(self, executor):
+        """Drop a broken pool, unless it was already replaced"""
+        if executor is not None and executor is self._executor:
+            logger.warning("Training process pool is broken; starting a new one for the next job")
+            self.shutdown()
+
+    def shutdown(self):
+        """Stop the worker pool and progress reader"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._progress_queue.put(None)
+            self._executor = None
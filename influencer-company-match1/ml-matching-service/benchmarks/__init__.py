@@ -0,0 +1 @@
+# ML Matching Service Benchmarks
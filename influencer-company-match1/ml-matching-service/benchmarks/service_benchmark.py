@@ -0,0 +1,408 @@
+"""
+Service Benchmark
+Prediction latency, throughput under concurrency, explanation overhead,
+candidate retrieval and training time, in-process
+
+The FastAPI app is driven through httpx's ASGI transport, so the numbers
+cover request parsing, scoring and response encoding but no network.
+Results are written as JSON; pass an earlier result with --compare to see
+the change per metric between commits.
+
+Usage (from the ml-matching-service directory):
+    python -m benchmarks.service_benchmark --output bench.json
+    python -m benchmarks.service_benchmark --only latency,throughput --compare bench.json
+    python -m benchmarks.service_benchmark --only explain
+    python -m benchmarks.service_benchmark --only retrieval --index-sizes 100000,500000
+
+Requires httpx (also needed by FastAPI's TestClient).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+
+# Request fields are the model's features, so every one of them varies
+from app.models.match_predictor import FEATURE_NAMES as REQUEST_FIELDS  # noqa: E402
+
+SUITES = ('latency', 'throughput', 'explain', 'retrieval', 'training')
+
+
+def synthetic_dataset(n_samples, n_features=len(REQUEST_FIELDS), seed=0):
+    """
+    Match outcomes that depend on the features with some noise
+
+    Returns:
+        Tuple of (features (n_samples, n_features) in [0, 1], outcomes bool)
+    """
+    rng = np.random.default_rng(seed)
+    X = rng.random((n_samples, n_features))
+    weights = np.linspace(1.5, 0.5, n_features)
+    logits = (X - 0.5) @ weights * 4 + rng.normal(0, 1, n_samples)
+    return X, logits > 0
+
+
+def percentiles(seconds):
+    """p50/p95/p99/mean of a list of durations, in milliseconds"""
+    ms = np.asarray(seconds) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'mean_ms': round(float(ms.mean()), 3),
+    }
+
+
+def _request_rows(rng, n):
+    return [dict(zip(REQUEST_FIELDS, row)) for row in rng.random((n, len(REQUEST_FIELDS))).tolist()]
+
+
+def load_app(serve_samples, model_type):
+    """
+    Import the app against throwaway registry and sample store directories
+
+    With serve_samples > 0 a model of that many synthetic rows is trained
+    and made live, so latency reflects a realistically sized forest rather
+    than the small bundled default.
+    """
+    workdir = tempfile.mkdtemp(prefix='ml-bench-')
+    os.environ['MODEL_REGISTRY_DIR'] = os.path.join(workdir, 'artifacts')
+    os.environ['SAMPLE_STORE_DIR'] = os.path.join(workdir, 'samples')
+    os.environ['MODEL_PRELOAD'] = 'false'
+    # Random rows would never hit the cache; measure the model itself
+    os.environ['PREDICTION_CACHE_SIZE'] = '0'
+
+    from app import main
+    from app.models.match_predictor import MatchPredictor
+
+    if serve_samples:
+        predictor = MatchPredictor(model_type)
+        metrics = predictor.train(*synthetic_dataset(serve_samples))
+        main.activate_model(main.registry.save(predictor, metrics))
+    else:
+        main.ensure_model_loaded()
+    return main
+
+
+async def bench_latency(client, requests, batch_sizes, seed=1):
+    """Sequential single-row and batch request latency"""
+    rng = np.random.default_rng(seed)
+    single = []
+    for features in _request_rows(rng, requests):
+        started = time.perf_counter()
+        response = await client.post('/predict', json=features)
+        single.append(time.perf_counter() - started)
+        response.raise_for_status()
+
+    batches = []
+    for size in batch_sizes:
+        timings = []
+        # Fewer repetitions for big batches, enough for a stable p99
+        for _ in range(max(20, requests // max(1, size // 10))):
+            payload = {'features': _request_rows(rng, size)}
+            started = time.perf_counter()
+            response = await client.post('/predict/batch', json=payload)
+            timings.append(time.perf_counter() - started)
+            response.raise_for_status()
+        batches.append({
+            'batch_size': size,
+            'requests': len(timings),
+            **percentiles(timings),
+            'rows_per_s': round(size * len(timings) / sum(timings), 1),
+        })
+
+    return {'single': {'requests': requests, **percentiles(single)}, 'batch': batches}
+
+
+async def bench_throughput(client, concurrency_levels, requests, seed=2):
+    """Requests per second with N clients each sending /predict back to back"""
+    rng = np.random.default_rng(seed)
+    results = []
+    for concurrency in concurrency_levels:
+        rows = _request_rows(rng, requests)
+        timings = []
+
+        async def worker(offset):
+            for features in rows[offset::concurrency]:
+                started = time.perf_counter()
+                response = await client.post('/predict', json=features)
+                timings.append(time.perf_counter() - started)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        results.append({
+            'concurrency': concurrency,
+            'requests': requests,
+            'requests_per_s': round(requests / elapsed, 1),
+            **percentiles(timings),
+        })
+    return results
+
+
+async def bench_explain(client, predictor, requests, batch_sizes, seed=4):
+    """
+    Cost of ?explain=true on /predict and /predict/batch, and in the model
+
+    Plain and explained requests alternate so both see the same conditions.
+    The model-level timings compare predict_proba_batch with explain_batch
+    on the same rows, without HTTP or JSON.
+    """
+    rng = np.random.default_rng(seed)
+
+    async def timed(url, payload):
+        started = time.perf_counter()
+        response = await client.post(url, json=payload)
+        elapsed = time.perf_counter() - started
+        response.raise_for_status()
+        return elapsed
+
+    plain, explained = [], []
+    for features in _request_rows(rng, requests):
+        plain.append(await timed('/predict', features))
+        explained.append(await timed('/predict?explain=true', features))
+    single = {
+        'requests': requests,
+        'plain': percentiles(plain),
+        'explained': percentiles(explained),
+        'overhead_pct': round((np.median(explained) / np.median(plain) - 1) * 100, 1),
+    }
+
+    batches = []
+    for size in batch_sizes:
+        plain, explained = [], []
+        for _ in range(max(20, requests // max(1, size // 10))):
+            payload = {'features': _request_rows(rng, size)}
+            plain.append(await timed('/predict/batch', payload))
+            explained.append(await timed('/predict/batch?explain=true', payload))
+
+        X = rng.random((size, predictor.engine.n_features))
+        score_s, explain_s = [], []
+        for _ in range(20):
+            started = time.perf_counter()
+            predictor.predict_proba_batch(X)
+            score_s.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            predictor.explain_batch(X)
+            explain_s.append(time.perf_counter() - started)
+
+        batches.append({
+            'batch_size': size,
+            'plain': percentiles(plain),
+            'explained': percentiles(explained),
+            'overhead_pct': round((np.median(explained) / np.median(plain) - 1) * 100, 1),
+            'model_score_ms': round(float(np.median(score_s)) * 1000, 3),
+            'model_explain_ms': round(float(np.median(explain_s)) * 1000, 3),
+        })
+
+    return {'single': single, 'batch': batches}
+
+
+def bench_retrieval(sizes, dim, queries, k=100, seed=5):
+    """
+    CandidateIndex search latency, exact and IVF, and IVF recall@k
+
+    Profiles are drawn around 50 cluster centres, as real user profiles
+    bunch by niche. Recall is the share of the exact top-k that IVF
+    search also returns.
+    """
+    from app.candidate_index import CandidateIndex
+
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(50, dim))
+
+    def profiles(n):
+        return centres[rng.integers(0, len(centres), n)] + 0.7 * rng.normal(size=(n, dim))
+
+    results = []
+    for size in sizes:
+        index = CandidateIndex(dim)
+        started = time.perf_counter()
+        index.upsert(list(range(size)), profiles(size))
+        upsert_s = time.perf_counter() - started
+
+        def timed_searches(**options):
+            seconds, found = [], []
+            for query in query_vectors:
+                started = time.perf_counter()
+                found.append(index.search(query, k=k, **options)[0])
+                seconds.append(time.perf_counter() - started)
+            return seconds, found
+
+        query_vectors = profiles(queries)
+        exact_s, exact = timed_searches(exact=True)
+        layout = index.build_ivf()
+        ivf_s, approximate = timed_searches()
+        results.append({
+            'rows': size,
+            'dim': dim,
+            'upsert_s': round(upsert_s, 3),
+            'exact': percentiles(exact_s),
+            'ivf_build_s': round(layout['buildMs'] / 1000, 3),
+            'nlist': layout['nlist'],
+            'nprobe': layout['nprobe'],
+            'ivf': percentiles(ivf_s),
+            'ivf_recall': round(float(np.mean([len(set(a) & set(b)) / k for a, b in zip(exact, approximate)])), 4),
+        })
+    return results
+
+
+def bench_training(sample_counts, model_types, seed=3):
+    """Wall time of MatchPredictor.train per model type and sample count"""
+    from app.models.match_predictor import MatchPredictor
+
+    results = []
+    for model_type in model_types:
+        for n_samples in sample_counts:
+            X, y = synthetic_dataset(n_samples, seed=seed)
+            predictor = MatchPredictor(model_type)
+            started = time.perf_counter()
+            metrics = predictor.train(X, y)
+            results.append({
+                'model_type': model_type,
+                'samples': n_samples,
+                'train_s': round(time.perf_counter() - started, 3),
+                'fit_s': round(metrics['fit_seconds'], 3),
+                'model_size_mb': round(metrics['model_size_mb'], 3),
+                'accuracy': round(metrics['accuracy'], 4),
+            })
+    return results
+
+
+def environment():
+    """Commit and library versions, so results can be matched to a tree"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=SERVICE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+
+
+def flatten(result, prefix=''):
+    """Numeric leaves keyed by path, with list entries keyed by their label"""
+    items = {}
+    if isinstance(result, dict):
+        for key, value in result.items():
+            items.update(flatten(value, f'{prefix}{key}.'))
+    elif isinstance(result, list):
+        for entry in result:
+            if not isinstance(entry, dict):
+                continue
+            label = '/'.join(
+                f'{key}={entry[key]}'
+                for key in ('model_type', 'samples', 'batch_size', 'concurrency', 'rows', 'dim') if key in entry
+            )
+            items.update(flatten(entry, f'{prefix}{label}.'))
+    elif isinstance(result, (int, float)) and not isinstance(result, bool):
+        items[prefix[:-1]] = result
+    return items
+
+
+def compare(baseline, current):
+    """Print the relative change of every timing and rate present in both"""
+    before, after = flatten(baseline), flatten(current)
+    for key in sorted(before.keys() & after.keys()):
+        if not key.endswith(('_ms', '_s', '_per_s')) or key.startswith(('environment.', 'config.')):
+            continue
+        if before[key]:
+            change = (after[key] - before[key]) / before[key] * 100
+            print(f'{key:70s} {before[key]:>12.3f} -> {after[key]:>12.3f} ({change:+.1f}%)')
+
+
+async def run_http_suites(main, args, suites):
+    import httpx
+
+    transport = httpx.ASGITransport(app=main.app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        # Warm up: first requests build per-model response metadata
+        for features in _request_rows(np.random.default_rng(0), 20):
+            await client.post('/predict', json=features)
+
+        if 'latency' in suites:
+            results['latency'] = await bench_latency(client, args.requests, args.batch_sizes)
+        if 'throughput' in suites:
+            results['throughput'] = await bench_throughput(client, args.concurrency, args.requests)
+            if args.batching:
+                from app.micro_batching import MicroBatcher
+                main.micro_batcher = MicroBatcher(main.score_rows)
+                results['throughput_batched'] = await bench_throughput(client, args.concurrency, args.requests)
+                main.micro_batcher = None
+        if 'explain' in suites:
+            results['explain'] = await bench_explain(client, main.get_predictor(), args.requests, args.batch_sizes)
+    return results
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', default=','.join(SUITES), help='Comma-separated suites to run')
+    parser.add_argument('--requests', type=int, default=1000, help='Requests per latency/throughput run')
+    parser.add_argument('--batch-sizes', type=_int_list, default=[10, 100, 1000])
+    parser.add_argument('--concurrency', type=_int_list, default=[1, 4, 16, 64])
+    parser.add_argument('--batching', action='store_true', help='Also measure throughput with micro-batching')
+    parser.add_argument('--serve-samples', type=int, default=5000,
+                        help='Rows to train the served model on (0: bundled default model)')
+    parser.add_argument('--serve-model-type', default='random_forest')
+    parser.add_argument('--index-sizes', type=_int_list, default=[10000, 100000])
+    parser.add_argument('--index-dim', type=int, default=32, help='Profile vector length for the retrieval suite')
+    parser.add_argument('--queries', type=int, default=200, help='Searches per retrieval run')
+    parser.add_argument('--train-samples', type=_int_list, default=[1000, 5000, 20000])
+    parser.add_argument('--model-types', default=None, help='Comma-separated model types (default: all)')
+    parser.add_argument('--output', help='Write results to this JSON file')
+    parser.add_argument('--compare', help='Earlier result JSON to compare against')
+    args = parser.parse_args()
+
+    suites = [s for s in args.only.split(',') if s]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f'Unknown suites: {", ".join(sorted(unknown))}')
+
+    results = {'environment': environment(), 'config': {k: v for k, v in vars(args).items()
+                                                         if k not in ('output', 'compare')}}
+    if {'latency', 'throughput', 'explain'} & set(suites):
+        main_module = load_app(args.serve_samples, args.serve_model_type)
+        results.update(asyncio.run(run_http_suites(main_module, args, suites)))
+    if 'retrieval' in suites:
+        results['retrieval'] = bench_retrieval(args.index_sizes, args.index_dim, args.queries)
+    if 'training' in suites:
+        from app.models.match_predictor import MODEL_TYPES
+        model_types = args.model_types.split(',') if args.model_types else list(MODEL_TYPES)
+        results['training'] = bench_training(args.train_samples, model_types)
+
+    encoded = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(encoded + '\n')
+    else:
+        print(encoded)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
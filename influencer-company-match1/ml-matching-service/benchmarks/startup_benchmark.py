@@ -0,0 +1,88 @@
+"""
+Startup Benchmark
+Measures wall time from launching the service to its first successful prediction
+
+Usage (from the ml-matching-service directory):
+    python -m benchmarks.startup_benchmark --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_FEATURES = {
+    'nicheAlignment': 0.8,
+    'audienceMatch': 0.7,
+    'engagementRate': 0.6,
+    'brandFit': 0.9,
+}
+
+
+def _post_json(url, payload, timeout=1.0):
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode(),
+        headers={'Content-Type': 'application/json'},
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.status
+
+
+def measure_startup(port, timeout=60.0):
+    """
+    Boot one uvicorn process and time it until /predict answers
+
+    Returns:
+        Seconds from process launch to the first 200 from /predict
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app.main:app', '--port', str(port), '--log-level', 'warning'],
+        cwd=SERVICE_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    try:
+        url = f'http://127.0.0.1:{port}/predict'
+        while time.perf_counter() - start < timeout:
+            try:
+                if _post_json(url, SAMPLE_FEATURES) == 200:
+                    return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError, OSError):
+                pass
+            time.sleep(0.01)
+        raise TimeoutError(f"Service did not answer within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Number of cold starts to measure')
+    parser.add_argument('--port', type=int, default=8765, help='Port for the benchmark server')
+    args = parser.parse_args()
+
+    timings = [measure_startup(args.port) for _ in range(args.runs)]
+
+    result = {
+        'runs': args.runs,
+        'boot_to_first_prediction_s': {
+            'min': round(min(timings), 3),
+            'median': round(statistics.median(timings), 3),
+            'max': round(max(timings), 3),
+        },
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Candidate index: incremental upserts and deletes, the on-disk store shared
+by workers, and the /candidates endpoints
+
+Run from the ml-matching-service directory: python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+
+# The app reads its directories at import; keep it away from the real ones
+_workdir = tempfile.mkdtemp(prefix='ml-test-')
+os.environ['MODEL_REGISTRY_DIR'] = os.path.join(_workdir, 'artifacts')
+os.environ['SAMPLE_STORE_DIR'] = os.path.join(_workdir, 'samples')
+os.environ['CANDIDATE_INDEX_DIR'] = os.path.join(_workdir, 'candidates')
+os.environ['MODEL_PRELOAD'] = 'false'
+
+from app.candidate_index import LOG_FILE, CandidateIndex, CandidateStore  # noqa: E402
+
+
+def _profiles(n, dim=8, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim))
+
+
+def _check_lists(index):
+    """Every row is in exactly one inverted list, at its recorded position"""
+    n = len(index)
+    members = np.concatenate([m[:size] for m, size in zip(index._members, index._sizes)])
+    assert sorted(members.tolist()) == list(range(n))
+    for row in range(n):
+        assert index._members[index._lists[row]][index._positions[row]] == row
+
+
+def test_exact_search_excludes_and_orders():
+    vectors = _profiles(200)
+    index = CandidateIndex(8)
+    index.upsert([f'u{i}' for i in range(200)], vectors)
+
+    ids, similarities, compared = index.search(vectors[3], k=5)
+    assert ids[0] == 'u3'
+    assert similarities == sorted(similarities, reverse=True)
+    assert compared == 200
+
+    ids, _, _ = index.search(vectors[3], k=5, exclude=['u3'])
+    assert 'u3' not in ids and len(ids) == 5
+
+
+def test_upserts_and_deletes_keep_ivf_lists_consistent():
+    vectors = _profiles(600)
+    index = CandidateIndex(8, capacity=4)
+    index.upsert([f'u{i}' for i in range(500)], vectors[:500])
+    index.build_ivf(nlist=10, nprobe=3)
+
+    index.upsert([f'u{i}' for i in range(400, 600)], _profiles(200, seed=1))
+    index.upsert(['dup', 'dup'], _profiles(2, seed=2))
+    _check_lists(index)
+    assert index.delete([f'u{i}' for i in range(0, 600, 3)] + ['missing', 'dup']) == 201
+    _check_lists(index)
+
+    # Probing every list is exact
+    query = index.vector('u1')
+    assert index.search(query, k=10, nprobe=10)[0] == index.search(query, k=10, exact=True)[0]
+
+
+def test_upsert_after_deleting_everything():
+    index = CandidateIndex(8)
+    index.upsert(['a', 'b'], _profiles(2))
+    index.build_ivf(nlist=2)
+    assert index.delete(['a', 'b']) == 2
+
+    index.upsert(['c'], _profiles(1, seed=1))
+    assert len(index) == 1
+    assert index.search(index.vector('c'), k=5)[0] == ['c']
+
+
+def test_rejects_bad_vectors():
+    index = CandidateIndex(3)
+    with pytest.raises(ValueError):
+        index.upsert(['a'], [[0.0, 0.0, 0.0]])
+    with pytest.raises(ValueError):
+        index.upsert(['a'], [[1.0, 2.0]])
+    assert len(index) == 0
+
+
+def test_store_is_shared_between_processes(tmp_path):
+    # Two stores on one directory stand in for two uvicorn workers
+    first, second = CandidateStore(str(tmp_path)), CandidateStore(str(tmp_path))
+    vectors = _profiles(300)
+    assert first.upsert('influencer', [f'u{i}' for i in range(300)], vectors) == (300, 0, 300)
+    assert second.delete('influencer', ['u0', 'u1', 'missing']) == (2, 298)
+    layout = first.build_ivf('influencer', nlist=8, nprobe=8)
+    assert layout['rows'] == 298
+
+    index = second.get('influencer')
+    assert index.stats()['nlist'] == 8
+    _check_lists(index)
+    assert index.search(vectors[5], k=10)[0] == first.get('influencer').search(vectors[5], k=10)[0]
+
+    # A restarted worker reads the same state
+    restarted = CandidateStore(str(tmp_path))
+    assert restarted.groups() == ['influencer']
+    assert len(restarted.get('influencer')) == 298 and 'u0' not in restarted.get('influencer')
+    with pytest.raises(ValueError):
+        restarted.upsert('influencer', ['x'], _profiles(1, dim=4))
+
+
+def test_store_ignores_and_trims_a_partial_record(tmp_path):
+    store = CandidateStore(str(tmp_path))
+    store.upsert('company', ['a', 'b'], _profiles(2))
+    log = tmp_path / 'company' / LOG_FILE
+    size = log.stat().st_size
+    with open(log, 'ab') as f:
+        f.write(b'\x40\x00\x00\x00')
+
+    reader = CandidateStore(str(tmp_path))
+    assert len(reader.get('company')) == 2
+    assert reader.upsert('company', ['c'], _profiles(1, seed=1))[2] == 3
+    assert len(store.get('company')) == 3
+    assert log.stat().st_size > size
+
+
+def test_store_compaction_reloads_other_processes(tmp_path):
+    writer = CandidateStore(str(tmp_path), compact_ratio=2.0, compact_min_bytes=0)
+    reader = CandidateStore(str(tmp_path))
+    for seed in range(5):
+        writer.upsert('influencer', [f'u{i}' for i in range(50)], _profiles(50, seed=seed))
+    reader.get('influencer')
+    writer.delete('influencer', [f'u{i}' for i in range(25)])
+    writer.upsert('influencer', ['late'], _profiles(1, seed=9))
+
+    log_size = (tmp_path / 'influencer' / LOG_FILE).stat().st_size
+    assert log_size < 5 * 50 * 8 * 4
+    index = reader.get('influencer')
+    assert sorted(index.snapshot()[0]) == sorted(writer.get('influencer').snapshot()[0])
+    assert np.allclose(index.vector('u30'), writer.get('influencer').vector('u30'))
+
+
+@pytest.fixture
+def client(tmp_path):
+    from fastapi.testclient import TestClient
+    from app import main
+
+    main.candidate_store = CandidateStore(str(tmp_path))
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+def _items(ids, vectors):
+    return {'items': [{'id': id_, 'vector': vector} for id_, vector in zip(ids, vectors.tolist())]}
+
+
+def test_endpoint_upsert_after_deleting_every_candidate(client):
+    vectors = _profiles(3)
+    assert client.post('/candidates/influencer', json=_items(['a', 'b'], vectors[:2])).status_code == 200
+    assert client.post('/candidates/influencer/delete', json={'ids': ['a', 'b']}).json()['size'] == 0
+
+    response = client.post('/candidates/influencer', json=_items(['c'], vectors[2:]))
+    assert response.json() == {'group': 'influencer', 'added': 1, 'updated': 0, 'size': 1}
+    results = client.post('/candidates/influencer/search', json={'vector': vectors[2].tolist(), 'k': 5}).json()
+    assert [r['id'] for r in results['results']] == ['c']
+
+
+def test_endpoint_search_by_user_in_another_group(client):
+    vectors = _profiles(50)
+    client.post('/candidates/influencer', json=_items([f'i{k}' for k in range(50)], vectors))
+    client.post('/candidates/company', json=_items(['c1'], vectors[7:8]))
+
+    results = client.post('/candidates/influencer/search', json={'userId': 'c1', 'k': 3}).json()
+    assert results['results'][0]['id'] == 'i7'
+    own = client.post('/candidates/influencer/search', json={'userId': 'i7', 'k': 3}).json()
+    assert 'i7' not in [r['id'] for r in own['results']]
+
+
+def test_endpoint_validation(client):
+    assert client.post('/candidates/bad name', json=_items(['a'], _profiles(1))).status_code == 400
+    mixed = {'items': [{'id': 'a', 'vector': [1.0, 2.0]}, {'id': 'b', 'vector': [1.0]}]}
+    assert client.post('/candidates/influencer', json=mixed).status_code == 400
+    assert client.post('/candidates/missing/search', json={'userId': 'a'}).status_code == 404
+
+    client.post('/candidates/influencer', json=_items(['a'], _profiles(1)))
+    assert client.post('/candidates/influencer/search', json={'vector': [1.0, 2.0]}).status_code == 400
+    assert client.post('/candidates/influencer/search', json={'userId': 'nobody'}).status_code == 404
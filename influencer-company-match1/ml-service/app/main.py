@@ -1,9 +1,12 @@
 import os
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any
 
 from app.models.model_manager import ModelManager
+from app.metrics import Metrics, MetricsMiddleware
+from app.profiling import ProfilerMiddleware, SamplingProfiler, require_admin
 
 # Load configuration
 INTENTS_PATH = os.getenv('INTENTS_PATH', 'data/intents.json')
@@ -13,6 +16,42 @@ model_manager = ModelManager(INTENTS_PATH)
 
 app = FastAPI(title="IC Match Chatbot ML Service", version="1.0.0")
 
+# Request counts, errors and latency per endpoint and stage, served at
+# /metrics; stage timings are also sent back in a Server-Timing header
+metrics = Metrics('ml_chat')
+app.add_middleware(
+    MetricsMiddleware,
+    metrics=metrics,
+    server_timing=os.getenv('SERVER_TIMING', 'true').lower() != 'false'
+)
+
+# Sampling profiler, armed for the next N requests via /admin/profile
+profiler = SamplingProfiler()
+app.add_middleware(ProfilerMiddleware, profiler=profiler)
+
+def collect_model_metrics():
+    """Which NLP components are loaded, read at scrape time"""
+    components = {
+        'intent_classifier': model_manager._intent_classifier,
+        'response_generator': model_manager._response_generator,
+        'entity_extractor': model_manager._entity_extractor,
+        'sentiment_analyzer': model_manager._sentiment_analyzer,
+    }
+    classifier = model_manager._intent_classifier
+    return [
+        ('model_info', 'gauge', 'Service version and intents file', [
+            ({'version': app.version, 'intents': INTENTS_PATH}, 1)
+        ]),
+        ('component_loaded', 'gauge', 'Whether each lazily loaded component is loaded', [
+            ({'component': name}, int(component is not None)) for name, component in components.items()
+        ]),
+        ('intents', 'gauge', 'Intents known to the classifier', [
+            ({}, len(classifier.intents) if classifier is not None else 0)
+        ]),
+    ]
+
+metrics.add_collector(collect_model_metrics)
+
 class ChatRequest(BaseModel):
     message: str
     context: Optional[Dict[str, Any]] = {}
@@ -35,6 +74,8 @@ async def health_check():
 
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
+    stages = metrics.stage_timer("/chat")
+    stages.mark("validation")
     try:
         # Extract entities (returns a list, convert to dict for easier handling)
         extracted_entities_list = model_manager.entity_extractor.extract(request.message)
@@ -44,14 +85,17 @@ async def chat(request: ChatRequest):
         for entity in extracted_entities_list:
             if 'label' in entity and 'text' in entity:
                 entities_dict[entity['label']] = entity['text']
+        stages.mark("entity")
 
         # Classify intent
         intent, confidence, extracted_entities = model_manager.intent_classifier.classify(request.message)
         if extracted_entities:
             entities_dict.update(extracted_entities)
+        stages.mark("intent")
 
         # Analyze sentiment
         sentiment = model_manager.sentiment_analyzer.analyze(request.message)
+        stages.mark("sentiment")
 
         # Generate response (using intent and context)
         context = request.context.copy()
@@ -59,16 +103,43 @@ async def chat(request: ChatRequest):
             context['sentiment'] = sentiment['sentiment']
         response_text = model_manager.response_generator.generate(intent, entities_dict, context)
 
-        return ChatResponse(
+        response = ChatResponse(
             response=response_text,
             intent=intent,
             confidence=confidence,
             entities=entities_dict if entities_dict else None,
             sentiment=sentiment
         )
+        stages.mark("response")
+        return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Request and stage latency metrics in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+class ProfileRequest(BaseModel):
+    requests: int = Field(default=100, ge=1, le=100000)
+    intervalMs: float = Field(default=1.0, ge=0.1, le=1000)
+
+@app.post("/admin/profile", dependencies=[Depends(require_admin)])
+async def start_profile(request: ProfileRequest):
+    """Sample the stack during the next N requests (requires X-Admin-Token)"""
+    profiler.arm(request.requests, request.intervalMs / 1000)
+    return profiler.status()
+
+@app.get("/admin/profile", dependencies=[Depends(require_admin)])
+async def profile_status():
+    """State and sample count of the current or last profile"""
+    return profiler.status()
+
+@app.get("/admin/profile/collapsed", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def profile_collapsed():
+    """Samples so far as collapsed stacks (flamegraph.pl, speedscope)"""
+    return PlainTextResponse(profiler.collapsed())
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
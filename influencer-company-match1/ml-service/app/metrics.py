@@ -0,0 +1,263 @@
+"""
+Service Metrics
+Request counters and latency histograms in the Prometheus text format
+
+Kept dependency-free: recording a sample is a perf_counter() call, a
+bisect over a dozen bucket bounds and a few integer increments under a
+lock, and the text exposition is only built when /metrics is scraped.
+"""
+import bisect
+import contextvars
+import threading
+import time
+
+# Latency bucket upper bounds in seconds, from sub-millisecond model calls
+# to multi-second batch requests
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# perf_counter() at which the current request entered the middleware
+_request_started = contextvars.ContextVar('request_started', default=None)
+
+# (stage, seconds) pairs marked during the current request, for Server-Timing
+_request_stages = contextvars.ContextVar('request_stages', default=None)
+
+
+class Histogram:
+    """Fixed-bucket histogram; counts are per bucket and summed on render"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels.items()
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def server_timing(stages, total):
+    """Server-Timing header value, durations in milliseconds"""
+    entries = [f'{stage};dur={seconds * 1000:.3f}' for stage, seconds in stages]
+    entries.append(f'total;dur={total * 1000:.3f}')
+    return ', '.join(entries)
+
+
+def _number(value):
+    if isinstance(value, float) and value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class StageTimer:
+    """
+    Splits one request into consecutive named stages
+
+    Each mark() records the time since the previous mark under that stage.
+    The first mark counts from when the request entered the middleware, so
+    it includes reading the body and validating the request model. Marks
+    are also kept for the request's Server-Timing header.
+    """
+
+    __slots__ = ('metrics', 'endpoint', 'last', 'timings')
+
+    def __init__(self, metrics, endpoint):
+        self.metrics = metrics
+        self.endpoint = endpoint
+        self.last = _request_started.get() or time.perf_counter()
+        self.timings = _request_stages.get()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.metrics.observe_stage(self.endpoint, stage, now - self.last)
+        if self.timings is not None:
+            self.timings.append((stage, now - self.last))
+        self.last = now
+
+
+class Metrics:
+    """
+    Per-endpoint request counts, errors, in-flight requests and latency
+
+    Collectors registered with add_collector() contribute gauges that are
+    read at scrape time (model version, cache counters).
+    """
+
+    def __init__(self, namespace, buckets=DEFAULT_BUCKETS):
+        """
+        Args:
+            namespace: Prefix of every metric name (e.g. 'ml_chat')
+            buckets: Latency histogram bucket upper bounds in seconds
+        """
+        self.namespace = namespace
+        self.buckets = buckets
+        self.in_flight = 0
+        self._requests = {}
+        self._errors = {}
+        self._latency = {}
+        self._stages = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def stage_timer(self, endpoint):
+        """Start timing the stages of a request (see StageTimer)"""
+        return StageTimer(self, endpoint)
+
+    def observe_stage(self, endpoint, stage, seconds):
+        with self._lock:
+            histogram = self._stages.get((endpoint, stage))
+            if histogram is None:
+                histogram = self._stages[(endpoint, stage)] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def observe_request(self, endpoint, status, seconds):
+        with self._lock:
+            key = (endpoint, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            if status >= 500:
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+            histogram = self._latency.get(endpoint)
+            if histogram is None:
+                histogram = self._latency[endpoint] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def add_collector(self, collector):
+        """
+        Register a callable read on every scrape
+
+        The callable returns a list of (name, type, help, samples) tuples,
+        samples being (labels dict, value) pairs; the namespace is prefixed.
+        """
+        self._collectors.append(collector)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            requests = dict(self._requests)
+            errors = dict(self._errors)
+            latency = {key: (list(h.counts), h.sum, h.count) for key, h in self._latency.items()}
+            stages = {key: (list(h.counts), h.sum, h.count) for key, h in self._stages.items()}
+            in_flight = self.in_flight
+
+        lines = []
+        self._family(lines, 'requests_total', 'counter', 'Requests handled, by endpoint and status code', [
+            ({'endpoint': endpoint, 'status': status}, count)
+            for (endpoint, status), count in sorted(requests.items())
+        ])
+        self._family(lines, 'request_errors_total', 'counter', 'Requests that failed with a 5xx status', [
+            ({'endpoint': endpoint}, count) for endpoint, count in sorted(errors.items())
+        ])
+        self._family(lines, 'requests_in_flight', 'gauge', 'Requests currently being handled', [
+            ({}, in_flight)
+        ])
+        self._histograms(lines, 'request_duration_seconds', 'Request latency by endpoint', {
+            (('endpoint', endpoint),): values for endpoint, values in latency.items()
+        })
+        self._histograms(lines, 'stage_duration_seconds', 'Latency of each stage within a request', {
+            (('endpoint', endpoint), ('stage', stage)): values for (endpoint, stage), values in stages.items()
+        })
+        for collector in self._collectors:
+            for name, kind, help_text, samples in collector():
+                self._family(lines, name, kind, help_text, samples)
+        return '\n'.join(lines) + '\n'
+
+    def _family(self, lines, name, kind, help_text, samples):
+        name = f'{self.namespace}_{name}'
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in samples:
+            lines.append(f'{name}{_labels(labels)} {_number(value)}')
+
+    def _histograms(self, lines, name, help_text, histograms):
+        name = f'{self.namespace}_{name}'
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for label_items, (counts, total, count) in sorted(histograms.items()):
+            labels = dict(label_items)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{_labels({**labels, "le": repr(bound)})} {cumulative}')
+            lines.append(f'{name}_bucket{_labels({**labels, "le": "+Inf"})} {count}')
+            lines.append(f'{name}_sum{_labels(labels)} {total!r}')
+            lines.append(f'{name}_count{_labels(labels)} {count}')
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request
+
+    Requests are labelled with the route's path template ("/models/{version}/load")
+    rather than the raw path, so label cardinality stays bounded. A plain
+    ASGI middleware rather than BaseHTTPMiddleware, which adds a task and
+    memory streams per request.
+
+    With server_timing on, every response carries a Server-Timing header
+    with the stages the handler marked and the total time to the start of
+    the response, which browser dev tools and curl -v show directly.
+    """
+
+    def __init__(self, app, metrics, server_timing=True):
+        self.app = app
+        self.metrics = metrics
+        self.server_timing = server_timing
+        self._paths = None
+
+    def _endpoint(self, scope):
+        # The router puts the matched endpoint function into the scope
+        endpoint = scope.get('endpoint')
+        if endpoint is None:
+            return 'unmatched'
+        if self._paths is None:
+            self._paths = {
+                getattr(route, 'endpoint', None): route.path
+                for route in scope['app'].routes if hasattr(route, 'path')
+            }
+        return self._paths.get(endpoint, 'unmatched')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        token = _request_started.set(started)
+        stages = [] if self.server_timing else None
+        stages_token = _request_stages.set(stages)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                if stages is not None:
+                    value = server_timing(stages, time.perf_counter() - started)
+                    message = {
+                        **message,
+                        'headers': [*message.get('headers', []), (b'server-timing', value.encode())],
+                    }
+            await send(message)
+
+        self.metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.metrics.in_flight -= 1
+            _request_stages.reset(stages_token)
+            _request_started.reset(token)
+            self.metrics.observe_request(self._endpoint(scope), status, time.perf_counter() - started)